@@ -1,15 +1,17 @@
 #!/usr/bin/env python3
 import os
+import sys
 import json
-import subprocess
 from pathlib import Path
 from typing import Dict, Any, Optional
 import click
-from rich.console import Console
-from rich.table import Table
-from rich.prompt import Prompt, Confirm
 
-console = Console()
+sys.path.insert(0, str(Path(__file__).parent / "scripts"))
+
+from lazy_console import LazyConsole
+
+console = LazyConsole()
+err_console = LazyConsole(stderr=True)
 
 class PersonaGenerator:
     def __init__(self, project_root: Path):
@@ -23,7 +25,8 @@ class PersonaGenerator:
         """Create ComfyUI workflow for persona generation"""
         
         # Import persona manager
-        from scripts.persona_manager import PersonaManager
+        from persona_manager import PersonaManager
+        from workflow_templates import get_template, lora_name
         manager = PersonaManager(self.project_root)
         persona = manager.get_persona(persona_id)
         
@@ -37,148 +40,14 @@ class PersonaGenerator:
         lora_file = persona['lora_file']
         
         if workflow_type == "image":
-            # Create UI workflow format with proper node structure
-            workflow = {
-                "last_node_id": 8,
-                "last_link_id": 8,
-                "nodes": [
-                    {
-                        "id": 1,
-                        "type": "CheckpointLoaderSimple",
-                        "pos": [50, 50],
-                        "size": [315, 98],
-                        "flags": {},
-                        "order": 0,
-                        "mode": 0,
-                        "outputs": [
-                            {"name": "MODEL", "type": "MODEL", "links": [1], "slot_index": 0},
-                            {"name": "CLIP", "type": "CLIP", "links": [2], "slot_index": 1},
-                            {"name": "VAE", "type": "VAE", "links": [8], "slot_index": 2}
-                        ],
-                        "properties": {"Node name for S&R": "CheckpointLoaderSimple"},
-                        "widgets_values": ["sd_xl_base_1.0.safetensors"]
-                    },
-                    {
-                        "id": 2,
-                        "type": "LoraLoader", 
-                        "pos": [400, 50],
-                        "size": [315, 126],
-                        "flags": {},
-                        "order": 1,
-                        "mode": 0,
-                        "inputs": [
-                            {"name": "model", "type": "MODEL", "link": 1},
-                            {"name": "clip", "type": "CLIP", "link": 2}
-                        ],
-                        "outputs": [
-                            {"name": "MODEL", "type": "MODEL", "links": [3], "slot_index": 0},
-                            {"name": "CLIP", "type": "CLIP", "links": [4, 5], "slot_index": 1}
-                        ],
-                        "properties": {"Node name for S&R": "LoraLoader"},
-                        "widgets_values": ["persona-saramillie.safetensors", 0.8, 0.8]
-                    },
-                    {
-                        "id": 3,
-                        "type": "CLIPTextEncode",
-                        "pos": [750, 50],
-                        "size": [400, 200],
-                        "flags": {},
-                        "order": 2,
-                        "mode": 0,
-                        "inputs": [{"name": "clip", "type": "CLIP", "link": 4}],
-                        "outputs": [{"name": "CONDITIONING", "type": "CONDITIONING", "links": [6], "slot_index": 0}],
-                        "properties": {"Node name for S&R": "CLIPTextEncode"},
-                        "widgets_values": [f"masterpiece, best quality, ultra-detailed, {trigger_word}, portrait, professional photography"]
-                    },
-                    {
-                        "id": 4,
-                        "type": "CLIPTextEncode",
-                        "pos": [750, 300],
-                        "size": [400, 200],
-                        "flags": {},
-                        "order": 3,
-                        "mode": 0,
-                        "inputs": [{"name": "clip", "type": "CLIP", "link": 5}],
-                        "outputs": [{"name": "CONDITIONING", "type": "CONDITIONING", "links": [7], "slot_index": 0}],
-                        "properties": {"Node name for S&R": "CLIPTextEncode"},
-                        "widgets_values": ["low quality, bad anatomy, blurry, distorted"]
-                    },
-                    {
-                        "id": 5,
-                        "type": "EmptyLatentImage",
-                        "pos": [400, 300],
-                        "size": [315, 106],
-                        "flags": {},
-                        "order": 4,
-                        "mode": 0,
-                        "outputs": [{"name": "LATENT", "type": "LATENT", "links": [9], "slot_index": 0}],
-                        "properties": {"Node name for S&R": "EmptyLatentImage"},
-                        "widgets_values": [1024, 1024, 1]
-                    },
-                    {
-                        "id": 6,
-                        "type": "KSampler",
-                        "pos": [1200, 50],
-                        "size": [315, 262],
-                        "flags": {},
-                        "order": 5,
-                        "mode": 0,
-                        "inputs": [
-                            {"name": "model", "type": "MODEL", "link": 3},
-                            {"name": "positive", "type": "CONDITIONING", "link": 6},
-                            {"name": "negative", "type": "CONDITIONING", "link": 7},
-                            {"name": "latent_image", "type": "LATENT", "link": 9}
-                        ],
-                        "outputs": [{"name": "LATENT", "type": "LATENT", "links": [10], "slot_index": 0}],
-                        "properties": {"Node name for S&R": "KSampler"},
-                        "widgets_values": [42, "randomize", 30, 7.5, "euler", "normal", 1.0]
-                    },
-                    {
-                        "id": 7,
-                        "type": "VAEDecode",
-                        "pos": [1550, 50],
-                        "size": [210, 46],
-                        "flags": {},
-                        "order": 6,
-                        "mode": 0,
-                        "inputs": [
-                            {"name": "samples", "type": "LATENT", "link": 10},
-                            {"name": "vae", "type": "VAE", "link": 8}
-                        ],
-                        "outputs": [{"name": "IMAGE", "type": "IMAGE", "links": [11], "slot_index": 0}],
-                        "properties": {"Node name for S&R": "VAEDecode"}
-                    },
-                    {
-                        "id": 8,
-                        "type": "SaveImage",
-                        "pos": [1800, 50],
-                        "size": [315, 270],
-                        "flags": {},
-                        "order": 7,
-                        "mode": 0,
-                        "inputs": [{"name": "images", "type": "IMAGE", "link": 11}],
-                        "properties": {"Node name for S&R": "SaveImage"},
-                        "widgets_values": [f"{persona_id}_output"]
-                    }
-                ],
-                "links": [
-                    [1, 1, 0, 2, 0, "MODEL"],
-                    [2, 1, 1, 2, 1, "CLIP"], 
-                    [3, 2, 0, 6, 0, "MODEL"],
-                    [4, 2, 1, 3, 0, "CLIP"],
-                    [5, 2, 1, 4, 0, "CLIP"],
-                    [6, 3, 0, 6, 1, "CONDITIONING"],
-                    [7, 4, 0, 6, 2, "CONDITIONING"],
-                    [8, 1, 2, 7, 1, "VAE"],
-                    [9, 5, 0, 6, 3, "LATENT"],
-                    [10, 6, 0, 7, 0, "LATENT"],
-                    [11, 7, 0, 8, 0, "IMAGE"]
-                ],
-                "groups": [],
-                "config": {},
-                "extra": {},
-                "version": 0.4
-            }
+            # UI workflow format, stamped out of the shared template
+            workflow = get_template("persona_image").render(
+                lora_name=lora_name(lora_file),
+                strength_model=0.8,
+                strength_clip=0.8,
+                prompt=f"masterpiece, best quality, ultra-detailed, {trigger_word}, portrait, professional photography",
+                filename_prefix=f"{persona_id}_output",
+            )
         else:  # video workflow
             workflow = self._create_video_workflow(persona_id, trigger_word, lora_file)
         
@@ -186,100 +55,48 @@ class PersonaGenerator:
     
     def _create_video_workflow(self, persona_id: str, trigger_word: str, lora_file: str) -> Dict[str, Any]:
         """Create video generation workflow"""
-        # Complex video workflow with AnimateDiff
-        return {
-            # Base model and LoRA loading (similar to image)
-            "1": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "sd_xl_base_1.0.safetensors"}},
-            "2": {"class_type": "LoraLoader", "inputs": {
-                "lora_name": lora_file,
-                "strength_model": 0.8,
-                "strength_clip": 0.8,
-                "model": ["1", 0],
-                "clip": ["1", 1]
-            }},
-            # AnimateDiff loader
-            "10": {
-                "class_type": "ADE_LoadAnimateDiffModel",
-                "inputs": {
-                    "model_name": "mm_sd_v15_v2.ckpt"
-                }
-            },
-            "11": {
-                "class_type": "ADE_ApplyAnimateDiffModel",
-                "inputs": {
-                    "model": ["2", 0],
-                    "motion_model": ["10", 0],
-                    "beta_schedule": "linear"
-                }
-            },
-            # Text encoding
-            "3": {"class_type": "CLIPTextEncode", "inputs": {
-                "text": f"masterpiece, cinematic, {trigger_word}, walking, dynamic motion",
-                "clip": ["2", 1]
-            }},
-            "4": {"class_type": "CLIPTextEncode", "inputs": {
-                "text": "static, blurry, distorted",
-                "clip": ["2", 1]
-            }},
-            # Batch latent for video frames
-            "12": {
-                "class_type": "ADE_EmptyLatentImageLarge",
-                "inputs": {
-                    "width": 768,
-                    "height": 768,
-                    "batch_size": 16  # 16 frames
-                }
-            },
-            # KSampler for video
-            "13": {
-                "class_type": "KSampler",
-                "inputs": {
-                    "seed": 42,
-                    "steps": 25,
-                    "cfg": 7.5,
-                    "sampler_name": "euler_a",
-                    "scheduler": "normal",
-                    "denoise": 1.0,
-                    "model": ["11", 0],
-                    "positive": ["3", 0],
-                    "negative": ["4", 0],
-                    "latent_image": ["12", 0]
-                }
-            },
-            # VAE Decode
-            "14": {
-                "class_type": "VAEDecode",
-                "inputs": {
-                    "samples": ["13", 0],
-                    "vae": ["1", 2]
-                }
-            },
-            # Video combine
-            "15": {
-                "class_type": "ADE_VideoCombine",
-                "inputs": {
-                    "images": ["14", 0],
-                    "frame_rate": 8,
-                    "format": "mp4",
-                    "filename_prefix": f"{persona_id}_video"
-                }
-            }
-        }
+        from compat_check import CompatChecker
+        from workflow_templates import get_template, lora_name
+        
+        # AnimateDiff graph in API format, see workflows/templates/persona_video.json
+        template = get_template("persona_video")
+        params = {}
+        
+        # The template's motion module is SD1.5; prefer an installed one that
+        # matches the checkpoint so the pre-flight check can pass
+        checker = CompatChecker(self.project_root)
+        ckpt = checker.lookup(("checkpoints",), template.defaults["ckpt_name"])
+        motion = checker.lookup(("animatediff",), template.defaults["motion_model"])
+        if ckpt and ckpt.get("arch") and (motion is None or motion.get("arch") != ckpt["arch"]):
+            candidates = checker.compatible("animatediff", ckpt["arch"])
+            if candidates:
+                params["motion_model"] = candidates[0]
+        
+        return template.render(
+            lora_name=lora_name(lora_file),
+            prompt=f"masterpiece, cinematic, {trigger_word}, walking, dynamic motion",
+            filename_prefix=f"{persona_id}_video",
+            **params,
+        )
     
     def save_workflow(self, workflow: Dict[str, Any], name: str):
-        """Save workflow to file"""
-        self.workflows_dir.mkdir(exist_ok=True)
-        workflow_file = self.workflows_dir / f"{name}.json"
-        with open(workflow_file, 'w') as f:
-            json.dump(workflow, f, indent=2)
+        """Save workflow to the content-addressed store and link it into ComfyUI
         
-        # Also save to ComfyUI workflows directory if it exists
-        comfyui_workflow_dir = self.project_root / "ComfyUI" / "user" / "default" / "workflows"
-        if comfyui_workflow_dir.exists():
-            comfyui_workflow_file = comfyui_workflow_dir / f"{name}.json"
-            with open(comfyui_workflow_file, 'w') as f:
-                json.dump(workflow, f, indent=2)
-            console.print(f"[green]✓ Workflow also saved to ComfyUI[/green]")
+        Raises IncompatibleModelsError (a ValueError) before anything is
+        written if the graph mixes SDXL and SD1.5 models.
+        """
+        from compat_check import validate_workflow
+        from workflow_store import WorkflowStore
+        
+        for warning in validate_workflow(workflow, self.project_root):
+            console.print(f"[yellow]Warning: {warning}[/yellow]")
+        
+        workflow_file, changed = WorkflowStore(self.project_root).save(workflow, name)
+        if not changed:
+            console.print(f"[dim]Workflow unchanged, nothing written[/dim]")
+        
+        if self.comfyui_dir.joinpath("user", "default", "workflows").exists():
+            console.print(f"[green]✓ Workflow available in ComfyUI[/green]")
             
             # Auto-sync models to ComfyUI
             self._sync_models_to_comfyui()
@@ -288,28 +105,18 @@ class PersonaGenerator:
         return workflow_file
     
     def _sync_models_to_comfyui(self):
-        """Sync models from our models directory to ComfyUI's models directory"""
-        import shutil
+        """Sync models from our models directory to ComfyUI's models directory
         
-        comfyui_models = self.project_root / "ComfyUI" / "models"
-        if not comfyui_models.exists():
-            return
-            
-        # Sync checkpoints
-        if (self.models_dir / "checkpoints").exists():
-            checkpoint_files = list((self.models_dir / "checkpoints").glob("*.safetensors"))
-            for file in checkpoint_files:
-                dest = comfyui_models / "checkpoints" / file.name
-                if not dest.exists():
-                    shutil.copy2(file, dest)
+        Incremental: unchanged models cost a stat, changed ones are linked
+        (or copied in parallel when linking is impossible).
+        """
+        from model_sync import TRANSFER_METHODS, ModelSync, format_report
         
-        # Sync LoRAs
-        if (self.models_dir / "loras").exists():
-            lora_files = list((self.models_dir / "loras").glob("*.safetensors"))
-            for file in lora_files:
-                dest = comfyui_models / "loras" / file.name
-                if not dest.exists():
-                    shutil.copy2(file, dest)
+        report = ModelSync(self.project_root).sync()
+        if report["removed"] or any(report.get(method) for method in TRANSFER_METHODS):
+            console.print(f"[green]✓ Models synced: {format_report(report)}[/green]")
+        if report["errors"]:
+            console.print(f"[yellow]⚠ {report['errors']} model(s) could not be synced to ComfyUI[/yellow]")
 
 @click.group()
 def cli():
@@ -319,38 +126,502 @@ def cli():
 @cli.command()
 @click.option('--persona-id', required=True, help='Persona ID (e.g., persona-john)')
 @click.option('--type', type=click.Choice(['image', 'video']), default='image', help='Workflow type')
-def create_workflow(persona_id, type):
+@click.option('--num-images', default=1, help='Images to produce (split into batches)')
+@click.option('--batch-size', default='1', help="Images per sampling pass, or 'auto' to fit the memory budget")
+@click.option('--memory-budget', type=float, help='GB available for auto batch size (default: $PERSONA_MEMORY_BUDGET_GB or 60% of RAM)')
+def create_workflow(persona_id, type, num_images, batch_size, memory_budget):
     """Create a ComfyUI workflow for persona generation"""
+    from memory_model import plan_batches, resolve_batch_size
+    from workflow_batch import batched_graphs
+    
     project_root = Path(__file__).parent
     generator = PersonaGenerator(project_root)
     
     try:
+        if type == 'video' and (num_images != 1 or batch_size != '1'):
+            raise ValueError("--num-images and --batch-size only apply to image workflows")
         workflow = generator.create_workflow(persona_id, type)
-        workflow_file = generator.save_workflow(workflow, f"{persona_id}_{type}_workflow")
+        size, note = resolve_batch_size(batch_size, num_images, project_root, workflow, memory_budget)
+        if note:
+            console.print(f"[blue]{note}[/blue]")
+        
+        batches = plan_batches(num_images, size)
+        name = f"{persona_id}_{type}_workflow"
+        files = [
+            generator.save_workflow(graph, name if len(batches) == 1 else f"{name}_batch{index}")
+            for index, graph in enumerate(batched_graphs(workflow, batches), start=1)
+        ]
         
         console.print(f"\n[bold green]Workflow created successfully![/bold green]")
-        console.print(f"Load this workflow in ComfyUI: {workflow_file}")
+        if len(files) == 1:
+            console.print(f"Load this workflow in ComfyUI: {files[0]}")
+        else:
+            console.print(f"{num_images} images in {len(files)} batches of up to {size}, queue them all with:")
+            console.print(f"python persona_gen.py run " + " ".join(str(path.relative_to(project_root)) for path in files))
     except ValueError as e:
         console.print(f"[red]Error: {e}[/red]")
 
 @cli.command()
-def list_models():
+@click.argument('spec_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', '-o', default='-', help='JSONL output file ("-" for stdout)')
+@click.option('--shard', help='Only emit slice K of N (zero-based), e.g. 0/4')
+def batch_workflows(spec_file, output, shard):
+    """Stream a personas x prompts x seeds x strengths sweep as API-format JSONL
+    
+    SPEC_FILE is JSON with "personas", "prompts" (may use {trigger_word}),
+    "seeds" (list or {"start": 0, "count": 100}), "strengths" and
+    optional "params" (steps, cfg, width, height, negative_prompt, ...).
+    """
+    from compat_check import CompatChecker
+    from workflow_batch import iter_sweep, parse_shard, sweep_size, write_jsonl
+    from persona_manager import PersonaManager
+    from workflow_templates import get_template, lora_name
+    
+    project_root = Path(__file__).parent
+    with open(spec_file, 'r') as f:
+        spec = json.load(f)
+    
+    manager = PersonaManager(project_root)
+    personas = {}
+    for persona_id in spec.get("personas", []):
+        persona = manager.get_persona(persona_id)
+        if not persona:
+            err_console.print(f"[red]Error: Persona {persona_id} not found[/red]")
+            sys.exit(1)
+        if not persona['trained']:
+            err_console.print(f"[red]Error: Persona {persona_id} is not trained yet[/red]")
+            sys.exit(1)
+        personas[persona_id] = persona
+    
+    # Every graph in the sweep shares one checkpoint, so one check per LoRA
+    checker = CompatChecker(project_root)
+    ckpt_name = spec.get("params", {}).get("ckpt_name") or get_template("persona_image_api").defaults["ckpt_name"]
+    for persona_id, persona in personas.items():
+        errors, _warnings = checker.check([
+            ("CheckpointLoaderSimple", ckpt_name),
+            ("LoraLoader", lora_name(persona["lora_file"])),
+        ])
+        if errors:
+            err_console.print(f"[red]Error: {persona_id}: {'; '.join(errors)}[/red]")
+            sys.exit(1)
+    
+    try:
+        shard_range = parse_shard(shard)
+        items = iter_sweep(spec, personas, shard_range)
+        if output == '-':
+            count = write_jsonl(items, sys.stdout)
+        else:
+            with open(output, 'w') as out:
+                count = write_jsonl(items, out)
+    except (KeyError, ValueError) as e:
+        err_console.print(f"[red]Error: invalid sweep spec: {e}[/red]")
+        sys.exit(1)
+    
+    shard_note = f" (shard {shard} of {sweep_size(spec)} total)" if shard else ""
+    err_console.print(f"[green]✓ Wrote {count} workflows{shard_note}[/green]")
+
+@cli.command()
+@click.argument('workflow_files', nargs=-1, type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--persona-id', help='Queue the standard portrait graph for this persona instead of files')
+@click.option('--prompt', help='Prompt for --persona-id (default: portrait of the trigger word)')
+@click.option('--seed', default=42, help='Seed for --persona-id')
+@click.option('--server', 'servers', multiple=True, envvar='COMFYUI_URL', default=['http://127.0.0.1:8188'],
+              help='ComfyUI URL (or $COMFYUI_URL); repeat or give a port range (127.0.0.1:8188-8191) to balance over several')
+@click.option('--concurrency', default=4, help='Prompts in flight at once (per server)')
+@click.option('--output-dir', default='outputs', type=click.Path(file_okay=False), help='Where results are downloaded')
+@click.option('--no-download', is_flag=True, help='Leave results on the ComfyUI server')
+@click.option('--object-info', help='Node definitions for compiling UI-format graphs (URL or saved JSON; default: --server)')
+@click.option('--schedule', is_flag=True, help='Reorder by model affinity, priority and deadline to cut model reloads')
+@click.option('--no-optimize', is_flag=True, help='Queue graphs as written, without merging duplicate or unused nodes')
+@click.option('--memory-budget', type=float, help='Reject graphs estimated to need more GB than this')
+@click.option('--catalog', is_flag=True, help='Index downloaded images (with execution time) in the output catalog')
+@click.option('--no-cache', is_flag=True, help='Render everything, ignoring and not filling the render cache')
+def run(workflow_files, persona_id, prompt, seed, servers, concurrency, output_dir, no_download, object_info, schedule,
+        no_optimize, memory_budget, catalog, no_cache):
+    """Queue workflows on a running ComfyUI and collect the results
+    
+    WORKFLOW_FILES may be .json graphs or batch-workflows JSONL ("-" for stdin).
+    UI-format graphs are compiled to API format before queueing. Graphs
+    rendered before with the same models are restored from the render
+    cache without queueing them. With several servers, each workflow goes
+    to the least busy one, preferring servers that already have its models
+    loaded, and is re-queued elsewhere if its server dies.
+    """
+    import asyncio
+    try:
+        import aiohttp
+        from comfyui_client import ComfyUIClient, ComfyUIError
+    except ImportError:
+        console.print("[red]Error: 'run' needs aiohttp (pip install aiohttp)[/red]")
+        sys.exit(1)
+    from compat_check import CompatChecker, IncompatibleModelsError, model_refs
+    from graph_compiler import GraphCompileError, compile_workflow, fetch_object_info, is_ui_format
+    from comfyui_pool import ComfyUIPool, server_urls
+    from graph_optimizer import optimize
+    from rich.progress import BarColumn, MofNCompleteColumn, Progress, TextColumn
+    from workflow_batch import iter_workflow_items
+    
+    project_root = Path(__file__).parent
+    urls = server_urls(servers)
+    server = urls[0]
+    if persona_id:
+        from persona_manager import PersonaManager
+        from workflow_templates import get_template, lora_name
+        persona = PersonaManager(project_root).get_persona(persona_id)
+        if not persona or not persona['trained']:
+            console.print(f"[red]Error: Persona {persona_id} not found or not trained yet[/red]")
+            sys.exit(1)
+        jobs = iter([(persona_id, get_template("persona_image_api").render(
+            lora_name=lora_name(persona['lora_file']),
+            prompt=prompt or f"masterpiece, best quality, ultra-detailed, {persona['trigger_word']}, portrait, professional photography",
+            seed=seed,
+            filename_prefix=f"{persona_id}_output",
+        ), {})])
+    elif workflow_files:
+        jobs = iter_workflow_items(list(workflow_files))
+    else:
+        console.print("[red]Error: give workflow files or --persona-id[/red]")
+        sys.exit(1)
+    
+    if schedule:
+        # Needs the whole queue up front, unlike the streaming default
+        from job_scheduler import Job, JobScheduler, format_report
+        pending = [Job(index, label, graph, meta) for index, (label, graph, meta) in enumerate(jobs)]
+        scheduler = JobScheduler()
+        order = scheduler.schedule(pending)
+        console.print(f"Scheduled {len(order)} workflows: "
+                      f"{format_report(scheduler.simulate(pending), scheduler.simulate(order))}")
+        jobs = ((job.label, job.graph, job.meta) for job in order)
+    
+    # Pre-flight: compile UI-format graphs and reject model mismatches before
+    # queueing, checking each distinct set of models only once
+    checker = CompatChecker(project_root)
+    checked = {}
+    labels = []
+    node_info = {}
+    saved = {"nodes": 0, "encodes": 0, "decodes": 0}
+    cached, keys, restored = [], [], {}
+    # Cached results can only be stored and restored through local files
+    cache = None
+    if not (no_cache or no_download):
+        from render_cache import RenderCache
+        cache = RenderCache(project_root)
+    if memory_budget is not None:
+        from memory_model import WorkflowEstimator
+        estimator = WorkflowEstimator(project_root)
+    
+    def definitions():
+        # Fetched on the first UI graph; without it only built-in node types compile
+        if "value" not in node_info:
+            try:
+                node_info["value"] = fetch_object_info(object_info or server)
+            except (OSError, ValueError) as e:
+                if object_info:
+                    raise click.ClickException(f"Cannot load node definitions from {object_info}: {e}")
+                console.print(f"[yellow]Warning: no /object_info from {server} ({e}), "
+                              f"compiling with built-in node definitions[/yellow]")
+                node_info["value"] = None
+        return node_info["value"]
+    
+    def preflight():
+        for label, graph, _meta in jobs:
+            if is_ui_format(graph):
+                try:
+                    graph, warnings = compile_workflow(graph, definitions())
+                except GraphCompileError as e:
+                    raise click.ClickException(f"{label}: " + "\n  ".join(["cannot compile UI graph:"] + e.problems))
+                for warning in warnings:
+                    console.print(f"[yellow]Warning: {label}: {warning}[/yellow]")
+            if not no_optimize:
+                graph, report = optimize(graph, node_info.get("value"))
+                saved["nodes"] += report["nodes_before"] - report["nodes_after"]
+                saved["encodes"] += report["encodes"]
+                saved["decodes"] += report["decodes"]
+            if memory_budget is not None:
+                peak = estimator.estimate(graph)["peak_gb"]
+                if peak > memory_budget:
+                    raise click.ClickException(f"{label} needs ~{peak:.1f} GB, over the {memory_budget:.1f} GB budget "
+                                               f"(split it with 'persona_gen.py estimate --auto-split')")
+            refs = tuple(model_refs(graph))
+            if refs not in checked:
+                try:
+                    checked[refs] = checker.validate(graph)
+                except IncompatibleModelsError as e:
+                    raise click.ClickException(f"{label}: {e}")
+                for warning in checked[refs]:
+                    console.print(f"[yellow]Warning: {warning}[/yellow]")
+            key = cache.key(graph) if cache else None
+            if key is not None:
+                hit = cache.get(key, Path(output_dir))
+                if hit is not None:
+                    cached.append(label)
+                    restored.update((str(path.resolve()), None) for path in hit)
+                    continue
+            labels.append(label)
+            keys.append(key)
+            yield graph
+    
+    async def execute(progress):
+        overall = progress.add_task("Workflows", total=None)
+        steps = {}
+        
+        def on_progress(kind, data):
+            prompt_id = data.get("prompt_id")
+            if kind == "queued":
+                steps[prompt_id] = progress.add_task(f"  {prompt_id[:8]}", total=None)
+            elif kind == "progress" and prompt_id in steps:
+                progress.update(steps[prompt_id], completed=data["value"], total=data["max"])
+            elif kind == "finished" and prompt_id in steps:
+                progress.remove_task(steps.pop(prompt_id))
+        
+        failures, files, timings = [], 0, {}
+        dest_dir = None if no_download else Path(output_dir)
+        if len(urls) > 1:
+            client = ComfyUIPool(urls, max_concurrency=concurrency,
+                                 on_event=lambda message: console.print(f"[yellow]Warning: {message}[/yellow]"))
+        else:
+            client = ComfyUIClient(server, max_concurrency=concurrency)
+        async with client:
+            async for index, result in client.run_iter(preflight(), dest_dir, on_progress):
+                if isinstance(result, ComfyUIError):
+                    failures.append((labels[index], str(result)))
+                else:
+                    files += len(result["files"])
+                    timings.update((str(path.resolve()), result["seconds"]) for path in result["files"])
+                    if keys[index] is not None and result["files"]:
+                        cache.put(keys[index], result["files"])
+                progress.advance(overall)
+        if len(urls) > 1:
+            for status in client.status():
+                console.print(f"[dim]{status['url']}: {status['completed']} workflow(s)"
+                              + (f", lost {status['lost']}" if status["lost"] else "") + "[/dim]")
+        return len(labels), failures, files, timings
+    
+    columns = [TextColumn("{task.description}"), BarColumn(), MofNCompleteColumn()]
+    try:
+        with Progress(*columns, transient=True) as progress:
+            total, failures, files, timings = asyncio.run(execute(progress))
+    except (OSError, aiohttp.ClientError) as e:
+        console.print(f"[red]Error: cannot reach ComfyUI at {', '.join(urls)}: {e}[/red]")
+        sys.exit(1)
+    finally:
+        if cache:
+            cache.close()
+    
+    total += len(cached)
+    files += len(restored)
+    timings.update(restored)
+    console.print(f"[green]✓ {total - len(failures)}/{total} workflows completed[/green]"
+                  + ("" if no_download else f", {files} file(s) saved to {output_dir}"))
+    if cached:
+        console.print(f"[dim]Render cache: {len(cached)} hit(s), {total - len(cached)} rendered[/dim]")
+    if catalog and timings:
+        from output_catalog import OutputCatalog
+        index = OutputCatalog(project_root)
+        stats = index.ingest([Path(path) for path in timings], timings)
+        index.close()
+        console.print(f"[green]✓ Cataloged {stats['indexed']} image(s)[/green]")
+    if saved["nodes"]:
+        console.print(f"[dim]Optimizer removed {saved['nodes']} node(s): "
+                      f"{saved['encodes']} encode(s), {saved['decodes']} decode(s)[/dim]")
+    for label, error in failures:
+        console.print(f"[red]✗ {label}: {error}[/red]")
+    if failures:
+        sys.exit(1)
+
+@cli.command()
+@click.argument('workflow_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help='Write the API graph here instead of stdout')
+@click.option('--object-info', help='Node definitions (ComfyUI URL or saved /object_info JSON)')
+def compile_workflow(workflow_file, output, object_info):
+    """Compile a UI-format workflow into an API-format graph"""
+    from graph_compiler import GraphCompileError, compile_workflow as compile_graph, fetch_object_info
+    
+    try:
+        definitions = fetch_object_info(object_info) if object_info else None
+    except (OSError, ValueError) as e:
+        err_console.print(f"[red]Error: cannot load node definitions from {object_info}: {e}[/red]")
+        sys.exit(1)
+    with open(workflow_file, 'r') as f:
+        workflow = json.load(f)
+    try:
+        graph, warnings = compile_graph(workflow, definitions)
+    except GraphCompileError as e:
+        err_console.print(f"[red]Error: cannot compile {workflow_file}:[/red]")
+        for problem in e.problems:
+            err_console.print(f"  [red]✗[/red] {problem}")
+        sys.exit(1)
+    for warning in warnings:
+        err_console.print(f"[yellow]Warning: {warning}[/yellow]")
+    
+    text = json.dumps(graph, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + "\n")
+        err_console.print(f"[green]✓ Compiled {len(graph)} nodes to {output}[/green]")
+    else:
+        click.echo(text)
+
+@cli.command()
+@click.argument('workflow_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help='Write the optimized API graph here')
+@click.option('--object-info', help='Node definitions for UI-format input (ComfyUI URL or saved /object_info JSON)')
+def optimize_workflow(workflow_file, output, object_info):
+    """Merge duplicate nodes and drop nodes no output uses"""
+    from graph_compiler import GraphCompileError, ensure_api_format, fetch_object_info
+    from graph_optimizer import format_report, optimize
+    
+    try:
+        definitions = fetch_object_info(object_info) if object_info else None
+        with open(workflow_file, 'r') as f:
+            graph, warnings = ensure_api_format(json.load(f), definitions)
+    except GraphCompileError as e:
+        err_console.print(f"[red]Error: cannot compile {workflow_file}:[/red]")
+        for problem in e.problems:
+            err_console.print(f"  [red]✗[/red] {problem}")
+        sys.exit(1)
+    except (OSError, ValueError) as e:
+        err_console.print(f"[red]Error: {e}[/red]")
+        sys.exit(1)
+    for warning in warnings:
+        err_console.print(f"[yellow]Warning: {warning}[/yellow]")
+    
+    graph, report = optimize(graph, definitions)
+    for kind in ("merged", "dead"):
+        for class_type, count in sorted(report[kind].items()):
+            err_console.print(f"  {'merged' if kind == 'merged' else 'unused'}: {count} x {class_type}")
+    err_console.print(f"[green]✓ {format_report(report)}[/green]")
+    if output:
+        with open(output, 'w') as f:
+            json.dump(graph, f, indent=2)
+    else:
+        click.echo(json.dumps(graph, indent=2))
+
+@cli.command()
+@click.argument('workflow_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--memory-budget', type=float, help='GB the graph may use (default: $PERSONA_MEMORY_BUDGET_GB or 60% of RAM)')
+@click.option('--auto-split', is_flag=True, help='Split an over-budget graph into smaller batches instead of rejecting it')
+@click.option('--output-dir', type=click.Path(file_okay=False), help='Where split graphs go (default: next to the workflow)')
+@click.option('--object-info', help='Node definitions for UI-format input (ComfyUI URL or saved /object_info JSON)')
+def estimate(workflow_file, memory_budget, auto_split, output_dir, object_info):
+    """Estimate a workflow's peak memory and run time before queueing it"""
+    from rich.table import Table
+    from graph_compiler import GraphCompileError, ensure_api_format, fetch_object_info
+    from memory_model import WorkflowEstimator, default_budget_gb, latent_batch, plan_batches, split_to_budget
+    from workflow_batch import batched_graphs
+    
+    project_root = Path(__file__).parent
+    try:
+        definitions = fetch_object_info(object_info) if object_info else None
+        with open(workflow_file, 'r') as f:
+            graph, _warnings = ensure_api_format(json.load(f), definitions)
+        budget = default_budget_gb() if memory_budget is None else memory_budget
+    except GraphCompileError as e:
+        console.print(f"[red]Error: cannot compile {workflow_file}: {e}[/red]")
+        sys.exit(1)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Error: {e}[/red]")
+        sys.exit(1)
+    
+    estimator = WorkflowEstimator(project_root)
+    result = estimator.estimate(graph)
+    
+    table = Table(title=f"Estimate for {workflow_file}")
+    table.add_column("Node", style="cyan")
+    table.add_column("Class", style="green")
+    table.add_column("Output")
+    table.add_column("Working memory", style="yellow", justify="right")
+    table.add_column("Time", justify="right")
+    for row in result["nodes"]:
+        if not (row["shape"] or row["working_gb"] or row["seconds"]):
+            continue
+        kind, batch, width, height = row["shape"] or ("-", 0, 0, 0)
+        table.add_row(
+            row["id"],
+            row["class_type"],
+            f"{kind} {batch}x{width}x{height}" if row["shape"] else "-",
+            f"{row['working_gb']:.2f} GB" if row["working_gb"] else "-",
+            f"{row['seconds']:.0f}s" if row["seconds"] else "-",
+        )
+    console.print(table)
+    console.print(f"Weights {result['weights_gb']:.1f} GB ({result['arch']}), cached tensors {result['cached_gb']:.1f} GB")
+    console.print(f"Peak ~{result['peak_gb']:.1f} GB of {budget:.1f} GB budget, ~{result['seconds'] / 60:.1f} min")
+    
+    if result["peak_gb"] <= budget:
+        console.print(f"[green]✓ Fits the memory budget[/green]")
+        return
+    if not auto_split:
+        console.print(f"[red]✗ Over budget, would likely run out of memory (use --auto-split)[/red]")
+        sys.exit(1)
+    size = None if result["frames"] else split_to_budget(estimator, graph, budget)
+    if size is None:
+        reason = "animation frames can't be split" if result["frames"] else "even a batch of 1 is over budget"
+        console.print(f"[red]✗ Over budget and cannot be split: {reason}[/red]")
+        sys.exit(1)
+    
+    source = Path(workflow_file)
+    target_dir = Path(output_dir) if output_dir else source.parent
+    target_dir.mkdir(parents=True, exist_ok=True)
+    batches = plan_batches(latent_batch(graph), size)
+    parts = zip(batches, batched_graphs(graph, batches))
+    for index, ((_offset, batch), part) in enumerate(parts, start=1):
+        path = target_dir / f"{source.stem}_part{index}.json"
+        with open(path, 'w') as f:
+            json.dump(part, f, indent=2)
+        console.print(f"[green]✓ {path} (batch of {batch})[/green]")
+    console.print(f"[blue]Split into {len(batches)} graphs of up to {size} images, "
+                  f"~{estimator.estimate(next(batched_graphs(graph, batches[:1])))['peak_gb']:.1f} GB each[/blue]")
+
+@cli.command()
+@click.option('--type', 'model_type', help='Only this models/ subdirectory (e.g. loras)')
+@click.option('--arch', type=click.Choice(['sdxl', 'sd15', 'sd2', 'unknown']), help='Base architecture')
+@click.option('--dtype', help='Dominant tensor dtype (e.g. F16, BF16)')
+@click.option('--rank', type=int, help='LoRA rank')
+@click.option('--search', help='Substring of the file name or training output name')
+@click.option('--refresh', is_flag=True, help='Re-read every header instead of using the cache')
+def list_models(model_type, arch, dtype, rank, search, refresh):
     """List all available models"""
+    from model_inventory import ModelInventory
+    from rich.table import Table
+    
     project_root = Path(__file__).parent
-    models_dir = project_root / "models"
+    models = ModelInventory(project_root / "models").refresh(force=refresh)
+    
+    def matches(model):
+        if model_type and model["type"] != model_type:
+            return False
+        if arch and (model.get("arch") or "unknown") != arch:
+            return False
+        if dtype and (model.get("dtype") or "").upper() != dtype.upper():
+            return False
+        if rank is not None and model.get("rank") != rank:
+            return False
+        if search:
+            haystack = f"{model['name']} {model.get('metadata', {}).get('ss_output_name', '')}".lower()
+            if search.lower() not in haystack:
+                return False
+        return True
     
     table = Table(title="Available Models")
     table.add_column("Type", style="cyan")
     table.add_column("Name", style="green")
-    table.add_column("Size", style="yellow")
+    table.add_column("Arch", style="magenta")
+    table.add_column("Dtype")
+    table.add_column("Tensors", justify="right")
+    table.add_column("Rank", justify="right")
+    table.add_column("Size", style="yellow", justify="right")
     
-    for model_type in ["checkpoints", "loras", "controlnet", "vae"]:
-        type_dir = models_dir / model_type
-        if type_dir.exists():
-            for model_file in type_dir.glob("*"):
-                if model_file.is_file():
-                    size = model_file.stat().st_size / (1024 * 1024)  # MB
-                    table.add_row(model_type, model_file.name, f"{size:.1f} MB")
+    for model in filter(matches, models):
+        size = model["size"] / (1024 * 1024)  # MB
+        table.add_row(
+            model["type"],
+            model["name"],
+            model.get("arch") or "-",
+            model.get("dtype") or "-",
+            str(model.get("tensors", "-")),
+            str(model.get("rank") or "-"),
+            f"{size:.1f} MB",
+        )
     
     console.print(table)
 
@@ -360,6 +631,9 @@ def list_models():
 @click.option('--steps', default=4000, help='Training steps')
 def train(persona_id, learning_rate, steps):
     """Train a LoRA for your persona"""
+    import subprocess
+    from rich.prompt import Confirm
+    
     project_root = Path(__file__).parent
     script_path = project_root / "scripts" / "train_lora.sh"
     
@@ -368,7 +642,7 @@ def train(persona_id, learning_rate, steps):
         return
     
     # Check if persona exists
-    from scripts.persona_manager import PersonaManager
+    from persona_manager import PersonaManager
     manager = PersonaManager(project_root)
     persona = manager.get_persona(persona_id)
     
@@ -389,8 +663,12 @@ def train(persona_id, learning_rate, steps):
     subprocess.run(["bash", str(script_path), persona_id, str(learning_rate), str(steps)])
 
 @cli.command()
-def start_ui():
+@click.option('--instances', default=1, help='Servers to start on consecutive ports (each loads its own models)')
+@click.option('--port', default=8188, help='Port of the first server')
+def start_ui(instances, port):
     """Start ComfyUI server"""
+    import subprocess
+    
     project_root = Path(__file__).parent
     script_path = project_root / "scripts" / "run_comfyui.sh"
     
@@ -398,13 +676,31 @@ def start_ui():
         console.print("[red]ComfyUI script not found![/red]")
         return
     
-    console.print("[green]Starting ComfyUI...[/green]")
-    subprocess.run(["bash", str(script_path)])
+    if instances == 1:
+        console.print("[green]Starting ComfyUI...[/green]")
+        subprocess.run(["bash", str(script_path), str(port)])
+        return
+    
+    last = port + instances - 1
+    console.print(f"[green]Starting {instances} ComfyUI servers on ports {port}-{last}...[/green]")
+    console.print(f"Queue across them with: persona_gen.py run --server 127.0.0.1:{port}-{last} ...")
+    processes = [subprocess.Popen(["bash", str(script_path), str(p)]) for p in range(port, last + 1)]
+    try:
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
 
 @cli.command()
 @click.option('--all', is_flag=True, help='Setup everything including model downloads')
 def setup(all):
     """Run initial setup"""
+    import subprocess
+    from rich.prompt import Confirm
+    
     project_root = Path(__file__).parent
     setup_script = project_root / "setup.sh"
     
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+import click
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# (label, script, args) - each is timed as a fresh interpreter
+ENTRY_POINTS = [
+    ("persona_gen.py --help", "persona_gen.py", ["--help"]),
+    ("persona_gen.py list-models", "persona_gen.py", ["list-models"]),
+    ("persona_manager.py --help", "scripts/persona_manager.py", ["--help"]),
+    ("prepare_training_data.py --help", "scripts/prepare_training_data.py", ["--help"]),
+    ("post_process.py --help", "scripts/post_process.py", ["--help"]),
+    ("test_lora_strengths.py --help", "scripts/test_lora_strengths.py", ["--help"]),
+]
+
+def time_command(cmd, runs: int) -> float:
+    """Median wall time of a command in milliseconds"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def slowest_imports(cmd, count: int = 5):
+    """Top cumulative imports from `python -X importtime`"""
+    result = subprocess.run(
+        [cmd[0], "-X", "importtime"] + cmd[1:],
+        cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        # Only top-level imports (no leading indentation in the name column)
+        if len(parts) == 3 and parts[1].strip().isdigit() and not parts[2].startswith("  "):
+            imports.append((int(parts[1]), parts[2].strip()))
+    return sorted(imports, reverse=True)[:count]
+
+@click.command()
+@click.option('--runs', default=7, help='Runs per entry point (median is reported)')
+@click.option('--budget-ms', default=150.0, help='Allowed startup time above a bare interpreter')
+def bench_startup(runs, budget_ms):
+    """Measure CLI startup time and fail if any entry point exceeds its budget"""
+    baseline = time_command([sys.executable, "-c", "pass"], runs)
+    console.print(f"[blue]Bare interpreter: {baseline:.1f} ms (median of {runs})[/blue]")
+
+    table = Table(title="CLI Startup")
+    table.add_column("Entry point", style="cyan")
+    table.add_column("Median", style="yellow")
+    table.add_column("Overhead", style="magenta")
+    table.add_column("Status")
+
+    failures = []
+    for label, script, args in ENTRY_POINTS:
+        cmd = [sys.executable, str(PROJECT_ROOT / script)] + args
+        try:
+            median = time_command(cmd, runs)
+        except subprocess.CalledProcessError:
+            table.add_row(label, "-", "-", "[red]error[/red]")
+            failures.append((label, cmd))
+            continue
+
+        overhead = median - baseline
+        ok = overhead <= budget_ms
+        table.add_row(label, f"{median:.1f} ms", f"{overhead:.1f} ms", "[green]ok[/green]" if ok else "[red]over budget[/red]")
+        if not ok:
+            failures.append((label, cmd))
+
+    console.print(table)
+
+    if failures:
+        for label, cmd in failures:
+            console.print(f"\n[red]{label}: slowest imports[/red]")
+            for micros, module in slowest_imports(cmd):
+                console.print(f"  {micros / 1000:7.1f} ms  {module}")
+        sys.exit(1)
+
+    console.print(f"[green]✓ All entry points within {budget_ms:.0f} ms of interpreter startup[/green]")
+
+if __name__ == '__main__':
+    bench_startup()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Async client for a running ComfyUI server.
+
+Graphs (API format) are queued with POST /prompt, followed over the /ws
+websocket, and their outputs are fetched from /history and /view. One
+pooled aiohttp session serves every request, and a semaphore bounds how
+many prompts are in flight at once. If the websocket drops, waiting
+falls back to polling /history.
+"""
+import asyncio
+import json
+import os
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+import aiohttp
+
+DEFAULT_URL = os.environ.get("COMFYUI_URL", "http://127.0.0.1:8188")
+
+# Keys under a node's history outputs that list downloadable files
+OUTPUT_KINDS = ("images", "gifs", "videos", "audio")
+
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
+
+
+class ComfyUIError(RuntimeError):
+    """ComfyUI rejected or failed to execute a prompt"""
+
+    def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.details = details or {}
+
+
+class ComfyUIClient:
+    def __init__(self, base_url: str = DEFAULT_URL, max_concurrency: int = 4,
+                 poll_interval: float = 0.5, timeout: Optional[float] = None,
+                 claimed_names: Optional[Set[str]] = None, name_tag: str = "",
+                 prompt_timeout: Optional[float] = None):
+        self.base_url = base_url.rstrip("/")
+        self.client_id = uuid.uuid4().hex
+        self.max_concurrency = max_concurrency
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.prompt_timeout = prompt_timeout
+        # Clients of a pool share the names already downloaded, since two
+        # servers number their outputs independently
+        self.claimed_names = claimed_names
+        self.name_tag = name_tag
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._events: Dict[str, asyncio.Queue] = defaultdict(asyncio.Queue)
+        self._finished = set()
+        self._ws = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        # Downloads can overlap with queueing, so allow a few more sockets than prompts
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency * 2 + 1)
+        self.session = aiohttp.ClientSession(
+            connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        ws_url = self.base_url.replace("http", "ws", 1) + f"/ws?clientId={self.client_id}"
+        try:
+            self._ws = await self.session.ws_connect(ws_url, heartbeat=30)
+        except aiohttp.ClientError:
+            self._ws = None  # progress unavailable, wait() will poll /history
+        else:
+            self._reader = asyncio.create_task(self._read_events())
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+        if self._ws is not None:
+            await self._ws.close()
+        if self.session is not None:
+            await self.session.close()
+
+    async def _read_events(self):
+        """Route websocket messages to a queue per prompt id"""
+        try:
+            async for msg in self._ws:
+                # Binary frames are latent previews, not needed here
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                event = json.loads(msg.data)
+                data = event.get("data") or {}
+                prompt_id = data.get("prompt_id")
+                if prompt_id in self._finished:
+                    # Late messages for prompts already waited on would otherwise
+                    # start a new queue; the last one ends the prompt for good
+                    if _is_final(event["type"], data):
+                        self._finished.discard(prompt_id)
+                elif prompt_id:
+                    self._events[prompt_id].put_nowait(event)
+        finally:
+            self._ws = None
+            self._finished.clear()
+            for queue in self._events.values():
+                queue.put_nowait({"type": "_disconnected"})
+
+    async def _json(self, method: str, path: str, **kwargs) -> Any:
+        async with self.session.request(method, self.base_url + path, **kwargs) as response:
+            body = await response.text()
+            if response.status >= 400:
+                try:
+                    details = json.loads(body)
+                except ValueError:
+                    details = {"error": body}
+                raise ComfyUIError(f"{method} {path} failed with HTTP {response.status}: "
+                                   f"{_error_message(details)}", details)
+            return json.loads(body) if body else None
+
+    async def system_stats(self) -> Dict[str, Any]:
+        return await self._json("GET", "/system_stats")
+
+    async def free(self, unload_models: bool = False, free_memory: bool = True):
+        """POST /free: drop cached node outputs, and loaded models if unload_models"""
+        await self._json("POST", "/free", json={"unload_models": unload_models, "free_memory": free_memory})
+
+    async def queue_prompt(self, graph: Dict[str, Any]) -> str:
+        """Queue an API-format graph and return its prompt id"""
+        result = await self._json("POST", "/prompt", json={"prompt": graph, "client_id": self.client_id})
+        if result.get("node_errors"):
+            raise ComfyUIError(f"Prompt rejected: {_error_message(result)}", result)
+        return result["prompt_id"]
+
+    async def history(self, prompt_id: str) -> Optional[Dict[str, Any]]:
+        result = await self._json("GET", f"/history/{prompt_id}")
+        return (result or {}).get(prompt_id)
+
+    async def wait(self, prompt_id: str, on_progress: Optional[ProgressCallback] = None,
+                   timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Block until the prompt finishes and return its history entry
+
+        Raises TimeoutError if it hasn't finished after timeout seconds.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+
+        def remaining() -> Optional[float]:
+            if deadline is None:
+                return None
+            left = deadline - loop.time()
+            if left <= 0:
+                raise TimeoutError(f"Prompt {prompt_id} did not finish within {timeout:g}s")
+            return left
+
+        queue = self._events[prompt_id]
+        final = False
+        try:
+            while self._ws is not None or not queue.empty():
+                try:
+                    event = await asyncio.wait_for(queue.get(), remaining())
+                except asyncio.TimeoutError:
+                    remaining()
+                    continue
+                kind, data = event["type"], event.get("data", {})
+                if kind == "_disconnected":
+                    break
+                if on_progress is not None:
+                    on_progress(kind, data)
+                if kind == "execution_error":
+                    raise ComfyUIError(
+                        f"Node {data.get('node_id')} ({data.get('node_type')}) failed: "
+                        f"{data.get('exception_message', '').strip()}", data)
+                if kind == "execution_interrupted":
+                    raise ComfyUIError("Execution interrupted", data)
+                final = _is_final(kind, data)
+                if final or kind == "execution_success":
+                    break
+        finally:
+            # Remembered only until the prompt's last message arrives
+            if self._ws is not None and not final:
+                self._finished.add(prompt_id)
+            self._events.pop(prompt_id, None)
+
+        # The websocket only signals completion, outputs come from history
+        while True:
+            entry = await self.history(prompt_id)
+            if entry is not None and entry.get("status", {}).get("completed", True):
+                status = entry.get("status", {})
+                if status.get("status_str") == "error":
+                    raise ComfyUIError(f"Prompt {prompt_id} failed", status)
+                return entry
+            left = remaining()
+            await asyncio.sleep(self.poll_interval if left is None else min(self.poll_interval, left))
+
+    async def download(self, file_info: Dict[str, str], dest_dir: Path) -> Path:
+        """Stream one output file from /view into dest_dir"""
+        params = {
+            "filename": file_info["filename"],
+            "subfolder": file_info.get("subfolder", ""),
+            "type": file_info.get("type", "output"),
+        }
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        name = Path(file_info["filename"]).name
+        if self.claimed_names is not None:
+            if name in self.claimed_names:
+                name = f"{Path(name).stem}_{self.name_tag}{Path(name).suffix}"
+            self.claimed_names.add(name)
+        dest = dest_dir / name
+        tmp = dest.with_name(f".{dest.name}.part")
+        async with self.session.get(self.base_url + "/view", params=params) as response:
+            if response.status >= 400:
+                raise ComfyUIError(f"GET /view failed with HTTP {response.status} for {params['filename']}")
+            with open(tmp, 'wb') as f:
+                async for chunk in response.content.iter_chunked(1 << 16):
+                    f.write(chunk)
+        os.replace(tmp, dest)
+        return dest
+
+    async def run(self, graph: Dict[str, Any], dest_dir: Optional[Path] = None,
+                  on_progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Queue, wait and (optionally) download outputs, bounded by max_concurrency
+
+        Returns {"prompt_id", "outputs": history outputs, "files": [paths],
+        "seconds": execution time, excluding time spent queued}.
+        """
+        async with self._semaphore:
+            prompt_id = await self.queue_prompt(graph)
+            loop = asyncio.get_running_loop()
+            started = [loop.time()]
+
+            def track(kind, data):
+                if kind == "execution_start":
+                    started[0] = loop.time()
+                if on_progress is not None:
+                    on_progress(kind, data)
+
+            track("queued", {"prompt_id": prompt_id})
+            try:
+                entry = await self.wait(prompt_id, track, self.prompt_timeout)
+            finally:
+                track("finished", {"prompt_id": prompt_id})
+            seconds = loop.time() - started[0]
+
+            files = []
+            if dest_dir is not None:
+                infos = [info for output in entry.get("outputs", {}).values()
+                         for kind in OUTPUT_KINDS for info in output.get(kind, [])
+                         if info.get("type", "output") == "output"]
+                files = await asyncio.gather(*(self.download(info, dest_dir) for info in infos))
+            return {"prompt_id": prompt_id, "outputs": entry.get("outputs", {}), "files": list(files),
+                    "seconds": seconds}
+
+    def run_iter(self, graphs: Iterable[Dict[str, Any]], dest_dir: Optional[Path] = None,
+                 on_progress: Optional[ProgressCallback] = None) -> AsyncIterator[Tuple[int, Any]]:
+        """Run graphs from any iterable, yielding (index, result) as each finishes
+
+        At most max_concurrency graphs are pulled from the iterable at a
+        time, so a large JSONL sweep is never held in memory. A failed
+        prompt yields its ComfyUIError instead of a result.
+        """
+        return run_each(lambda graph: self.run(graph, dest_dir, on_progress), graphs, self.max_concurrency)
+
+
+async def run_each(run: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]], graphs: Iterable[Dict[str, Any]],
+                   max_concurrency: int) -> AsyncIterator[Tuple[int, Any]]:
+    """The run_iter loop for anything with a run(graph) coroutine
+
+    run picks where each graph goes (one client, or the best server of a
+    pool) and does the queue/wait/download; this keeps max_concurrency of
+    them in flight and yields (index, result or ComfyUIError) as they finish.
+    """
+    async def run_one(index, graph):
+        try:
+            return index, await run(graph)
+        except ComfyUIError as e:
+            return index, e
+
+    pending = set()
+    for index, graph in enumerate(graphs):
+        if len(pending) >= max_concurrency:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+        pending.add(asyncio.create_task(run_one(index, graph)))
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            yield task.result()
+
+
+def _is_final(kind: str, data: Dict[str, Any]) -> bool:
+    """ComfyUI's last message for a prompt: "executing" with no node"""
+    return kind == "executing" and data.get("node") is None
+
+
+def _error_message(details: Dict[str, Any]) -> str:
+    """Flatten ComfyUI's {"error": ..., "node_errors": {...}} into one line"""
+    error = details.get("error")
+    parts = [error.get("message", str(error)) if isinstance(error, dict) else str(error or "")]
+    for node_id, node_error in (details.get("node_errors") or {}).items():
+        for err in node_error.get("errors", []):
+            parts.append(f"node {node_id} ({node_error.get('class_type')}): {err.get('message')} "
+                         f"{err.get('details', '')}".strip())
+    return "; ".join(part for part in parts if part)
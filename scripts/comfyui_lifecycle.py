@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Keep ComfyUI's models warm across LoRA retrains.
+
+Restarting ComfyUI to pick up a retrained LoRA throws away the loaded
+base checkpoint along with everything else. Instead, POST /free with
+free_memory resets ComfyUI's cached node outputs (where the stale LoRA
+patch lives) without unloading models, and a tiny warm-up prompt (64x64,
+one step, previewed rather than saved) loads the checkpoint and the new
+LoRA before the first real job asks for them.
+
+ComfyUI doesn't report what it has loaded, so warmth is tracked here:
+a model is warm while the server still has the warm-up prompt in its
+history (a restart clears it) and nothing was unloaded since. A LoRA
+turns stale when its file changes or a /free drops the patched model
+outputs, the checkpoint stays loaded through the latter.
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import click
+
+from lazy_console import LazyConsole
+
+console = LazyConsole()
+
+STATE_FILE = ".persona_lifecycle.json"
+DEFAULT_URL = os.environ.get("COMFYUI_URL", "http://127.0.0.1:8188")
+START_TIMEOUT = 180.0
+
+
+def _file_identity(path: Path) -> Optional[List[int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def warmup_graph(ckpt_name: str, lora_name: Optional[str] = None) -> Dict[str, Any]:
+    """The persona portrait graph shrunk to one step at 64x64, previewed instead of saved"""
+    from workflow_templates import get_template
+
+    graph = get_template("persona_image_api").render(
+        ckpt_name=ckpt_name, lora_name=lora_name or "", prompt="warm-up",
+        width=64, height=64, batch_size=1, steps=1, seed=0,
+    )
+    graph["8"] = {"class_type": "PreviewImage", "inputs": {"images": graph["8"]["inputs"]["images"]}}
+    if not lora_name:
+        # Checkpoint only: bypass the LoRA loader
+        del graph["2"]
+        for node in graph.values():
+            for name, value in node["inputs"].items():
+                if isinstance(value, list) and value[:1] == ["2"]:
+                    node["inputs"][name] = ["1", value[1]]
+    return graph
+
+
+class ComfyUILifecycle:
+    def __init__(self, project_root: Path, url: str = DEFAULT_URL):
+        self.project_root = project_root
+        self.url = url.rstrip("/")
+        self.comfyui_dir = project_root / "ComfyUI"
+        self.state_file = self.comfyui_dir / STATE_FILE
+
+    def _load_state(self) -> Dict[str, Any]:
+        if self.state_file.exists():
+            with open(self.state_file, 'r') as f:
+                return json.load(f).get("servers", {}).get(self.url, {})
+        return {}
+
+    def _save_state(self, server: Dict[str, Any]):
+        servers = {}
+        if self.state_file.exists():
+            with open(self.state_file, 'r') as f:
+                servers = json.load(f).get("servers", {})
+        servers[self.url] = server
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_file.with_name(f"{STATE_FILE}.{os.getpid()}.tmp")
+        with open(tmp, 'w') as f:
+            json.dump({"version": 1, "servers": servers}, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.state_file)
+
+    def _lora_path(self, lora_name: str) -> Path:
+        return self.comfyui_dir / "models" / "loras" / lora_name
+
+    async def _call(self, action):
+        from comfyui_client import ComfyUIClient
+
+        async with ComfyUIClient(self.url, max_concurrency=1) as client:
+            return await action(client)
+
+    def is_up(self) -> bool:
+        import aiohttp
+
+        try:
+            asyncio.run(self._call(lambda client: client.system_stats()))
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+            return False
+        return True
+
+    def start(self, port: int, timeout: float = START_TIMEOUT) -> bool:
+        """Launch run_comfyui.sh in the background unless the server is up, returns True if launched"""
+        if self.is_up():
+            return False
+        log = open(self.comfyui_dir / "comfyui.log", 'ab') if self.comfyui_dir.exists() else subprocess.DEVNULL
+        subprocess.Popen(["bash", str(self.project_root / "scripts" / "run_comfyui.sh"), str(port)],
+                         stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+        deadline = time.monotonic() + timeout
+        while not self.is_up():
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"ComfyUI did not come up at {self.url} within {timeout:.0f}s")
+            time.sleep(1)
+        self._save_state({})
+        return True
+
+    def warm(self, ckpt_name: str, lora_name: Optional[str] = None) -> float:
+        """Load ckpt_name (and lora_name) with a warm-up prompt, returns its seconds"""
+        async def action(client):
+            result = await client.run(warmup_graph(ckpt_name, lora_name))
+            return result["prompt_id"], result["seconds"]
+
+        prompt_id, seconds = asyncio.run(self._call(action))
+        loras = {lora_name: _file_identity(self._lora_path(lora_name))} if lora_name else {}
+        self._save_state({"prompt_id": prompt_id, "checkpoint": ckpt_name, "loras": loras,
+                          "warmed_at": time.time()})
+        return seconds
+
+    def free(self, unload_models: bool = False):
+        """Drop cached node outputs (stale LoRA patches), keeping models loaded unless unload_models"""
+        asyncio.run(self._call(lambda client: client.free(unload_models=unload_models)))
+        if unload_models:
+            self._save_state({})
+            return
+        state = self._load_state()
+        if state.get("prompt_id"):
+            # The next job re-patches the LoRAs onto the still-loaded checkpoint
+            state["freed_at"] = time.time()
+            self._save_state(state)
+
+    def refresh_lora(self, ckpt_name: str, lora_name: str) -> float:
+        """Swap a retrained LoRA in without restarting: free node caches, then warm up again"""
+        self.free(unload_models=False)
+        return self.warm(ckpt_name, lora_name)
+
+    def status(self) -> Dict[str, Any]:
+        """{"up", "models": {name: "warm" | "stale" | "cold"}} as far as this client can tell"""
+        if not self.is_up():
+            return {"up": False, "models": {}}
+        state = self._load_state()
+        if not state.get("prompt_id"):
+            return {"up": True, "models": {}}
+        alive = asyncio.run(self._call(lambda client: client.history(state["prompt_id"]))) is not None
+        models = {state["checkpoint"]: "warm" if alive else "cold"}
+        for lora_name, identity in state.get("loras", {}).items():
+            if not alive:
+                models[lora_name] = "cold"
+            elif state.get("freed_at") or _file_identity(self._lora_path(lora_name)) != identity:
+                models[lora_name] = "stale"
+            else:
+                models[lora_name] = "warm"
+        return {"up": True, "models": models}
+
+
+def _persona_lora(project_root: Path, persona_id: str) -> str:
+    from persona_manager import PersonaManager
+    from workflow_templates import lora_name
+
+    persona = PersonaManager(project_root).get_persona(persona_id)
+    if not persona or not persona.get("lora_file"):
+        raise click.ClickException(f"Persona {persona_id} not found or not trained yet")
+    return lora_name(persona["lora_file"])
+
+
+def _default_checkpoint() -> str:
+    from workflow_templates import get_template
+
+    return get_template("persona_image_api").defaults["ckpt_name"]
+
+
+@click.group()
+@click.option('--server', envvar='COMFYUI_URL', default='http://127.0.0.1:8188', help='ComfyUI URL (or $COMFYUI_URL)')
+@click.pass_context
+def cli(ctx, server):
+    """Start, warm up and refresh a ComfyUI server without restarts"""
+    ctx.obj = ComfyUILifecycle(Path(__file__).parent.parent, server)
+
+
+def _warm(lifecycle: ComfyUILifecycle, ckpt_name: str, lora: Optional[str]):
+    seconds = lifecycle.warm(ckpt_name, lora)
+    console.print(f"[green]✓ Warm: {ckpt_name}{f' + {lora}' if lora else ''} ({seconds:.1f}s)[/green]")
+
+
+@cli.command()
+@click.option('--port', default=8188, help='Port to start ComfyUI on')
+@click.option('--checkpoint', help='Checkpoint to preload (default: the persona template\'s)')
+@click.option('--persona-id', help='Also preload this persona\'s LoRA')
+@click.option('--timeout', default=START_TIMEOUT, help='Seconds to wait for the server to come up')
+@click.pass_obj
+def start(lifecycle, port, checkpoint, persona_id, timeout):
+    """Start ComfyUI if it isn't running and preload models"""
+    lora = _persona_lora(lifecycle.project_root, persona_id) if persona_id else None
+    try:
+        launched = lifecycle.start(port, timeout)
+    except TimeoutError as e:
+        console.print(f"[red]Error: {e}[/red]")
+        sys.exit(1)
+    console.print(f"[green]✓ ComfyUI {'started' if launched else 'already running'} at {lifecycle.url}[/green]")
+    _warm(lifecycle, checkpoint or _default_checkpoint(), lora)
+
+
+@cli.command()
+@click.option('--checkpoint', help='Checkpoint to keep warm (default: the persona template\'s)')
+@click.option('--persona-id', help='Persona whose LoRA to preload')
+@click.pass_obj
+def warm(lifecycle, checkpoint, persona_id):
+    """Load models now so the next job doesn't wait for them"""
+    lora = _persona_lora(lifecycle.project_root, persona_id) if persona_id else None
+    _warm(lifecycle, checkpoint or _default_checkpoint(), lora)
+
+
+@cli.command('refresh-lora')
+@click.argument('persona_id')
+@click.option('--checkpoint', help='Checkpoint to keep warm (default: the persona template\'s)')
+@click.option('--port', default=8188, help='Port to start ComfyUI on if it isn\'t running')
+@click.pass_obj
+def refresh_lora(lifecycle, persona_id, checkpoint, port):
+    """Pick up a retrained LoRA, keeping the base checkpoint loaded"""
+    from comfyui_client import ComfyUIError
+
+    lora = _persona_lora(lifecycle.project_root, persona_id)
+    checkpoint = checkpoint or _default_checkpoint()
+    try:
+        if lifecycle.start(port):
+            console.print(f"[green]✓ ComfyUI started at {lifecycle.url}[/green]")
+        else:
+            lifecycle.free(unload_models=False)
+            console.print("[green]✓ Dropped cached node outputs, models kept loaded[/green]")
+        _warm(lifecycle, checkpoint, lora)
+    except (TimeoutError, ComfyUIError) as e:
+        console.print(f"[red]Error: {e}[/red]")
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('--unload-models', is_flag=True, help='Also unload every model (the next job loads cold)')
+@click.pass_obj
+def free(lifecycle, unload_models):
+    """Ask ComfyUI to drop its caches"""
+    lifecycle.free(unload_models)
+    console.print(f"[green]✓ Freed {'caches and models' if unload_models else 'cached node outputs'}[/green]")
+
+
+@cli.command()
+@click.pass_obj
+def status(lifecycle):
+    """Show whether the server is up and which models are warm"""
+    report = lifecycle.status()
+    if not report["up"]:
+        console.print(f"[red]ComfyUI at {lifecycle.url} is not running[/red]")
+        sys.exit(1)
+    console.print(f"[green]ComfyUI at {lifecycle.url} is up[/green]")
+    if not report["models"]:
+        console.print("[dim]No models warmed since it started or unloaded them (next job loads cold)[/dim]")
+    colors = {"warm": "green", "stale": "yellow", "cold": "dim"}
+    for name, state in report["models"].items():
+        console.print(f"  [{colors[state]}]{state:5}[/{colors[state]}] {name}")
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Dispatch workflows across several ComfyUI servers.
+
+Every instance is health-checked through GET /queue, which also reports
+prompts queued there by other clients. A job goes to the instance where
+it is expected to start soonest: its backlog times the job's estimated
+run time, plus the model reload it would cause there (see
+job_scheduler.switch_seconds), so jobs sharing a checkpoint and LoRA set
+stick to the instance that already has them loaded. When an instance
+stops answering, the jobs it was running are queued again elsewhere and
+it rejoins the pool once its health check passes.
+"""
+import asyncio
+import sys
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+import click
+
+from comfyui_client import ComfyUIClient, ComfyUIError, ProgressCallback, run_each
+from job_scheduler import affinity_key, estimate_seconds, switch_seconds
+
+HEALTH_INTERVAL = 5.0
+HEALTH_TIMEOUT = 3.0
+# How long to wait for any instance to come back before failing jobs
+REVIVE_TIMEOUT = 30.0
+MAX_ATTEMPTS = 3
+
+# Errors meaning the server is gone, as opposed to the prompt failing
+CONNECTION_ERRORS = (aiohttp.ClientConnectionError, asyncio.TimeoutError, OSError)
+
+
+class Instance:
+    def __init__(self, index: int, url: str, capacity: int):
+        self.index = index
+        self.url = url.rstrip("/")
+        self.capacity = capacity
+        self.client: Optional[ComfyUIClient] = None
+        self.healthy = False
+        self.in_flight = 0
+        self.backlog = 0  # prompts queued there by other clients
+        self.key = None  # affinity key of the last job sent, i.e. what it has loaded
+        self.completed = 0
+        self.lost = 0
+        self.error: Optional[str] = None
+
+    @property
+    def load(self) -> int:
+        return self.in_flight + self.backlog
+
+
+class ComfyUIPool:
+    """Same run/run_iter interface as ComfyUIClient, over several servers"""
+
+    def __init__(self, urls: Iterable[str], max_concurrency: int = 2,
+                 health_interval: float = HEALTH_INTERVAL, revive_timeout: float = REVIVE_TIMEOUT,
+                 max_attempts: int = MAX_ATTEMPTS, timeout: Optional[float] = None,
+                 on_event: Optional[Callable[[str], None]] = None):
+        self.instances = [Instance(index, url, max_concurrency) for index, url in enumerate(urls)]
+        if not self.instances:
+            raise ValueError("A pool needs at least one ComfyUI URL")
+        self.max_concurrency = max_concurrency * len(self.instances)
+        self.health_interval = health_interval
+        self.revive_timeout = revive_timeout
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.on_event = on_event or (lambda message: None)
+        self._names = set()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._changed: Optional[asyncio.Condition] = None
+        self._monitor: Optional[asyncio.Task] = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=HEALTH_TIMEOUT))
+        self._changed = asyncio.Condition()
+        await asyncio.gather(*(self.check(instance) for instance in self.instances))
+        if not any(instance.healthy for instance in self.instances):
+            errors = "; ".join(f"{instance.url}: {instance.error}" for instance in self.instances)
+            await self.close()
+            raise ConnectionError(f"No ComfyUI instance is reachable ({errors})")
+        self._monitor = asyncio.create_task(self._watch())
+
+    async def close(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+        for instance in self.instances:
+            if instance.client is not None:
+                await instance.client.close()
+        if self._session is not None:
+            await self._session.close()
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await asyncio.gather(*(self.check(instance) for instance in self.instances))
+
+    async def check(self, instance: Instance) -> bool:
+        """Health-check one instance, (re)connecting it when it comes up"""
+        try:
+            async with self._session.get(instance.url + "/queue") as response:
+                response.raise_for_status()
+                queue = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            await self._lost(instance, e)
+            return False
+        queued = len(queue.get("queue_running", [])) + len(queue.get("queue_pending", []))
+        instance.backlog = max(0, queued - instance.in_flight)
+        if instance.healthy:
+            return True
+        if instance.in_flight:
+            return False  # let requests on the old connection fail out first
+        if instance.client is not None:
+            await instance.client.close()
+        instance.client = ComfyUIClient(instance.url, instance.capacity, timeout=self.timeout,
+                                        claimed_names=self._names, name_tag=f"i{instance.index}")
+        await instance.client.open()
+        # A restarted server has nothing loaded
+        instance.healthy, instance.key, instance.error = True, None, None
+        async with self._changed:
+            self._changed.notify_all()
+        return True
+
+    async def _lost(self, instance: Instance, error: Exception):
+        if instance.healthy:
+            self.on_event(f"{instance.url} is down ({error or type(error).__name__})")
+        instance.healthy, instance.key = False, None
+        instance.error = str(error) or type(error).__name__
+        async with self._changed:
+            self._changed.notify_all()
+
+    def _cost(self, instance: Instance, key, seconds: float) -> float:
+        """Seconds until a job could start finishing on instance"""
+        return instance.load * seconds + switch_seconds(instance.key, key)
+
+    async def _acquire(self, key, seconds: float) -> Instance:
+        loop = asyncio.get_running_loop()
+        deadline = None
+        async with self._changed:
+            while True:
+                alive = [instance for instance in self.instances if instance.healthy]
+                free = [instance for instance in alive if instance.in_flight < instance.capacity]
+                if free:
+                    instance = min(free, key=lambda i: (self._cost(i, key, seconds), i.load, i.index))
+                    instance.in_flight += 1
+                    instance.key = key
+                    return instance
+                if alive:
+                    deadline = None
+                    await self._changed.wait()
+                    continue
+                deadline = deadline or loop.time() + self.revive_timeout
+                if loop.time() >= deadline:
+                    raise ComfyUIError("No healthy ComfyUI instance left in the pool")
+                try:
+                    await asyncio.wait_for(self._changed.wait(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _release(self, instance: Instance):
+        instance.in_flight -= 1
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def run(self, graph: Dict[str, Any], dest_dir: Optional[Path] = None,
+                  on_progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """ComfyUIClient.run on the best instance, moving on if it dies
+
+        The result also carries "server", the URL that rendered it.
+        """
+        key, seconds = affinity_key(graph), estimate_seconds(graph)
+        for attempt in range(1, self.max_attempts + 1):
+            instance = await self._acquire(key, seconds)
+            try:
+                result = await instance.client.run(graph, dest_dir, on_progress)
+            except CONNECTION_ERRORS as e:
+                instance.lost += 1
+                await self._lost(instance, e)
+                if attempt == self.max_attempts:
+                    raise ComfyUIError(f"Lost {attempt} ComfyUI instances while running this prompt: {e}")
+                self.on_event(f"re-queueing a prompt from {instance.url}")
+                continue
+            finally:
+                await self._release(instance)
+            instance.completed += 1
+            result["server"] = instance.url
+            return result
+
+    def run_iter(self, graphs: Iterable[Dict[str, Any]], dest_dir: Optional[Path] = None,
+                 on_progress: Optional[ProgressCallback] = None) -> AsyncIterator[Tuple[int, Any]]:
+        """Like ComfyUIClient.run_iter, with the pool's total capacity in flight"""
+        return run_each(lambda graph: self.run(graph, dest_dir, on_progress), graphs, self.max_concurrency)
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [{"url": instance.url, "healthy": instance.healthy, "in_flight": instance.in_flight,
+                 "backlog": instance.backlog, "completed": instance.completed, "lost": instance.lost,
+                 "error": instance.error} for instance in self.instances]
+
+
+def server_urls(servers: Iterable[str]) -> List[str]:
+    """Expand "host:8188-8191" port ranges and comma lists into URLs"""
+    urls = []
+    for entry in servers:
+        for server in filter(None, entry.split(",")):
+            if "://" not in server:
+                server = "http://" + server
+            base, _, ports = server.rpartition(":")
+            if "-" in ports and base.count(":") == 1:
+                first, last = (int(port) for port in ports.split("-"))
+                urls.extend(f"{base}:{port}" for port in range(first, last + 1))
+            else:
+                urls.append(server)
+    return urls
+
+
+@click.command()
+@click.argument('servers', nargs=-1, required=True)
+def main(servers):
+    """Show health and queue length of ComfyUI servers
+
+    SERVERS are URLs, comma lists or port ranges (127.0.0.1:8188-8191).
+    """
+    async def probe():
+        pool = ComfyUIPool(server_urls(servers), health_interval=3600)
+        try:
+            await pool.open()
+        except ConnectionError:
+            pass
+        else:
+            await pool.close()
+        return pool.status()
+
+    statuses = asyncio.run(probe())
+    for status in statuses:
+        state = f"up, {status['backlog']} queued" if status["healthy"] else f"down ({status['error']})"
+        print(f"{status['url']}: {state}")
+    sys.exit(0 if any(status["healthy"] for status in statuses) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the ComfyUI HTTP API.
+
+Speaks the subset the async client uses: POST /prompt, the /ws progress
+stream, /history, /view, /queue, /system_stats and /free. Prompts execute one at
+a time like the real server: every node reports "executing", samplers
+step through "progress", and SaveImage-style nodes write a tiny PNG, so
+queue -> progress -> download can be exercised without a GPU or models.
+"""
+import asyncio
+import itertools
+import json
+import struct
+import uuid
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import click
+from aiohttp import WSMsgType, web
+
+SAMPLER_NODES = {"KSampler", "KSamplerAdvanced", "SamplerCustom"}
+IMAGE_OUTPUT_NODES = {"SaveImage", "PreviewImage"}
+VIDEO_OUTPUT_NODES = {"ADE_VideoCombine", "VHS_VideoCombine"}
+FAIL_NODE = "StandInFail"  # lets callers exercise execution_error
+WORKER = web.AppKey("worker", asyncio.Task)
+
+
+def tiny_png(width: int = 1, height: int = 1, text: Optional[Dict[str, str]] = None) -> bytes:
+    """A valid grey PNG with optional tEXt chunks, built with zlib only"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    rows = b"".join(b"\x00" + b"\x80" * width for _ in range(height))
+    png = b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+    for key, value in (text or {}).items():
+        png += chunk(b"tEXt", key.encode("latin-1") + b"\x00" + value.encode("latin-1", "replace"))
+    return png + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+
+def validate_prompt(graph: Any) -> Tuple[Optional[str], Dict[str, Any]]:
+    """Return (error, node_errors) in ComfyUI's shape, (None, {}) if the graph is runnable"""
+    if not isinstance(graph, dict) or not graph:
+        return "Prompt has no nodes", {}
+    if "nodes" in graph and "links" in graph:
+        return "Prompt is in UI format, export it with 'Save (API Format)'", {}
+
+    node_errors = {}
+    for node_id, node in graph.items():
+        if not isinstance(node, dict) or "class_type" not in node:
+            return f"Node {node_id} has no class_type", {}
+        errors = []
+        for name, value in node.get("inputs", {}).items():
+            if isinstance(value, list) and len(value) == 2 and str(value[0]) not in graph:
+                errors.append({"message": "Required input is missing",
+                               "details": f"{name} links to missing node {value[0]}"})
+        if errors:
+            node_errors[node_id] = {"errors": errors, "class_type": node["class_type"]}
+    if node_errors:
+        return "Prompt outputs failed validation", node_errors
+    return None, {}
+
+
+class StandInServer:
+    def __init__(self, output_dir: Path, step_delay: float = 0.0):
+        self.output_dir = output_dir
+        self.step_delay = step_delay
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.pending: List[str] = []
+        self.history: Dict[str, Dict[str, Any]] = {}
+        self.sockets: Dict[str, web.WebSocketResponse] = {}
+        self.counter = itertools.count(1)
+        self.number = itertools.count()
+        self.prompts_run = 0
+        self.free_requests: List[Dict[str, Any]] = []
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([
+            web.post("/prompt", self.post_prompt),
+            web.get("/prompt", self.get_prompt),
+            web.get("/ws", self.websocket),
+            web.get("/history", self.get_history),
+            web.get("/history/{prompt_id}", self.get_history),
+            web.get("/view", self.view),
+            web.get("/queue", self.get_queue),
+            web.get("/system_stats", self.system_stats),
+            web.post("/free", self.free),
+        ])
+        app.on_startup.append(self._start_worker)
+        app.on_cleanup.append(self._stop_worker)
+        return app
+
+    async def _start_worker(self, app):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        app[WORKER] = asyncio.create_task(self._worker())
+
+    async def _stop_worker(self, app):
+        app[WORKER].cancel()
+
+    async def _send(self, client_id: Optional[str], kind: str, data: Dict[str, Any]):
+        ws = self.sockets.get(client_id)
+        if ws is not None and not ws.closed:
+            await ws.send_str(json.dumps({"type": kind, "data": data}))
+
+    async def post_prompt(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        graph = body.get("prompt")
+        error, node_errors = validate_prompt(graph)
+        if error:
+            return web.json_response(
+                {"error": {"type": "prompt_outputs_failed_validation", "message": error},
+                 "node_errors": node_errors},
+                status=400,
+            )
+        prompt_id = str(uuid.uuid4())
+        number = next(self.number)
+        self.pending.append(prompt_id)
+        await self.queue.put((prompt_id, number, graph, body.get("client_id")))
+        return web.json_response({"prompt_id": prompt_id, "number": number, "node_errors": {}})
+
+    async def get_prompt(self, request: web.Request) -> web.Response:
+        return web.json_response({"exec_info": {"queue_remaining": len(self.pending)}})
+
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        client_id = request.query.get("clientId") or uuid.uuid4().hex
+        self.sockets[client_id] = ws
+        await ws.send_str(json.dumps({"type": "status", "data": {
+            "status": {"exec_info": {"queue_remaining": len(self.pending)}}, "sid": client_id}}))
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.ERROR:
+                    break
+        finally:
+            self.sockets.pop(client_id, None)
+        return ws
+
+    async def get_history(self, request: web.Request) -> web.Response:
+        prompt_id = request.match_info.get("prompt_id")
+        if prompt_id is None:
+            return web.json_response(self.history)
+        entry = self.history.get(prompt_id)
+        return web.json_response({prompt_id: entry} if entry else {})
+
+    async def view(self, request: web.Request) -> web.StreamResponse:
+        filename = request.query.get("filename", "")
+        subfolder = request.query.get("subfolder", "")
+        path = (self.output_dir / subfolder / filename).resolve()
+        if self.output_dir.resolve() not in path.parents or not path.is_file():
+            return web.Response(status=404)
+        return web.FileResponse(path)
+
+    async def get_queue(self, request: web.Request) -> web.Response:
+        return web.json_response({"queue_running": self.pending[:1], "queue_pending": self.pending[1:]})
+
+    async def system_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "system": {"os": "standin", "comfyui_version": "standin", "python_version": ""},
+            "devices": [{"name": "standin", "type": "cpu", "vram_total": 0, "vram_free": 0}],
+        })
+
+    async def free(self, request: web.Request) -> web.Response:
+        self.free_requests.append(await request.json())
+        return web.Response(status=200)
+
+    async def _worker(self):
+        while True:
+            prompt_id, number, graph, client_id = await self.queue.get()
+            await self._execute(prompt_id, number, graph, client_id)
+            self.pending.remove(prompt_id)
+            self.prompts_run += 1
+
+    async def _execute(self, prompt_id: str, number: int, graph: Dict[str, Any], client_id: Optional[str]):
+        await self._send(client_id, "execution_start", {"prompt_id": prompt_id})
+        outputs, status = {}, "success"
+        messages = [["execution_start", {"prompt_id": prompt_id}]]
+        for node_id, node in graph.items():
+            class_type = node["class_type"]
+            await self._send(client_id, "executing", {"node": node_id, "display_node": node_id, "prompt_id": prompt_id})
+            if class_type == FAIL_NODE:
+                error = {"prompt_id": prompt_id, "node_id": node_id, "node_type": class_type,
+                         "exception_message": "Stand-in failure requested", "exception_type": "RuntimeError"}
+                await self._send(client_id, "execution_error", error)
+                messages.append(["execution_error", error])
+                status = "error"
+                break
+            if class_type in SAMPLER_NODES:
+                steps = int(node["inputs"].get("steps", 20))
+                for step in range(1, steps + 1):
+                    if self.step_delay:
+                        await asyncio.sleep(self.step_delay)
+                    await self._send(client_id, "progress",
+                                     {"value": step, "max": steps, "prompt_id": prompt_id, "node": node_id})
+            if class_type in IMAGE_OUTPUT_NODES or class_type in VIDEO_OUTPUT_NODES:
+                output = self._write_output(node, graph, class_type in VIDEO_OUTPUT_NODES)
+                outputs[node_id] = output
+                await self._send(client_id, "executed", {"node": node_id, "output": output, "prompt_id": prompt_id})
+            await asyncio.sleep(0)
+
+        if status == "success":
+            await self._send(client_id, "execution_success", {"prompt_id": prompt_id})
+            messages.append(["execution_success", {"prompt_id": prompt_id}])
+        self.history[prompt_id] = {
+            "prompt": [number, prompt_id, graph, {"client_id": client_id}, list(outputs)],
+            "outputs": outputs,
+            "status": {"status_str": status, "completed": status == "success", "messages": messages},
+        }
+        await self._send(client_id, "executing", {"node": None, "prompt_id": prompt_id})
+
+    def _write_output(self, node: Dict[str, Any], graph: Dict[str, Any], video: bool) -> Dict[str, Any]:
+        prefix = str(node["inputs"].get("filename_prefix", "ComfyUI"))
+        subfolder, _, prefix = prefix.rpartition("/")
+        target_dir = self.output_dir / subfolder
+        target_dir.mkdir(parents=True, exist_ok=True)
+        filename = f"{prefix}_{next(self.counter):05d}_.png"
+        # Real ComfyUI embeds the API graph as a "prompt" tEXt chunk
+        (target_dir / filename).write_bytes(tiny_png(text={"prompt": json.dumps(graph)}))
+        info = {"filename": filename, "subfolder": subfolder, "type": "output"}
+        return {"gifs": [info]} if video else {"images": [info]}
+
+
+@click.command()
+@click.option('--host', default='127.0.0.1', help='Listen address')
+@click.option('--port', default=8189, help='Port (the real ComfyUI defaults to 8188)')
+@click.option('--output-dir', default='outputs/standin', type=click.Path(), help='Where fake outputs are written')
+@click.option('--step-delay', default=0.0, help='Seconds per sampler step')
+def main(host, port, output_dir, step_delay):
+    """Run the offline ComfyUI stand-in"""
+    server = StandInServer(Path(output_dir), step_delay)
+    web.run_app(server.app(), host=host, port=port, print=lambda msg: print(f"ComfyUI stand-in: {msg}"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Pre-flight check that the models a workflow references belong together.
+
+Architectures come from the header-only model inventory, so a mismatched
+LoRA, motion module or ControlNet is rejected in milliseconds instead of
+after ComfyUI has spent a minute loading weights.
+"""
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from model_inventory import ModelInventory
+
+ARCH_NAMES = {"sdxl": "SDXL", "sd15": "SD1.5", "sd2": "SD2"}
+KIND_NAMES = {
+    "checkpoint": "checkpoint",
+    "lora": "LoRA",
+    "motion_module": "motion module",
+    "controlnet": "ControlNet",
+    "vae": "VAE",
+}
+
+# Loader node -> (input holding the file name, models/ subdirectories, expected kind).
+# In UI-format graphs the file name is always widgets_values[0].
+LOADERS = {
+    "CheckpointLoaderSimple": ("ckpt_name", ("checkpoints",), "checkpoint"),
+    "LoraLoader": ("lora_name", ("loras",), "lora"),
+    "LoraLoaderModelOnly": ("lora_name", ("loras",), "lora"),
+    "ADE_LoadAnimateDiffModel": ("model_name", ("animatediff",), "motion_module"),
+    "ADE_AnimateDiffLoaderWithContext": ("model_name", ("animatediff",), "motion_module"),
+    "ADE_AnimateDiffLoaderGen1": ("model_name", ("animatediff",), "motion_module"),
+    "ControlNetLoader": ("control_net_name", ("controlnet",), "controlnet"),
+}
+
+
+class IncompatibleModelsError(ValueError):
+    """The workflow combines models trained for different base architectures"""
+
+
+def _arch_name(arch: Optional[str]) -> str:
+    return ARCH_NAMES.get(arch, arch or "unknown")
+
+
+def model_refs(workflow: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+    """(loader class, file name) for every model loader in a UI or API graph"""
+    if "nodes" in workflow:
+        for node in workflow["nodes"]:
+            values = node.get("widgets_values") or []
+            if node.get("type") in LOADERS and values and node.get("mode", 0) not in (2, 4):
+                yield node["type"], values[0]
+        return
+    for node in workflow.values():
+        if not isinstance(node, dict):
+            continue
+        loader = LOADERS.get(node.get("class_type"))
+        if loader and isinstance(node.get("inputs", {}).get(loader[0]), str):
+            yield node["class_type"], node["inputs"][loader[0]]
+
+
+class CompatChecker:
+    def __init__(self, project_root: Path):
+        self.inventory = ModelInventory(project_root / "models")
+        self._by_name = None
+
+    def _models(self) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """(type dir, file name) -> inventory entry, refreshed once per checker"""
+        if self._by_name is None:
+            self._by_name = {(record["type"], record["name"]): record for record in self.inventory.refresh()}
+        return self._by_name
+
+    def lookup(self, type_dirs: Tuple[str, ...], file_name: str) -> Optional[Dict[str, Any]]:
+        """Inventory entry for a model as ComfyUI would name it (paths are reduced to the file name)"""
+        name = Path(file_name).name
+        for type_dir in type_dirs:
+            record = self._models().get((type_dir, name))
+            if record is not None:
+                return record
+        return None
+
+    def compatible(self, type_dir: str, arch: str) -> List[str]:
+        """File names in models/<type_dir> built for arch"""
+        return sorted(name for (tdir, name), record in self._models().items()
+                      if tdir == type_dir and record.get("arch") == arch)
+
+    def check(self, refs: List[Tuple[str, str]]) -> Tuple[List[str], List[str]]:
+        """Return (errors, warnings) for a set of (loader class, file name) references"""
+        errors, warnings = [], []
+        resolved = []
+        for loader, file_name in refs:
+            _input, type_dirs, kind = LOADERS[loader]
+            record = self.lookup(type_dirs, file_name)
+            if record is None:
+                warnings.append(f"{file_name} not found in models/{type_dirs[0]}, compatibility not checked")
+                continue
+            if record.get("kind") not in (None, "unknown", kind):
+                errors.append(f"{file_name} is a {KIND_NAMES[record['kind']]}, not a {KIND_NAMES[kind]}")
+                continue
+            resolved.append((kind, file_name, record.get("arch")))
+
+        bases = [(name, arch) for kind, name, arch in resolved if kind == "checkpoint" and arch]
+        if not bases:
+            return errors, warnings
+        base_name, base_arch = bases[0]
+        for kind, file_name, arch in resolved:
+            if kind == "checkpoint" and file_name != base_name and arch and arch != base_arch:
+                errors.append(f"Checkpoints {base_name} ({_arch_name(base_arch)}) and "
+                              f"{file_name} ({_arch_name(arch)}) are different architectures")
+            elif kind != "checkpoint" and arch is None:
+                warnings.append(f"Could not determine the base architecture of {file_name}")
+            elif kind != "checkpoint" and arch != base_arch:
+                errors.append(f"{KIND_NAMES[kind]} {file_name} is {_arch_name(arch)} "
+                              f"but checkpoint {base_name} is {_arch_name(base_arch)}")
+        return errors, warnings
+
+    def validate(self, workflow: Dict[str, Any]) -> List[str]:
+        """Raise IncompatibleModelsError on a mismatch, otherwise return warnings"""
+        errors, warnings = self.check(list(model_refs(workflow)))
+        if errors:
+            raise IncompatibleModelsError("Incompatible models: " + "; ".join(errors))
+        return warnings
+
+
+def validate_workflow(workflow: Dict[str, Any], project_root: Path) -> List[str]:
+    """One-shot CompatChecker(project_root).validate(workflow)"""
+    return CompatChecker(project_root).validate(workflow)
@@ -36,10 +36,10 @@ echo "🔄 Step 4: Syncing models and workflows to ComfyUI..."
 ./scripts/sync_workflows.sh
 echo "✅ Models and workflows synced"
 
-# Step 5: Restart ComfyUI to clear cache
-echo "♻️  Step 5: Restarting ComfyUI to clear cache..."
-./scripts/restart_comfyui.sh
-echo "✅ ComfyUI restarted"
+# Step 5: Swap the retrained LoRA in, keeping the base checkpoint loaded
+echo "♻️  Step 5: Refreshing the LoRA in ComfyUI (starting it if needed)..."
+python scripts/comfyui_lifecycle.py refresh-lora "$PERSONA_ID"
+echo "✅ ComfyUI warm with the new LoRA"
 
 echo ""
 echo "🎉 ENHANCED PERSONA QUALITY SETUP COMPLETE!"
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Compile UI-format workflows (nodes + links + widgets_values, as saved by
+the ComfyUI editor) into the API format that POST /prompt executes.
+
+UI graphs store widget values positionally, so each node type needs its
+widget names in order. Core and repo-used nodes are listed in
+WIDGET_NAMES; anything else needs the server's /object_info, which
+describes every installed node and also lets link and widget types be
+checked.
+
+Along the way the compiler
+  * drops Note nodes and muted (mode 2) nodes, together with anything
+    that can only be reached through a muted node,
+  * rewires around bypassed (mode 4) nodes and Reroute nodes like the
+    editor does, and inlines PrimitiveNode values,
+  * checks link types, dangling links and cycles,
+  * emits nodes in topological order.
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Frontend-only widgets that occupy a widgets_values slot but are not inputs
+CONTROL = None
+
+WIDGET_NAMES = {
+    "CheckpointLoaderSimple": ["ckpt_name"],
+    "VAELoader": ["vae_name"],
+    "LoraLoader": ["lora_name", "strength_model", "strength_clip"],
+    "LoraLoaderModelOnly": ["lora_name", "strength_model"],
+    "CLIPTextEncode": ["text"],
+    "CLIPSetLastLayer": ["stop_at_clip_layer"],
+    "EmptyLatentImage": ["width", "height", "batch_size"],
+    "KSampler": ["seed", CONTROL, "steps", "cfg", "sampler_name", "scheduler", "denoise"],
+    "KSamplerAdvanced": ["add_noise", "noise_seed", CONTROL, "steps", "cfg", "sampler_name", "scheduler",
+                         "start_at_step", "end_at_step", "return_with_leftover_noise"],
+    "VAEDecode": [],
+    "VAEEncode": [],
+    "SaveImage": ["filename_prefix"],
+    "PreviewImage": [],
+    "LoadImage": ["image", CONTROL],
+    "ConditioningConcat": [],
+    "ConditioningCombine": [],
+    "ControlNetLoader": ["control_net_name"],
+    "ControlNetApply": ["strength"],
+    "UpscaleModelLoader": ["model_name"],
+    "ImageUpscaleWithModel": [],
+    "LatentUpscale": ["upscale_method", "width", "height", "crop"],
+    "ImageScale": ["upscale_method", "width", "height", "crop"],
+    "ADE_LoadAnimateDiffModel": ["model_name"],
+    "ADE_AnimateDiffLoaderWithContext": ["model_name", "beta_schedule", "motion_scale", "apply_v2_models_properly"],
+    "ADE_EmptyLatentImageLarge": ["width", "height", "batch_size"],
+    "VHS_VideoCombine": ["frame_rate", "loop_count", "filename_prefix", "format", "pingpong", "save_output"],
+    "GetImageSize+": [],
+}
+
+# Nodes that only exist in the editor
+DROPPED_TYPES = {"Note", "MarkdownNote"}
+PASSTHROUGH_TYPES = {"Reroute"}
+PRIMITIVE_TYPES = {"PrimitiveNode"}
+
+MODE_MUTED = 2
+MODE_BYPASS = 4
+
+# object_info types whose inputs are widgets rather than sockets
+WIDGET_TYPES = {"INT", "FLOAT", "STRING", "BOOLEAN", "COMBO"}
+
+
+class GraphCompileError(ValueError):
+    """The UI graph cannot be turned into a valid API graph"""
+
+    def __init__(self, problems: List[str]):
+        super().__init__("; ".join(problems))
+        self.problems = problems
+
+
+def is_ui_format(workflow: Dict[str, Any]) -> bool:
+    return isinstance(workflow.get("nodes"), list) and "links" in workflow
+
+
+def fetch_object_info(source: str, timeout: float = 10.0) -> Dict[str, Any]:
+    """Node definitions from a running server's /object_info, or a saved copy of it"""
+    if source.startswith(("http://", "https://")):
+        import urllib.request
+        with urllib.request.urlopen(source.rstrip("/") + "/object_info", timeout=timeout) as response:
+            return json.load(response)
+    with open(source, 'r') as f:
+        return json.load(f)
+
+
+def _widget_layout(node_type: str, object_info: Optional[Dict[str, Any]]) -> Optional[List[Tuple]]:
+    """[(name or CONTROL, spec or None)] in widgets_values order"""
+    definition = (object_info or {}).get(node_type)
+    if definition is None:
+        names = WIDGET_NAMES.get(node_type)
+        return None if names is None else [(name, None) for name in names]
+
+    layout = []
+    inputs = definition.get("input", {})
+    for section in ("required", "optional"):
+        for name, spec in inputs.get(section, {}).items():
+            kind = spec[0] if spec else None
+            options = spec[1] if len(spec) > 1 and isinstance(spec[1], dict) else {}
+            if isinstance(kind, list) or kind in WIDGET_TYPES:
+                layout.append((name, spec))
+                if options.get("control_after_generate") or (kind == "INT" and name in ("seed", "noise_seed")):
+                    layout.append((CONTROL, None))
+                if options.get("image_upload"):
+                    layout.append((CONTROL, None))
+    return layout
+
+
+def _check_widget(node_label: str, name: str, spec, value) -> Optional[str]:
+    """Type-check one widget value against its object_info spec"""
+    if spec is None or value is None:
+        return None
+    kind = spec[0] if spec else None
+    if kind == "INT" and (isinstance(value, bool) or not isinstance(value, int)):
+        if not (isinstance(value, float) and value.is_integer()):
+            return f"{node_label}: widget {name} expects an integer, got {value!r}"
+    elif kind == "FLOAT" and (isinstance(value, bool) or not isinstance(value, (int, float))):
+        return f"{node_label}: widget {name} expects a number, got {value!r}"
+    elif kind == "BOOLEAN" and not isinstance(value, bool):
+        return f"{node_label}: widget {name} expects true/false, got {value!r}"
+    elif kind == "STRING" and not isinstance(value, str):
+        return f"{node_label}: widget {name} expects text, got {value!r}"
+    return None
+
+
+def _types_compatible(a: Optional[str], b: Optional[str]) -> bool:
+    if not a or not b or a == "*" or b == "*":
+        return True
+    # Multi-type sockets are comma separated, e.g. "IMAGE,MASK"
+    return bool(set(a.split(",")) & set(b.split(",")))
+
+
+def compile_workflow(workflow: Dict[str, Any],
+                     object_info: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], List[str]]:
+    """Compile a UI-format graph, returns (api_graph, warnings)
+
+    Raises GraphCompileError listing every problem found.
+    """
+    if not is_ui_format(workflow):
+        raise GraphCompileError(["not a UI-format workflow (no nodes/links arrays)"])
+
+    nodes = {node["id"]: node for node in workflow["nodes"]}
+    # [id, origin_id, origin_slot, target_id, target_slot, type]. Editor
+    # exports can reuse a link id for different links, so a link is looked
+    # up by the node and input slot it feeds as well as its id
+    links, links_by_id = {}, {}
+    for link in workflow["links"]:
+        if link:
+            links[(link[0], link[3], link[4])] = link
+            links_by_id.setdefault(link[0], []).append(link)
+    problems, warnings = [], []
+
+    def label(node) -> str:
+        title = node.get("title")
+        return f"{node['type']} #{node['id']}" + (f" ({title})" if title and title != node["type"] else "")
+
+    def input_link(node, slot: int) -> Optional[int]:
+        inputs = node.get("inputs") or []
+        return inputs[slot].get("link") if slot < len(inputs) else None
+
+    def find_link(link_id: int, target_id, target_slot: int) -> Optional[list]:
+        link = links.get((link_id, target_id, target_slot))
+        if link is None:
+            # Unique ids may carry a stale target, duplicated ones must match it
+            candidates = links_by_id.get(link_id, [])
+            same_target = [candidate for candidate in candidates if candidate[3] == target_id]
+            if len(same_target) == 1 or len(candidates) == 1:
+                link = (same_target or candidates)[0]
+        return link
+
+    def resolve(link_id: int, target_id, target_slot: int, seen=None) -> Optional[Tuple[Any, int, Optional[str]]]:
+        """Follow the link feeding target_id's input slot through reroutes
+        and bypassed nodes to its real source
+
+        Returns (node id, output slot, type), ("value", value, None) for a
+        primitive, or None if the source is muted or missing.
+        """
+        seen = seen or set()
+        if (link_id, target_id) in seen:
+            problems.append(f"link {link_id} loops through reroute/bypassed nodes")
+            return None
+        seen.add((link_id, target_id))
+        link = find_link(link_id, target_id, target_slot)
+        if link is None:
+            problems.append(f"link {link_id} into node {target_id} is referenced but not defined")
+            return None
+        _lid, origin_id, origin_slot, _target, _tslot, link_type = link[:6]
+        origin = nodes.get(origin_id)
+        if origin is None:
+            problems.append(f"link {link_id} comes from missing node {origin_id}")
+            return None
+        mode = origin.get("mode", 0)
+        if mode == MODE_MUTED:
+            return None
+        if origin["type"] in PRIMITIVE_TYPES:
+            values = origin.get("widgets_values") or [None]
+            return ("value", values[0], None)
+        if origin["type"] in PASSTHROUGH_TYPES:
+            upstream = input_link(origin, 0)
+            return resolve(upstream, origin_id, 0, seen) if upstream is not None else None
+        if mode == MODE_BYPASS:
+            # The editor feeds the consumer from the bypassed node's input of
+            # the same type, preferring the same slot index
+            inputs = origin.get("inputs") or []
+            candidates = ([origin_slot] if origin_slot < len(inputs) else []) + list(range(len(inputs)))
+            for slot in candidates:
+                if inputs[slot].get("link") is not None and _types_compatible(inputs[slot].get("type"), link_type):
+                    return resolve(inputs[slot]["link"], origin_id, slot, seen)
+            return None
+        outputs = origin.get("outputs") or []
+        out_type = outputs[origin_slot].get("type") if origin_slot < len(outputs) else None
+        return (origin_id, origin_slot, out_type or link_type)
+
+    # ComfyUI only validates what its outputs depend on, so errors in a node
+    # nothing uses (e.g. a leftover with stale links) drop it instead of failing
+    from graph_optimizer import OUTPUT_NODES
+
+    live = set()
+    stack = [node_id for node_id, node in nodes.items()
+             if node.get("mode", 0) not in (MODE_MUTED, MODE_BYPASS)
+             and (node["type"] in OUTPUT_NODES or (object_info or {}).get(node["type"], {}).get("output_node"))]
+    while stack:
+        node_id = stack.pop()
+        if node_id in live or node_id not in nodes:
+            continue
+        live.add(node_id)
+        for slot, socket in enumerate(nodes[node_id].get("inputs") or []):
+            link = find_link(socket["link"], node_id, slot) if socket.get("link") is not None else None
+            if link is not None:
+                stack.append(link[1])
+
+    api, dropped = {}, []
+
+    def compile_node(node_id, node):
+        node_type = node["type"]
+        if node_type in DROPPED_TYPES or node_type in PASSTHROUGH_TYPES or node_type in PRIMITIVE_TYPES:
+            return
+        if node.get("mode", 0) in (MODE_MUTED, MODE_BYPASS):
+            return
+
+        layout = _widget_layout(node_type, object_info)
+        definition = (object_info or {}).get(node_type)
+        node_inputs = {}
+
+        widget_values = node.get("widgets_values")
+        if isinstance(widget_values, dict):
+            node_inputs.update({k: v for k, v in widget_values.items() if k != "videopreview"})
+        elif widget_values:
+            if layout is None:
+                problems.append(f"{label(node)}: unknown node type, widget names need --object-info")
+                return
+            if len(widget_values) < sum(1 for name, _ in layout if name is not CONTROL):
+                warnings.append(f"{label(node)}: fewer widget values than widgets, defaults will apply")
+            for (name, spec), value in zip(layout, widget_values):
+                if name is CONTROL:
+                    continue
+                error = _check_widget(label(node), name, spec, value)
+                if error:
+                    problems.append(error)
+                node_inputs[name] = value
+
+        unreachable = False
+        expected_types = {}
+        if definition:
+            for section in ("required", "optional"):
+                for name, spec in definition.get("input", {}).get(section, {}).items():
+                    if spec and isinstance(spec[0], str) and spec[0] not in WIDGET_TYPES:
+                        expected_types[name] = spec[0]
+        for slot, socket in enumerate(node.get("inputs") or []):
+            link_id = socket.get("link")
+            name = socket.get("widget", {}).get("name") or socket["name"]
+            if link_id is None:
+                continue
+            source = resolve(link_id, node_id, slot)
+            if source is None:
+                unreachable = True
+                break
+            if source[0] == "value":
+                node_inputs[name] = source[1]
+                continue
+            origin_id, origin_slot, source_type = source
+            expected = expected_types.get(name) or socket.get("type")
+            if "widget" not in socket and not _types_compatible(source_type, expected):
+                problems.append(f"{label(node)}: input {name} expects {expected} "
+                                f"but is linked to {source_type} from {label(nodes[origin_id])}")
+            node_inputs[name] = [str(origin_id), origin_slot]
+
+        if unreachable:
+            dropped.append(node_id)
+            return
+        api[node_id] = {
+            "class_type": node_type,
+            "inputs": node_inputs,
+            "_meta": {"title": node.get("title") or node_type},
+        }
+
+    for node_id, node in nodes.items():
+        problems_before = len(problems)
+        compile_node(node_id, node)
+        if live and node_id not in live and len(problems) > problems_before:
+            warnings.append(f"dropped {label(node)}: no output uses it "
+                            f"({'; '.join(problems[problems_before:])})")
+            del problems[problems_before:]
+            api.pop(node_id, None)
+
+    # Anything fed (directly or transitively) by a muted node goes too
+    changed = True
+    while changed:
+        changed = False
+        for node_id in list(api):
+            for value in api[node_id]["inputs"].values():
+                if isinstance(value, list) and len(value) == 2 and int(value[0]) not in api:
+                    del api[node_id]
+                    dropped.append(node_id)
+                    changed = True
+                    break
+    for node_id in dropped:
+        warnings.append(f"dropped {label(nodes[node_id])}: depends on a muted or dropped node")
+
+    if problems:
+        raise GraphCompileError(problems)
+    graph = {str(node_id): node for node_id, node in api.items()}
+    return {node_id: graph[node_id] for node_id in topological_order(graph)}, warnings
+
+
+def _id_order(node_id: str):
+    """Sort numeric ids numerically ("9" before "10"), others after them"""
+    return (0, int(node_id), "") if node_id.isdigit() else (1, 0, node_id)
+
+
+def topological_order(api: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Node ids of an API graph in dependency order
+
+    Kahn's algorithm with ties broken by node id; raises GraphCompileError
+    on cycles.
+    """
+    import heapq
+
+    deps = {node_id: set() for node_id in api}
+    dependents = {node_id: [] for node_id in api}
+    for node_id, node in api.items():
+        for value in node.get("inputs", {}).values():
+            if isinstance(value, list) and len(value) == 2 and str(value[0]) in api:
+                source = str(value[0])
+                if source not in deps[node_id]:
+                    deps[node_id].add(source)
+                    dependents[source].append(node_id)
+
+    remaining = {node_id: len(sources) for node_id, sources in deps.items()}
+    ready = [(_id_order(node_id), node_id) for node_id, count in remaining.items() if count == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        _key, node_id = heapq.heappop(ready)
+        order.append(node_id)
+        for dependent in dependents[node_id]:
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                heapq.heappush(ready, (_id_order(dependent), dependent))
+
+    if len(order) != len(api):
+        cycle = sorted((node_id for node_id, count in remaining.items() if count > 0), key=_id_order)
+        raise GraphCompileError([f"cycle between nodes {', '.join(map(str, cycle))}"])
+    return order
+
+
+def ensure_api_format(workflow: Dict[str, Any],
+                      object_info: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], List[str]]:
+    """Return an API graph for either format (UI graphs are compiled)"""
+    if is_ui_format(workflow):
+        return compile_workflow(workflow, object_info)
+    return workflow, []
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Optimization passes over API-format workflow graphs.
+
+Common-subexpression elimination merges nodes with the same class and
+the same inputs (after their own inputs have been merged), so a prompt
+encoded on five branches is encoded once. Dead-node elimination then
+drops everything that no output node depends on. Output nodes and
+stateful nodes, which produce something different on every execution,
+are never merged.
+"""
+import json
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from graph_compiler import topological_order
+
+OUTPUT_NODES = {
+    "SaveImage", "PreviewImage", "SaveAnimatedWEBP", "SaveAnimatedPNG",
+    "VHS_VideoCombine", "ADE_VideoCombine", "Image Save",
+}
+# Nodes that read external state (a folder cursor, a webcam...) on each run
+STATEFUL_NODES = {"Load Image Batch"}
+
+ENCODE_NODES = {"CLIPTextEncode", "CLIPTextEncodeSDXL", "VAEEncode"}
+DECODE_NODES = {"VAEDecode", "VAEDecodeTiled"}
+
+
+def _is_link(value) -> bool:
+    return isinstance(value, list) and len(value) == 2 and isinstance(value[0], str)
+
+
+def output_nodes(graph: Dict[str, Any], object_info: Optional[Dict[str, Any]] = None) -> Set[str]:
+    """Ids of nodes ComfyUI executes for their side effects"""
+    info = object_info or {}
+    return {node_id for node_id, node in graph.items()
+            if node["class_type"] in OUTPUT_NODES or info.get(node["class_type"], {}).get("output_node")}
+
+
+def eliminate_common_nodes(graph: Dict[str, Any], object_info: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    """Merge duplicate nodes in place, returns {removed id: kept id}"""
+    keep_apart = output_nodes(graph, object_info)
+    canonical, replaced = {}, {}
+    for node_id in topological_order(graph):
+        node = graph[node_id]
+        # Point inputs at the survivors first, so duplicates of duplicates match
+        for name, value in node.get("inputs", {}).items():
+            if _is_link(value) and value[0] in replaced:
+                node["inputs"][name] = [replaced[value[0]], value[1]]
+        if node_id in keep_apart or node["class_type"] in STATEFUL_NODES:
+            continue
+        signature = json.dumps([node["class_type"], node.get("inputs", {})], sort_keys=True)
+        if signature in canonical:
+            replaced[node_id] = canonical[signature]
+        else:
+            canonical[signature] = node_id
+    for node_id in replaced:
+        del graph[node_id]
+    return replaced
+
+
+def eliminate_dead_nodes(graph: Dict[str, Any], object_info: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Drop nodes no output depends on, returns their ids
+
+    A graph without any output node is left alone rather than emptied.
+    """
+    live, stack = set(), list(output_nodes(graph, object_info))
+    if not stack:
+        return []
+    while stack:
+        node_id = stack.pop()
+        if node_id in live or node_id not in graph:
+            continue
+        live.add(node_id)
+        stack.extend(value[0] for value in graph[node_id].get("inputs", {}).values() if _is_link(value))
+    dead = [node_id for node_id in graph if node_id not in live]
+    for node_id in dead:
+        del graph[node_id]
+    return dead
+
+
+def optimize(graph: Dict[str, Any],
+             object_info: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Return (optimized copy, report) for an API-format graph
+
+    The report has "merged" and "dead" as {class: count}, plus "encodes"
+    and "decodes" removed in total.
+    """
+    optimized = json.loads(json.dumps(graph))
+    before = {node_id: node["class_type"] for node_id, node in optimized.items()}
+    merged = eliminate_common_nodes(optimized, object_info)
+    dead = eliminate_dead_nodes(optimized, object_info)
+
+    removed = Counter(before[node_id] for node_id in list(merged) + dead)
+    report = {
+        "merged": dict(Counter(before[node_id] for node_id in merged)),
+        "dead": dict(Counter(before[node_id] for node_id in dead)),
+        "encodes": sum(count for class_type, count in removed.items() if class_type in ENCODE_NODES),
+        "decodes": sum(count for class_type, count in removed.items() if class_type in DECODE_NODES),
+        "nodes_before": len(before),
+        "nodes_after": len(optimized),
+    }
+    return optimized, report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    parts = [f"{report['nodes_before']} -> {report['nodes_after']} nodes"]
+    merged, dead = sum(report["merged"].values()), sum(report["dead"].values())
+    if merged:
+        parts.append(f"{merged} duplicate(s) merged")
+    if dead:
+        parts.append(f"{dead} unused removed")
+    parts.append(f"{report['encodes']} encode(s) and {report['decodes']} decode(s) saved")
+    return ", ".join(parts)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Order queued workflows so ComfyUI reloads models as rarely as possible.
+
+ComfyUI keeps the last checkpoint loaded and the last LoRA patches
+applied, so consecutive jobs sharing a (checkpoint, LoRA set, strengths,
+resolution) key run back to back without reloading. The scheduler groups
+jobs by that key and drains one group before switching, choosing the
+cheapest switch next. Higher priorities always go first; a job with a
+deadline jumps the queue as soon as waiting any longer would miss it.
+"""
+import math
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import click
+
+# Rough costs on a consumer GPU, overridable from the CLI
+CHECKPOINT_LOAD_SECONDS = 8.0
+LORA_PATCH_SECONDS = 1.0
+STEP_SECONDS = 0.35  # one sampler step on a 1024x1024 latent
+DEFAULT_JOB_SECONDS = 15.0
+
+CHECKPOINT_LOADERS = {"CheckpointLoaderSimple": "ckpt_name"}
+LORA_LOADERS = {
+    "LoraLoader": ("lora_name", "strength_model", "strength_clip"),
+    "LoraLoaderModelOnly": ("lora_name", "strength_model", None),
+}
+LATENT_NODES = {"EmptyLatentImage", "ADE_EmptyLatentImageLarge"}
+SAMPLER_NODES = {"KSampler", "KSamplerAdvanced"}
+
+# (checkpoints, ((lora, strength_model, strength_clip), ...), (width, height))
+AffinityKey = Tuple[Tuple[str, ...], Tuple[Tuple, ...], Optional[Tuple[int, int]]]
+
+
+def _api_nodes(graph: Dict[str, Any]) -> Iterable[Tuple[str, Dict[str, Any]]]:
+    """(class, literal inputs) for every active node of a UI or API graph"""
+    if "nodes" in graph:
+        # UI graphs only carry loaders' file names positionally; widget
+        # order for these classes is fixed (see graph_compiler.WIDGET_NAMES)
+        from graph_compiler import WIDGET_NAMES
+
+        for node in graph["nodes"]:
+            names = WIDGET_NAMES.get(node.get("type"))
+            values = node.get("widgets_values")
+            if node.get("mode", 0) in (2, 4) or names is None or not isinstance(values, list):
+                continue
+            yield node["type"], {name: value for name, value in zip(names, values) if name is not None}
+        return
+    for node in graph.values():
+        if isinstance(node, dict) and "class_type" in node:
+            yield node["class_type"], node.get("inputs", {})
+
+
+def affinity_key(graph: Dict[str, Any]) -> AffinityKey:
+    """The model state a graph leaves ComfyUI in"""
+    checkpoints, loras, resolution = set(), [], None
+    for class_type, inputs in _api_nodes(graph):
+        if class_type in CHECKPOINT_LOADERS:
+            name = inputs.get(CHECKPOINT_LOADERS[class_type])
+            if isinstance(name, str):
+                checkpoints.add(name)
+        elif class_type in LORA_LOADERS:
+            name_input, model_input, clip_input = LORA_LOADERS[class_type]
+            if isinstance(inputs.get(name_input), str):
+                loras.append((inputs[name_input], inputs.get(model_input), inputs.get(clip_input)))
+        elif class_type in LATENT_NODES and resolution is None:
+            width, height = inputs.get("width"), inputs.get("height")
+            if isinstance(width, int) and isinstance(height, int):
+                resolution = (width, height)
+    return tuple(sorted(checkpoints)), tuple(sorted(loras, key=repr)), resolution
+
+
+def estimate_seconds(graph: Dict[str, Any]) -> float:
+    """Sampling time guess from steps x latent size x batch"""
+    steps, pixels, batch = 0, 1024 * 1024, 1
+    for class_type, inputs in _api_nodes(graph):
+        if class_type in SAMPLER_NODES and isinstance(inputs.get("steps"), int):
+            steps += inputs["steps"]
+        elif class_type in LATENT_NODES:
+            if isinstance(inputs.get("width"), int) and isinstance(inputs.get("height"), int):
+                pixels = inputs["width"] * inputs["height"]
+            if isinstance(inputs.get("batch_size"), int):
+                batch = inputs["batch_size"]
+    if not steps:
+        return DEFAULT_JOB_SECONDS
+    return steps * STEP_SECONDS * batch * pixels / (1024 * 1024)
+
+
+def switch_seconds(previous: Optional[AffinityKey], key: AffinityKey,
+                   checkpoint_seconds: float = CHECKPOINT_LOAD_SECONDS,
+                   lora_seconds: float = LORA_PATCH_SECONDS) -> float:
+    """Reload cost of running a job with key right after one with previous"""
+    if previous is not None and previous[:2] == key[:2]:
+        return 0.0
+    if previous is None or previous[0] != key[0]:
+        # A fresh checkpoint has to be patched with every LoRA again
+        return checkpoint_seconds * len(key[0]) + lora_seconds * len(key[1])
+    # Same checkpoint: ComfyUI unpatches the old LoRAs and patches the new ones
+    return lora_seconds * (len(previous[1]) + len(key[1]))
+
+
+class Job:
+    __slots__ = ("index", "label", "graph", "meta", "priority", "deadline", "key", "seconds")
+
+    def __init__(self, index: int, label: str, graph: Dict[str, Any], meta: Optional[Dict[str, Any]] = None):
+        meta = meta or {}
+        self.index = index
+        self.label = label
+        self.graph = graph
+        self.meta = meta
+        self.priority = int(meta.get("priority", 0))
+        self.deadline = float(meta["deadline"]) if meta.get("deadline") is not None else math.inf
+        self.key = affinity_key(graph)
+        self.seconds = float(meta["estimate"]) if meta.get("estimate") is not None else estimate_seconds(graph)
+
+    def sort_key(self):
+        return (-self.priority, self.deadline, self.index)
+
+
+class JobScheduler:
+    def __init__(self, checkpoint_seconds: float = CHECKPOINT_LOAD_SECONDS,
+                 lora_seconds: float = LORA_PATCH_SECONDS):
+        self.checkpoint_seconds = checkpoint_seconds
+        self.lora_seconds = lora_seconds
+
+    def switch(self, previous: Optional[AffinityKey], key: AffinityKey) -> float:
+        return switch_seconds(previous, key, self.checkpoint_seconds, self.lora_seconds)
+
+    def simulate(self, jobs: List[Job]) -> Dict[str, Any]:
+        """Reloads, reload seconds, finish time and late jobs when run in this order"""
+        clock, reload_seconds, swaps, late, previous = 0.0, 0.0, 0, [], None
+        for job in jobs:
+            cost = self.switch(previous, job.key)
+            if previous is not None and cost:
+                swaps += 1
+            reload_seconds += cost
+            clock += cost + job.seconds
+            if clock > job.deadline:
+                late.append(job.label)
+            previous = job.key
+        return {"swaps": swaps, "reload_seconds": reload_seconds, "total_seconds": clock, "late": late}
+
+    def schedule(self, jobs: List[Job]) -> List[Job]:
+        """Greedy affinity order that respects priorities and deadlines
+
+        Within the highest pending priority, the current group keeps running
+        while it has jobs; otherwise the group that is cheapest to switch to
+        (then the most urgent, then the earliest submitted) goes next. Before
+        each pick, any deadline of at least the pick's priority that the
+        pick would push past its last feasible start preempts it, earliest
+        deadline first.
+        """
+        groups: Dict[AffinityKey, List[Job]] = {}
+        for job in sorted(jobs, key=Job.sort_key):
+            groups.setdefault(job.key, []).append(job)
+        # Each group list is consumed from the front, deadline jobs may be
+        # taken out of the middle, hence the done set
+        heads = {key: 0 for key in groups}
+        deadlines = {key: sorted((job for job in members if job.deadline < math.inf),
+                                 key=lambda job: (job.deadline, job.index))
+                     for key, members in groups.items()}
+        urgent_heads = {key: 0 for key in groups}
+        done = set()
+        order, clock, current = [], 0.0, None
+
+        def head(key) -> Optional[Job]:
+            members = groups[key]
+            while heads[key] < len(members) and members[heads[key]].index in done:
+                heads[key] += 1
+            return members[heads[key]] if heads[key] < len(members) else None
+
+        def most_urgent(key, priority: int) -> Optional[Job]:
+            members = deadlines[key]
+            while urgent_heads[key] < len(members) and members[urgent_heads[key]].index in done:
+                urgent_heads[key] += 1
+            return next((job for job in members[urgent_heads[key]:]
+                         if job.index not in done and job.priority >= priority), None)
+
+        while len(order) < len(jobs):
+            candidates = {key: job for key in groups if (job := head(key)) is not None}
+            top = max(job.priority for job in candidates.values())
+            if current in candidates and candidates[current].priority == top:
+                pick = candidates[current]
+            else:
+                pick = min((job for job in candidates.values() if job.priority == top),
+                           key=lambda job: (self.switch(current, job.key), job.deadline, job.index))
+
+            pick_done = clock + self.switch(current, pick.key) + pick.seconds
+            urgent = None
+            for key in candidates:
+                # A deadline never jumps ahead of more important work
+                job = most_urgent(key, pick.priority)
+                if job is None or job is pick:
+                    continue
+                now_finish = clock + self.switch(current, key) + job.seconds
+                later_finish = pick_done + self.switch(pick.key, key) + job.seconds
+                # Only preempt for deadlines that are still reachable
+                if later_finish > job.deadline >= now_finish and (urgent is None or job.deadline < urgent.deadline):
+                    urgent = job
+            if urgent is not None:
+                pick = urgent
+
+            clock += self.switch(current, pick.key) + pick.seconds
+            current = pick.key
+            done.add(pick.index)
+            order.append(pick)
+        return order
+
+
+def format_report(before: Dict[str, Any], after: Dict[str, Any]) -> str:
+    saved = before["reload_seconds"] - after["reload_seconds"]
+    text = (f"{before['swaps']} -> {after['swaps']} model swaps, "
+            f"~{saved:.0f}s of reloads saved (est. {after['total_seconds'] / 60:.1f} min total)")
+    if after["late"]:
+        text += f", {len(after['late'])} job(s) will miss their deadline"
+    return text
+
+
+@click.command()
+@click.argument('workflow_files', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('-o', '--output', type=click.File('w'), default='-', help='Scheduled JSONL (default: stdout)')
+@click.option('--checkpoint-seconds', default=CHECKPOINT_LOAD_SECONDS, help='Estimated checkpoint load time')
+@click.option('--lora-seconds', default=LORA_PATCH_SECONDS, help='Estimated time to (un)patch one LoRA')
+def main(workflow_files, output, checkpoint_seconds, lora_seconds):
+    """Reorder workflows to minimize checkpoint/LoRA reloads
+
+    Reads .json graphs or JSONL items; items may carry "priority" (higher
+    first), "deadline" (seconds from the start of the run) and "estimate"
+    (seconds the job takes). Writes JSONL in run order.
+    """
+    from workflow_batch import iter_workflow_items, write_jsonl
+
+    jobs = [Job(index, label, graph, meta)
+            for index, (label, graph, meta) in enumerate(iter_workflow_items(list(workflow_files)))]
+    scheduler = JobScheduler(checkpoint_seconds, lora_seconds)
+    order = scheduler.schedule(jobs)
+    write_jsonl(({**job.meta, "id": job.label, "graph": job.graph} for job in order), output)
+    print(f"✓ {len(order)} jobs: {format_report(scheduler.simulate(jobs), scheduler.simulate(order))}",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
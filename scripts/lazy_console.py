@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+
+
+class LazyConsole:
+    """Stand-in for rich's Console that imports rich on first use
+
+    rich.console is the single most expensive import in our CLIs, and
+    `--help` or fast paths never print through it.
+    """
+
+    def __init__(self, **kwargs):
+        self._kwargs = kwargs
+        self._console = None
+
+    def __getattr__(self, name):
+        if self._console is None:
+            from rich.console import Console
+            self._console = Console(**self._kwargs)
+        return getattr(self._console, name)
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Rough memory and time model for workflows, used to size batches and to
+reject graphs that would run out of memory halfway through.
+
+Peak usage is modelled as resident weights (checkpoint, LoRAs, motion
+and upscale models, sized from the model inventory), a fixed runtime
+overhead, the image and latent tensors ComfyUI keeps cached between
+nodes, and the working memory of the hungriest node: the sampler's
+activations (linear in batch size and latent area, with CFG's doubled
+batch included), one VAE decode (ComfyUI splits decodes per image when
+memory is short) or a tiled model upscale. The constants are
+deliberately on the safe side; tune the budget rather than the model.
+"""
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Resident fp16 weights by architecture when a file isn't in the inventory
+ARCH_WEIGHTS_GB = {"sdxl": 6.9, "sd15": 2.1, "sd2": 2.6}
+# Sampling activations per image per megapixel of output, CFG included
+SAMPLING_GB_PER_MEGAPIXEL = {"sdxl": 1.0, "sd15": 1.3, "sd2": 1.3}
+VAE_DECODE_GB_PER_MEGAPIXEL = 4.4
+UPSCALE_TILE_GB = 1.5
+RUNTIME_OVERHEAD_GB = 1.0
+# Seconds per image per megapixel (per step for samplers)
+STEP_SECONDS_PER_MEGAPIXEL = {"sdxl": 0.35, "sd15": 0.25, "sd2": 0.25}
+DECODE_SECONDS_PER_MEGAPIXEL = 0.5
+UPSCALE_SECONDS_PER_MEGAPIXEL = 2.0
+DEFAULT_UPSCALE_FACTOR = 4
+DEFAULT_ARCH = "sdxl"
+MAX_BATCH = 64
+
+# Unified memory is shared with macOS and the UI, only plan with part of it
+DEFAULT_BUDGET_FRACTION = 0.6
+BUDGET_ENV = "PERSONA_MEMORY_BUDGET_GB"
+
+GB = 1024 ** 3
+LATENT_CHANNELS = 4
+FLOAT_BYTES = 4
+
+# Loader class -> (input holding the file name, models/ subdirectories)
+WEIGHT_LOADERS = {
+    "CheckpointLoaderSimple": ("ckpt_name", ("checkpoints",)),
+    "LoraLoader": ("lora_name", ("loras",)),
+    "LoraLoaderModelOnly": ("lora_name", ("loras",)),
+    "VAELoader": ("vae_name", ("vae", "vaes")),
+    "ControlNetLoader": ("control_net_name", ("controlnet",)),
+    "UpscaleModelLoader": ("model_name", ("upscale_models",)),
+    "ADE_LoadAnimateDiffModel": ("model_name", ("animatediff",)),
+    "ADE_AnimateDiffLoaderWithContext": ("model_name", ("animatediff",)),
+}
+LATENT_SOURCES = {"EmptyLatentImage", "ADE_EmptyLatentImageLarge"}
+SAMPLERS = {"KSampler": "latent_image", "KSamplerAdvanced": "latent_image"}
+DECODERS = {"VAEDecode", "VAEDecodeTiled"}
+
+
+def system_memory_gb() -> Optional[float]:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / GB
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_budget_gb() -> float:
+    """$PERSONA_MEMORY_BUDGET_GB, else a fraction of physical memory"""
+    configured = os.environ.get(BUDGET_ENV)
+    if configured:
+        return float(configured)
+    total = system_memory_gb()
+    if total is None:
+        raise ValueError(f"Cannot read the system memory size, set {BUDGET_ENV}")
+    return total * DEFAULT_BUDGET_FRACTION
+
+
+def plan_batches(num_images: int, batch_size: int) -> List[Tuple[int, int]]:
+    """[(index of the batch's first image, size)] covering num_images
+
+    The index doubles as the batch's seed offset, so no two batches share
+    initial noise.
+    """
+    if num_images < 1 or batch_size < 1:
+        raise ValueError("Image count and batch size must be at least 1")
+    return [(start, min(batch_size, num_images - start)) for start in range(0, num_images, batch_size)]
+
+
+def resolve_batch_size(batch_size: str, num_images: int, project_root: Path, graph: Dict[str, Any],
+                       budget: Optional[float] = None) -> Tuple[int, Optional[str]]:
+    """Turn a --batch-size value ("auto" or a number) into (batch size, explanation)
+
+    For "auto" the checkpoint, LoRAs and resolution are read from the graph.
+    """
+    if batch_size != "auto":
+        try:
+            size = int(batch_size)
+        except ValueError:
+            raise ValueError(f"Invalid batch size '{batch_size}', expected a number or 'auto'")
+        if size < 1:
+            raise ValueError("Batch size must be at least 1")
+        return min(size, num_images), None
+
+    from graph_compiler import ensure_api_format
+    from job_scheduler import affinity_key
+    from workflow_batch import batched_graphs
+
+    checkpoints, _loras, resolution = affinity_key(graph)
+    if not checkpoints or resolution is None:
+        raise ValueError("--batch-size auto needs a checkpoint loader and a fixed latent size in the workflow")
+    width, height = resolution
+    budget = default_budget_gb() if budget is None else budget
+    graph, _warnings = ensure_api_format(graph)
+    estimator = WorkflowEstimator(project_root)
+    size = auto_batch_size(estimator, graph, budget, limit=min(num_images, MAX_BATCH))
+    result = estimator.estimate(next(batched_graphs(graph, [(0, size)])))
+    note = (f"batch size {size}: ~{result['peak_gb']:.1f} GB of {budget:.1f} GB budget "
+            f"({result['arch']}, {width}x{height}, {result['weights_gb']:.1f} GB weights)")
+    return size, note
+
+
+class WorkflowEstimator:
+    """Per-node memory and time estimates for API-format graphs
+
+    Tensor shapes are propagated from the latent sources through samplers,
+    decoders and scalers; nodes the model doesn't know pass their first
+    input's shape through.
+    """
+
+    def __init__(self, project_root: Path):
+        from compat_check import CompatChecker
+
+        self.checker = CompatChecker(project_root)
+
+    def _weights(self, graph: Dict[str, Any]) -> Tuple[float, str]:
+        total, arch = 0.0, None
+        for node in graph.values():
+            loader = WEIGHT_LOADERS.get(node["class_type"])
+            name = node.get("inputs", {}).get(loader[0]) if loader else None
+            if not isinstance(name, str):
+                continue
+            record = self.checker.lookup(loader[1], name)
+            if node["class_type"] == "CheckpointLoaderSimple":
+                arch = arch or (record or {}).get("arch") or DEFAULT_ARCH
+                total += record["size"] / GB if record else ARCH_WEIGHTS_GB.get(arch, ARCH_WEIGHTS_GB[DEFAULT_ARCH])
+            elif record:
+                total += record["size"] / GB
+        return total, arch or DEFAULT_ARCH
+
+    def estimate(self, graph: Dict[str, Any]) -> Dict[str, Any]:
+        """{"nodes": [per-node rows], "weights_gb", "cached_gb", "peak_gb", "seconds", "arch", "frames"}
+
+        Each row has id, class_type, shape ((kind, batch, width, height) or
+        None), working_gb and seconds.
+        """
+        from graph_compiler import topological_order
+        from graph_optimizer import OUTPUT_NODES
+
+        weights, arch = self._weights(graph)
+        shapes: Dict[str, Tuple[str, int, int, int]] = {}
+        rows, cached, frames = [], 0.0, False
+
+        def source(inputs, name=None):
+            values = [inputs.get(name)] if name else list(inputs.values())
+            for value in values:
+                if isinstance(value, list) and len(value) == 2 and str(value[0]) in shapes:
+                    return shapes[str(value[0])]
+            return None
+
+        for node_id in topological_order(graph):
+            node = graph[node_id]
+            class_type, inputs = node["class_type"], node.get("inputs", {})
+            shape, working, seconds = None, 0.0, 0.0
+
+            if class_type in LATENT_SOURCES:
+                width, height, batch = inputs.get("width"), inputs.get("height"), inputs.get("batch_size", 1)
+                if all(isinstance(value, int) for value in (width, height, batch)):
+                    shape = ("latent", batch, width, height)
+                    frames = frames or class_type == "ADE_EmptyLatentImageLarge"
+            elif class_type in SAMPLERS:
+                shape = source(inputs, SAMPLERS[class_type])
+                if shape and isinstance(inputs.get("steps"), int):
+                    megapixels = shape[1] * shape[2] * shape[3] / 1e6
+                    working = megapixels * SAMPLING_GB_PER_MEGAPIXEL.get(arch, SAMPLING_GB_PER_MEGAPIXEL[DEFAULT_ARCH])
+                    seconds = inputs["steps"] * megapixels * STEP_SECONDS_PER_MEGAPIXEL.get(arch, 0.35)
+            elif class_type in DECODERS:
+                latent = source(inputs, "samples")
+                if latent:
+                    shape = ("image",) + latent[1:]
+                    working = latent[2] * latent[3] / 1e6 * VAE_DECODE_GB_PER_MEGAPIXEL
+                    seconds = latent[1] * latent[2] * latent[3] / 1e6 * DECODE_SECONDS_PER_MEGAPIXEL
+            elif class_type == "VAEEncode":
+                image = source(inputs, "pixels")
+                shape = ("latent",) + image[1:] if image else None
+            elif class_type == "LatentUpscale" or class_type == "ImageScale":
+                upstream = source(inputs)
+                width, height = inputs.get("width"), inputs.get("height")
+                if upstream and isinstance(width, int) and isinstance(height, int):
+                    # 0 keeps the aspect ratio
+                    width = width or round(upstream[2] * height / upstream[3])
+                    height = height or round(upstream[3] * width / upstream[2])
+                    shape = (upstream[0], upstream[1], width, height)
+            elif class_type in ("LatentUpscaleBy", "ImageScaleBy"):
+                upstream = source(inputs)
+                scale = inputs.get("scale_by")
+                if upstream and isinstance(scale, (int, float)):
+                    shape = (upstream[0], upstream[1], round(upstream[2] * scale), round(upstream[3] * scale))
+            elif class_type == "ImageUpscaleWithModel":
+                image = source(inputs, "image")
+                if image:
+                    factor = self._upscale_factor(graph, inputs.get("upscale_model"))
+                    shape = ("image", image[1], image[2] * factor, image[3] * factor)
+                    out_megapixels = shape[1] * shape[2] * shape[3] / 1e6
+                    working = UPSCALE_TILE_GB
+                    seconds = out_megapixels * UPSCALE_SECONDS_PER_MEGAPIXEL
+            elif class_type not in OUTPUT_NODES:
+                shape = source(inputs)
+
+            if shape:
+                shapes[node_id] = shape
+                cached += _tensor_gb(shape)
+            rows.append({"id": node_id, "class_type": class_type, "shape": shape,
+                         "working_gb": working, "seconds": seconds})
+
+        peak = weights + RUNTIME_OVERHEAD_GB + cached + max((row["working_gb"] for row in rows), default=0.0)
+        return {"nodes": rows, "weights_gb": weights, "cached_gb": cached, "peak_gb": peak,
+                "seconds": sum(row["seconds"] for row in rows), "arch": arch, "frames": frames}
+
+    @staticmethod
+    def _upscale_factor(graph: Dict[str, Any], link) -> int:
+        """4x-UltraSharp.pth -> 4, from the UpscaleModelLoader feeding the node"""
+        if isinstance(link, list) and str(link[0]) in graph:
+            name = str(graph[str(link[0])].get("inputs", {}).get("model_name", ""))
+            match = re.search(r"(?<![0-9])([1-8])x|x([1-8])(?![0-9])", name, re.IGNORECASE)
+            if match:
+                return int(match.group(1) or match.group(2))
+        return DEFAULT_UPSCALE_FACTOR
+
+
+def _tensor_gb(shape: Tuple[str, int, int, int]) -> float:
+    kind, batch, width, height = shape
+    if kind == "latent":
+        return batch * LATENT_CHANNELS * (width // 8) * (height // 8) * FLOAT_BYTES / GB
+    return batch * 3 * width * height * FLOAT_BYTES / GB
+
+
+def latent_batch(graph: Dict[str, Any]) -> int:
+    """Largest batch_size among a graph's splittable latent sources"""
+    from workflow_batch import BATCH_NODES
+
+    sizes = [node["inputs"].get("batch_size") for node in graph.values()
+             if node["class_type"] in BATCH_NODES and isinstance(node.get("inputs", {}).get("batch_size"), int)]
+    return max(sizes, default=1)
+
+
+def split_to_budget(estimator: WorkflowEstimator, graph: Dict[str, Any], budget: float) -> Optional[int]:
+    """Largest batch size at which graph fits budget, None if not even 1 does"""
+    from workflow_batch import batched_graphs
+
+    def fits(size: int) -> bool:
+        return estimator.estimate(next(batched_graphs(graph, [(0, size)])))["peak_gb"] <= budget
+
+    # Peak memory only grows with the batch, so bisect
+    low, high = 0, latent_batch(graph)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if fits(middle):
+            low = middle
+        else:
+            high = middle - 1
+    return low or None
+
+
+def auto_batch_size(estimator: WorkflowEstimator, graph: Dict[str, Any], budget: float,
+                    limit: int = MAX_BATCH) -> int:
+    """Largest batch of up to limit images whose estimated peak stays within budget GB"""
+    from workflow_batch import batched_graphs
+
+    size = split_to_budget(estimator, next(batched_graphs(graph, [(0, limit)])), budget)
+    if size is None:
+        single = estimator.estimate(next(batched_graphs(graph, [(0, 1)])))["peak_gb"]
+        raise ValueError(f"A single image needs ~{single:.1f} GB, over the {budget:.1f} GB memory budget")
+    return size
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Cached inventory of everything under models/.
+
+Safetensors files start with an 8-byte little-endian header length and a
+JSON header listing every tensor's dtype and shape, so architecture,
+dtype, tensor count, LoRA rank and training metadata can be read through
+mmap without touching the weights. PyTorch .ckpt/.pt/.pth files are zip
+archives whose data.pkl names every tensor; only that pickle is replayed,
+with stub constructors (nothing from torch or the file is executed), to
+get the same key -> dtype/shape table. Results are cached in
+models/.inventory.json and re-read only for files whose size or mtime
+changed.
+"""
+import json
+import mmap
+import os
+import struct
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from model_sync import MODEL_DIRS, MODEL_EXTENSIONS
+
+INVENTORY_FILE = ".inventory.json"
+INVENTORY_VERSION = 2
+
+# Text-encoder width of cross-attention keys, per architecture
+CONTEXT_DIMS = {768: "sd15", 1024: "sd2", 2048: "sdxl"}
+
+# Training metadata values longer than this (tag frequencies, dataset
+# dumps) are not worth carrying around in the cache
+MAX_METADATA_VALUE = 256
+
+# torch storage classes -> safetensors dtype names
+STORAGE_DTYPES = {
+    "FloatStorage": "F32",
+    "HalfStorage": "F16",
+    "BFloat16Storage": "BF16",
+    "DoubleStorage": "F64",
+    "LongStorage": "I64",
+    "IntStorage": "I32",
+    "ShortStorage": "I16",
+    "CharStorage": "I8",
+    "ByteStorage": "U8",
+    "BoolStorage": "BOOL",
+}
+
+
+def read_safetensors_header(path: Path) -> Dict[str, Any]:
+    """Return the parsed JSON header of a .safetensors file"""
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if len(mm) < 8:
+                raise ValueError(f"{path.name}: too small to be a safetensors file")
+            (length,) = struct.unpack("<Q", mm[:8])
+            if length > len(mm) - 8:
+                raise ValueError(f"{path.name}: header length {length} exceeds file size")
+            return json.loads(mm[8:8 + length])
+
+
+class _Opaque:
+    """Placeholder for any non-tensor object pickled into a checkpoint"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __setstate__(self, state):
+        pass
+
+    def __call__(self, *args, **kwargs):
+        return _Opaque()
+
+
+def _tensor_stub(storage, storage_offset, size, stride, *args):
+    return {"dtype": storage, "shape": list(size)}
+
+
+def _load_header_pickle(data) -> Any:
+    """Rebuild a torch state dict as {key: {"dtype", "shape"}} without torch
+
+    pickle and zipfile are imported here rather than at the top, list-models
+    only needs them when a checkpoint changed.
+    """
+    import pickle
+
+    class HeaderUnpickler(pickle.Unpickler):
+        def find_class(self, module, name):
+            if module == "collections" and name == "OrderedDict":
+                return dict
+            if module == "torch._utils" and name in ("_rebuild_tensor", "_rebuild_tensor_v2"):
+                return _tensor_stub
+            if module == "torch._utils" and name == "_rebuild_parameter":
+                return lambda data, *args: data
+            if module == "torch" and name in STORAGE_DTYPES:
+                return STORAGE_DTYPES[name]
+            return _Opaque
+
+        def persistent_load(self, pid):
+            # ('storage', storage_type, key, location, numel)
+            return pid[1] if isinstance(pid, tuple) and len(pid) > 1 else None
+
+    return HeaderUnpickler(data).load()
+
+
+def read_checkpoint_header(path: Path) -> Dict[str, Any]:
+    """Tensor names, dtypes and shapes of a zip-format PyTorch checkpoint
+
+    zipfile only seeks to the central directory and data.pkl, so the
+    tensor data is never read.
+    """
+    import pickle
+    import zipfile
+
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        raise ValueError(f"{path.name}: legacy (non-zip) torch format, cannot read header")
+    with archive:
+        pickles = [name for name in archive.namelist() if name.endswith("/data.pkl") or name == "data.pkl"]
+        if not pickles:
+            raise ValueError(f"{path.name}: no data.pkl in archive")
+        try:
+            with archive.open(pickles[0]) as data:
+                state = _load_header_pickle(data)
+        except (pickle.UnpicklingError, EOFError, TypeError, AttributeError, IndexError) as e:
+            raise ValueError(f"{path.name}: unreadable checkpoint pickle ({e})")
+
+    # Lightning checkpoints nest the weights under "state_dict"
+    if isinstance(state, dict) and isinstance(state.get("state_dict"), dict):
+        state = state["state_dict"]
+    if not isinstance(state, dict):
+        raise ValueError(f"{path.name}: not a state dict")
+    return {key: value for key, value in state.items() if isinstance(value, dict) and "shape" in value}
+
+
+def detect_kind(keys: List[str]) -> str:
+    """checkpoint, lora, vae, controlnet, motion_module or unknown"""
+    if any(key.startswith("lora_") or ".lora_down." in key or ".lora_A." in key for key in keys):
+        return "lora"
+    if any("motion_modules." in key for key in keys):
+        return "motion_module"
+    if any(key.startswith("control_model.") or "input_hint_block" in key for key in keys):
+        return "controlnet"
+    if any(key.startswith("model.diffusion_model.") for key in keys):
+        return "checkpoint"
+    if keys and all(key.startswith(("encoder.", "decoder.", "quant_conv.", "post_quant_conv."))
+                    for key in keys):
+        return "vae"
+    return "unknown"
+
+
+def detect_arch(header: Dict[str, Any]) -> Optional[str]:
+    """sdxl, sd15, sd2 or None, from key names and cross-attention width"""
+    keys = [key for key in header if key != "__metadata__"]
+    # AnimateDiff motion modules: SD1.5 UNets have four down blocks, SDXL three
+    if any("motion_modules." in key for key in keys):
+        return "sd15" if any(".down_blocks.3." in key or key.startswith("down_blocks.3.") for key in keys) else "sdxl"
+    if any(key.startswith(("conditioner.embedders.1", "lora_te2_", "lora_te1_")) for key in keys):
+        return "sdxl"
+    if any(key.startswith("cond_stage_model.model.") for key in keys):
+        return "sd2"
+    if any(key.startswith(("cond_stage_model.transformer.", "lora_te_")) for key in keys):
+        return "sd15"
+
+    # UNet-only LoRAs and motion modules: the attn2 key projection takes
+    # the text encoder's hidden size as input
+    for key in keys:
+        if "attn2" in key and "to_k" in key and "lora_up" not in key and "lora_B" not in key:
+            shape = header[key].get("shape", [])
+            if len(shape) == 2 and shape[1] in CONTEXT_DIMS:
+                return CONTEXT_DIMS[shape[1]]
+
+    base = header.get("__metadata__", {}).get("ss_base_model_version", "")
+    if base.startswith("sdxl"):
+        return "sdxl"
+    if base.startswith("sd_v1"):
+        return "sd15"
+    if base.startswith("sd_v2"):
+        return "sd2"
+    return None
+
+
+def lora_rank(header: Dict[str, Any]) -> Optional[int]:
+    """Most common rank (rows of lora_down / lora_A) across the LoRA's layers"""
+    ranks = Counter(
+        spec["shape"][0]
+        for key, spec in header.items()
+        if key != "__metadata__" and (".lora_down." in key or ".lora_A." in key) and spec.get("shape")
+    )
+    return ranks.most_common(1)[0][0] if ranks else None
+
+
+def describe(path: Path) -> Dict[str, Any]:
+    """Header-only description of one model file"""
+    info = {"format": path.suffix.lstrip(".").lower()}
+    if info["format"] == "safetensors":
+        header = read_safetensors_header(path)
+    elif info["format"] in ("ckpt", "pt", "pth"):
+        header = read_checkpoint_header(path)
+    else:
+        return info
+
+    tensors = {key: spec for key, spec in header.items() if key != "__metadata__"}
+    metadata = header.get("__metadata__", {}) or {}
+    dtypes = Counter(spec.get("dtype") for spec in tensors.values())
+
+    info.update(
+        kind=detect_kind(list(tensors)),
+        arch=detect_arch(header),
+        dtype=dtypes.most_common(1)[0][0] if dtypes else None,
+        tensors=len(tensors),
+    )
+    if info["kind"] == "lora":
+        info["rank"] = lora_rank(header)
+    info["metadata"] = {
+        key: value for key, value in metadata.items()
+        if key.startswith(("ss_", "modelspec.")) and len(str(value)) <= MAX_METADATA_VALUE
+    }
+    return info
+
+
+class ModelInventory:
+    def __init__(self, models_dir: Path):
+        self.models_dir = models_dir
+        self.inventory_file = models_dir / INVENTORY_FILE
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.inventory_file, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        return data["files"] if data.get("version") == INVENTORY_VERSION else {}
+
+    def _save(self, files: Dict[str, Dict]):
+        tmp = self.inventory_file.with_name(f"{INVENTORY_FILE}.{os.getpid()}.tmp")
+        with open(tmp, 'w') as f:
+            json.dump({"version": INVENTORY_VERSION, "files": files}, f, separators=(",", ":"))
+        os.replace(tmp, self.inventory_file)
+
+    def refresh(self, force: bool = False) -> List[Dict[str, Any]]:
+        """Return every model's entry, re-reading headers only where needed"""
+        cached = {} if force else self._load()
+        files = {}
+        for type_dir in MODEL_DIRS:
+            try:
+                entries = os.scandir(self.models_dir / type_dir)
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if os.path.splitext(entry.name)[1].lower() not in MODEL_EXTENSIONS or not entry.is_file():
+                        continue
+                    rel = f"{type_dir}/{entry.name}"
+                    st = entry.stat()
+                    record = cached.get(rel)
+                    if record is None or (record["size"], record["mtime_ns"]) != (st.st_size, st.st_mtime_ns):
+                        record = {"type": type_dir, "name": entry.name, "size": st.st_size,
+                                  "mtime_ns": st.st_mtime_ns}
+                        try:
+                            record.update(describe(Path(entry.path)))
+                        except (OSError, ValueError) as e:
+                            record["error"] = str(e)
+                    files[rel] = record
+
+        if files != cached and self.models_dir.exists():
+            self._save(files)
+        return [files[rel] for rel in sorted(files)]
+
+    def find(self, name: str) -> Optional[Dict[str, Any]]:
+        """Entry for a model by file name (any type directory)"""
+        for record in self.refresh():
+            if record["name"] == name:
+                return record
+        return None
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Incremental model sync from models/ into ComfyUI/models/.
+
+A file is transferred only when its (size, mtime) differs from what the
+last sync recorded, or from an unmanaged file of the same name in
+ComfyUI. Transfers try a hardlink, then a reflink (copy-on-write clone),
+optionally a symlink, and only then a full copy; copies run in a thread
+pool and land via temp file + rename so ComfyUI never sees half a model.
+"""
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import click
+
+from file_clone import reflink
+
+# models/<source dir> -> ComfyUI/models/<dest dir>
+MODEL_DIRS = {
+    "checkpoints": "checkpoints",
+    "loras": "loras",
+    "vae": "vae",
+    "vaes": "vae",
+    "controlnet": "controlnet",
+    "upscale_models": "upscale_models",
+    "animatediff": "animatediff_models",
+    "embeddings": "embeddings",
+}
+MODEL_EXTENSIONS = {".safetensors", ".ckpt", ".pt", ".pth", ".bin"}
+STATE_FILE = ".persona_model_sync.json"
+
+
+def file_hash(path: Path) -> str:
+    import hashlib
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _copy(src: Path, tmp: Path):
+    import shutil
+    shutil.copy2(src, tmp)
+
+
+def _hardlink(src: Path, tmp: Path):
+    os.link(src, tmp)
+
+
+def _symlink(src: Path, tmp: Path):
+    os.symlink(os.path.abspath(src), tmp)
+
+
+TRANSFER_METHODS = {
+    "hardlink": _hardlink,
+    "reflink": reflink,
+    "symlink": _symlink,
+    "copy": _copy,
+}
+
+
+class ModelSync:
+    def __init__(self, project_root: Path, allow_symlinks: bool = False,
+                 verify_hash: bool = False, workers: int = 4):
+        self.models_dir = project_root / "models"
+        self.comfyui_models = project_root / "ComfyUI" / "models"
+        self.state_file = self.comfyui_models / STATE_FILE
+        self.verify_hash = verify_hash
+        self.workers = workers
+        self.methods = ["hardlink", "reflink"] + (["symlink"] if allow_symlinks else []) + ["copy"]
+
+    def _load_state(self) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+        """(files this engine wrote, files it found already in place)"""
+        if self.state_file.exists():
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+            return state["files"], state.get("adopted", {})
+        return {}, {}
+
+    def _save_state(self, files: Dict[str, Dict], adopted: Dict[str, Dict]):
+        tmp = self.state_file.with_name(f"{STATE_FILE}.{os.getpid()}.tmp")
+        with open(tmp, 'w') as f:
+            json.dump({"version": 1, "files": files, "adopted": adopted}, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.state_file)
+
+    def _sources(self) -> Dict[str, Path]:
+        """Map of dest path (relative to ComfyUI/models) -> source file"""
+        sources = {}
+        for src_name, dest_name in MODEL_DIRS.items():
+            src_dir = self.models_dir / src_name
+            if not src_dir.is_dir():
+                continue
+            dest_dir = self.comfyui_models / dest_name
+            # setup.sh symlinks some ComfyUI model dirs straight at ours
+            if dest_dir.exists() and os.path.samefile(src_dir, dest_dir):
+                continue
+            for src in src_dir.iterdir():
+                if src.suffix.lower() in MODEL_EXTENSIONS and src.is_file():
+                    sources.setdefault(f"{dest_name}/{src.name}", src)
+        return sources
+
+    def _up_to_date(self, src: Path, dest: Path, record: Optional[Dict]) -> Tuple[bool, Optional[str]]:
+        """Whether dest already holds src; also returns the source hash if one was computed"""
+        if not dest.exists():
+            return False, None
+        st = src.stat()
+        if os.path.samefile(src, dest):
+            return True, None
+        if record is not None and (record["size"], record["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+            return True, None
+
+        # Unmanaged file (e.g. from the old copy2 sync) or a changed source
+        dst = dest.stat()
+        if self.verify_hash:
+            if dst.st_size != st.st_size:
+                return False, None
+            digest = file_hash(src)
+            return digest == ((record or {}).get("sha256") or file_hash(dest)), digest
+        return (dst.st_size, dst.st_mtime_ns) == (st.st_size, st.st_mtime_ns), None
+
+    def _transfer(self, src: Path, dest: Path) -> str:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+        for method in self.methods:
+            try:
+                TRANSFER_METHODS[method](src, tmp)
+            except OSError:
+                continue
+            try:
+                os.replace(tmp, dest)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+            return method
+        raise OSError(f"Could not sync {src} to {dest}")
+
+    def plan(self) -> Tuple[List[Tuple[str, Path, Path]], List[str], Dict[str, Dict], Dict[str, Dict]]:
+        """Work out (transfers, removals, files, adopted) without touching ComfyUI
+
+        Only files whose size/mtime moved are looked at beyond a stat. A
+        file that already matched its source before this engine wrote it
+        is adopted: tracked so it isn't re-checked, but never removed.
+        """
+        files, adopted = self._load_state()
+        sources = self._sources()
+        transfers = []
+        for rel, src in sorted(sources.items()):
+            dest = self.comfyui_models / rel
+            ok, digest = self._up_to_date(src, dest, files.get(rel, adopted.get(rel)))
+            if ok:
+                st = src.stat()
+                record = files[rel] if rel in files else adopted.setdefault(rel, {})
+                record.update(src=str(src.relative_to(self.models_dir)), size=st.st_size, mtime_ns=st.st_mtime_ns)
+                if digest:
+                    record["sha256"] = digest
+            else:
+                transfers.append((rel, src, dest))
+        removals = [rel for rel in files if rel not in sources]
+        # Adopted files whose source is gone are simply forgotten
+        adopted = {rel: record for rel, record in adopted.items() if rel in sources}
+        return transfers, removals, files, adopted
+
+    def sync(self) -> Dict[str, int]:
+        """Bring ComfyUI/models in line with models/, returns counts per action"""
+        report = {"unchanged": 0, "removed": 0, "bytes_copied": 0, "errors": 0}
+        if not self.comfyui_models.exists() or not self.models_dir.exists():
+            return report
+
+        transfers, removals, files, adopted = self.plan()
+        pending = {rel for rel, _src, _dest in transfers}
+        report["unchanged"] = sum(1 for rel in [*files, *adopted] if rel not in pending and rel not in removals)
+
+        # Only remove files this engine put there, and only if still ours
+        for rel in removals:
+            record = files.pop(rel)
+            dest = self.comfyui_models / rel
+            if dest.is_symlink() or (dest.exists() and dest.stat().st_size == record["size"]):
+                dest.unlink()
+                report["removed"] += 1
+
+        if transfers:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(self._transfer, src, dest): (rel, src) for rel, src, dest in transfers}
+                for future, (rel, src) in futures.items():
+                    try:
+                        method = future.result()
+                    except OSError:
+                        report["errors"] += 1
+                        continue
+                    st = src.stat()
+                    adopted.pop(rel, None)
+                    files[rel] = {
+                        "src": str(src.relative_to(self.models_dir)),
+                        "size": st.st_size,
+                        "mtime_ns": st.st_mtime_ns,
+                        "method": method,
+                    }
+                    if self.verify_hash:
+                        files[rel]["sha256"] = file_hash(src)
+                    report[method] = report.get(method, 0) + 1
+                    if method == "copy":
+                        report["bytes_copied"] += st.st_size
+
+        self._save_state(files, adopted)
+        return report
+
+
+def format_report(report: Dict[str, int]) -> str:
+    labels = {"hardlink": "hardlinked", "reflink": "reflinked", "symlink": "symlinked", "copy": "copied"}
+    parts = [f"{report[method]} {label}" for method, label in labels.items() if report.get(method)]
+    parts.append(f"{report['unchanged']} unchanged")
+    if report["removed"]:
+        parts.append(f"{report['removed']} removed")
+    if report["bytes_copied"]:
+        parts.append(f"{report['bytes_copied'] / (1024 * 1024):.1f} MB copied")
+    return ", ".join(parts)
+
+
+@click.command()
+@click.option('--hash', 'verify_hash', is_flag=True, help='Compare sha256 when size/mtime differ instead of re-syncing')
+@click.option('--allow-symlinks', is_flag=True, help='Try symlinks before falling back to copies')
+@click.option('--workers', default=4, help='Parallel copies')
+@click.option('--dry-run', is_flag=True, help='Only report what would change')
+def sync_models(verify_hash, allow_symlinks, workers, dry_run):
+    """Sync models/ into ComfyUI/models (links where possible, copies otherwise)"""
+    project_root = Path(__file__).parent.parent
+    if not (project_root / "ComfyUI" / "models").exists():
+        print("Error: ComfyUI/models not found. Run setup.sh first.")
+        sys.exit(1)
+
+    engine = ModelSync(project_root, allow_symlinks=allow_symlinks, verify_hash=verify_hash, workers=workers)
+    if dry_run:
+        transfers, removals, _files, _adopted = engine.plan()
+        for rel, src, _dest in transfers:
+            print(f"sync   {src} -> ComfyUI/models/{rel}")
+        for rel in removals:
+            print(f"remove ComfyUI/models/{rel}")
+        return
+
+    report = engine.sync()
+    print(f"✓ Models synced: {format_report(report)}")
+    if report["errors"]:
+        print(f"⚠ {report['errors']} model(s) could not be synced")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    sync_models()
@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+Searchable catalog of generated images.
+
+ComfyUI embeds the executed graph in every PNG as a "prompt" text chunk
+(and the editor graph as "workflow"). The catalog reads only the chunks
+before the image data, pulls out persona, LoRA, strength, seed, sampler
+and prompt, and indexes them in SQLite next to the file's stat
+signature, so re-scans skip everything already known. Thumbnails are
+rendered in a process pool.
+
+New files are picked up with inotify on Linux (IN_CLOSE_WRITE, so files
+are complete) and by periodic incremental re-scans elsewhere.
+"""
+import json
+import os
+import sqlite3
+import struct
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import click
+
+from sqlite_util import Transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    persona_id TEXT,
+    lora TEXT,
+    strength REAL,
+    seed INTEGER,
+    sampler TEXT,
+    scheduler TEXT,
+    steps INTEGER,
+    cfg REAL,
+    checkpoint TEXT,
+    width INTEGER,
+    height INTEGER,
+    prompt TEXT,
+    loras TEXT,
+    created REAL NOT NULL,
+    seconds REAL,
+    thumbnail TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_images_persona ON images (persona_id, strength, seed);
+CREATE INDEX IF NOT EXISTS idx_images_lora ON images (lora, strength);
+CREATE INDEX IF NOT EXISTS idx_images_seed ON images (seed);
+CREATE INDEX IF NOT EXISTS idx_images_created ON images (created);
+"""
+
+COLUMNS = ("persona_id", "lora", "strength", "seed", "sampler", "scheduler", "steps", "cfg",
+           "checkpoint", "width", "height", "prompt", "loras")
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+IMAGE_EXTENSIONS = {".png"}
+THUMBNAIL_SIZE = 256
+BATCH_SIZE = 200
+
+
+def read_png_text(path: Path) -> Dict[str, str]:
+    """tEXt/zTXt/iTXt chunks of a PNG, stopping at the first image data"""
+    text = {}
+    with open(path, 'rb') as f:
+        if f.read(8) != PNG_SIGNATURE:
+            raise ValueError(f"{path} is not a PNG")
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{path} is truncated")
+            length, kind = struct.unpack(">I4s", header)
+            if kind in (b"IDAT", b"IEND"):
+                return text
+            if kind not in (b"tEXt", b"zTXt", b"iTXt"):
+                f.seek(length + 4, os.SEEK_CUR)
+                continue
+            data = f.read(length)
+            f.seek(4, os.SEEK_CUR)  # CRC
+            key, _, value = data.partition(b"\x00")
+            if kind == b"zTXt":
+                value = zlib.decompress(value[1:])
+            elif kind == b"iTXt":
+                # compression flag, method, language\0, translated keyword\0, text
+                compressed, value = value[0], value[2:]
+                value = value.split(b"\x00", 2)[2]
+                if compressed:
+                    value = zlib.decompress(value)
+            encoding = "utf-8" if kind == b"iTXt" else "latin-1"
+            text[key.decode("latin-1")] = value.decode(encoding, "replace")
+
+
+def _linked(graph: Dict[str, Any], value) -> Optional[Dict[str, Any]]:
+    if isinstance(value, list) and len(value) == 2:
+        return graph.get(str(value[0]))
+    return None
+
+
+def _producer(graph: Dict[str, Any], filename: Optional[str]) -> Dict[str, Any]:
+    """The part of graph that fed the save node which wrote filename
+
+    Saves are matched by filename_prefix (ComfyUI appends _00001_.png), so
+    one graph with a branch per strength attributes each image to its own
+    branch. Without a match the whole graph is used.
+    """
+    best = None
+    for node_id, node in graph.items():
+        prefix = node.get("inputs", {}).get("filename_prefix") if isinstance(node, dict) else None
+        if isinstance(prefix, str) and filename and filename.startswith(prefix.rpartition("/")[2] + "_"):
+            if best is None or len(prefix) > len(best[1]):
+                best = (node_id, prefix)
+    if best is None:
+        return graph
+    ancestors, stack = {}, [best[0]]
+    while stack:
+        node_id = stack.pop()
+        if node_id in ancestors or node_id not in graph:
+            continue
+        ancestors[node_id] = graph[node_id]
+        stack.extend(str(value[0]) for value in graph[node_id].get("inputs", {}).values()
+                     if isinstance(value, list) and len(value) == 2)
+    return ancestors
+
+
+def describe_graph(graph: Dict[str, Any], lora_personas: Dict[str, str],
+                   filename: Optional[str] = None) -> Dict[str, Any]:
+    """Catalog columns for an image from the API graph that produced it"""
+    info: Dict[str, Any] = {}
+    loras = []
+    for node in _producer(graph, filename).values():
+        if not isinstance(node, dict):
+            continue
+        class_type, inputs = node.get("class_type"), node.get("inputs", {})
+        if class_type in ("LoraLoader", "LoraLoaderModelOnly") and isinstance(inputs.get("lora_name"), str):
+            loras.append({"name": inputs["lora_name"], "strength": inputs.get("strength_model")})
+        elif class_type == "CheckpointLoaderSimple" and "checkpoint" not in info:
+            info["checkpoint"] = inputs.get("ckpt_name")
+        elif class_type in ("KSampler", "KSamplerAdvanced") and "seed" not in info:
+            info["seed"] = inputs.get("seed", inputs.get("noise_seed"))
+            info.update(sampler=inputs.get("sampler_name"), scheduler=inputs.get("scheduler"),
+                        steps=inputs.get("steps"), cfg=inputs.get("cfg"))
+            positive = _linked(graph, inputs.get("positive"))
+            if positive and isinstance(positive.get("inputs", {}).get("text"), str):
+                info["prompt"] = positive["inputs"]["text"]
+            latent = _linked(graph, inputs.get("latent_image"))
+            if latent:
+                info.update(width=latent.get("inputs", {}).get("width"), height=latent.get("inputs", {}).get("height"))
+
+    if loras:
+        info.update(lora=loras[0]["name"], strength=loras[0]["strength"],
+                    loras=json.dumps(loras, separators=(",", ":")))
+        for lora in loras:
+            persona_id = lora_personas.get(Path(lora["name"]).name)
+            if persona_id:
+                info["persona_id"] = persona_id
+                break
+    # Values wired from other nodes aren't literals, keep only plain ones
+    return {key: value for key, value in info.items() if isinstance(value, (str, int, float))}
+
+
+def image_graph(path: Path) -> Optional[Dict[str, Any]]:
+    """The API graph that produced an image, compiled from the editor graph if needed"""
+    text = read_png_text(path)
+    if "prompt" in text:
+        return json.loads(text["prompt"])
+    if "workflow" in text:
+        from graph_compiler import GraphCompileError, compile_workflow
+        try:
+            return compile_workflow(json.loads(text["workflow"]))[0]
+        except GraphCompileError:
+            return None
+    return None
+
+
+def make_thumbnail(source: str, dest: str, size: int = THUMBNAIL_SIZE) -> str:
+    """Write a JPEG thumbnail, run in worker processes"""
+    from PIL import Image
+
+    with Image.open(source) as img:
+        img.thumbnail((size, size))
+        img.convert("RGB").save(dest + ".tmp", "JPEG", quality=85)
+    os.replace(dest + ".tmp", dest)
+    return dest
+
+
+class OutputCatalog:
+    def __init__(self, project_root: Path, output_dir: Optional[Path] = None,
+                 catalog_dir: Optional[Path] = None, workers: int = 4, timeout: float = 30.0):
+        self.project_root = project_root
+        self.output_dir = output_dir or project_root / "ComfyUI" / "output"
+        self.catalog_dir = catalog_dir or project_root / "outputs" / ".catalog"
+        self.thumbnail_dir = self.catalog_dir / "thumbnails"
+        self.thumbnail_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self.conn = sqlite3.connect(str(self.catalog_dir / "catalog.db"), timeout=timeout, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._lora_personas = None
+        self._pool = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+        self.conn.close()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        # Kept across batches so watching doesn't fork a new pool per file
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def lora_personas(self) -> Dict[str, str]:
+        """LoRA file name -> persona id, from the registry"""
+        if self._lora_personas is None:
+            from persona_manager import PersonaManager
+            self._lora_personas = {
+                Path(persona["lora_file"]).name: persona["id"]
+                for persona in PersonaManager(self.project_root).list_personas()
+                if persona.get("lora_file")
+            }
+        return self._lora_personas
+
+    def _known(self) -> Dict[str, Tuple[int, int]]:
+        return {path: (size, mtime_ns) for path, size, mtime_ns in
+                self.conn.execute("SELECT path, size, mtime_ns FROM images")}
+
+    def scan(self, directory: Optional[Path] = None) -> Iterator[Path]:
+        """Image files under directory that are new or changed since indexed"""
+        known = self._known()
+        stack = [directory or self.output_dir]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not entry.name.startswith("."):
+                            stack.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                        st = entry.stat()
+                        if known.get(os.path.abspath(entry.path)) != (st.st_size, st.st_mtime_ns):
+                            yield Path(entry.path)
+
+    def _thumbnail_path(self, path: str) -> Path:
+        import hashlib
+        return self.thumbnail_dir / f"{hashlib.sha1(path.encode()).hexdigest()}.jpg"
+
+    def ingest(self, paths: Iterable[Path], seconds: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+        """Index images and thumbnail them; returns counts of indexed/skipped/thumbnails
+
+        Metadata is read in this process (a few KB per file), thumbnails
+        are rendered in a process pool and rows are written in batches.
+        Files that can't be parsed yet (still being written) are skipped
+        and picked up by the next scan.
+        """
+        seconds = seconds or {}
+        stats = {"indexed": 0, "skipped": 0, "thumbnails": 0}
+        rows, futures = [], []
+        pool = self._executor()
+        for path in paths:
+            path = Path(os.path.abspath(path))
+            try:
+                st = path.stat()
+                graph = image_graph(path)
+            except (OSError, ValueError, zlib.error):
+                stats["skipped"] += 1
+                continue
+            info = describe_graph(graph, self.lora_personas(), path.name) if graph else {}
+            thumbnail = self._thumbnail_path(str(path))
+            futures.append(pool.submit(make_thumbnail, str(path), str(thumbnail)))
+            rows.append((str(path), st.st_size, st.st_mtime_ns, *(info.get(column) for column in COLUMNS),
+                         st.st_mtime, seconds.get(str(path)), str(thumbnail)))
+            if len(rows) >= BATCH_SIZE:
+                self._write(rows)
+                stats["indexed"] += len(rows)
+                rows = []
+        if rows:
+            self._write(rows)
+            stats["indexed"] += len(rows)
+        for future in futures:
+            try:
+                future.result()
+                stats["thumbnails"] += 1
+            except (OSError, ValueError):
+                pass
+        return stats
+
+    def _write(self, rows: List[Tuple]):
+        columns = ("path", "size", "mtime_ns") + COLUMNS + ("created", "seconds", "thumbnail")
+        # A re-ingested file keeps the timing recorded when it was generated
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns[1:] if column != "seconds")
+        with Transaction(self.conn):
+            self.conn.executemany(
+                f"INSERT INTO images ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT(path) DO UPDATE SET {updates}, seconds = COALESCE(excluded.seconds, seconds)",
+                rows,
+            )
+
+    def prune(self) -> int:
+        """Forget images whose files are gone"""
+        missing = [(path,) for path, in self.conn.execute("SELECT path FROM images") if not os.path.exists(path)]
+        if missing:
+            with Transaction(self.conn):
+                self.conn.executemany("DELETE FROM images WHERE path = ?", missing)
+        return len(missing)
+
+    def query(self, persona_id: Optional[str] = None, lora: Optional[str] = None,
+              strength: Optional[float] = None, seed: Optional[int] = None,
+              search: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Newest first, filtered in SQL"""
+        clauses, params = [], []
+        for column, value in (("persona_id", persona_id), ("lora", lora), ("seed", seed)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if strength is not None:
+            # Strengths are floats from JSON, compare with a tolerance
+            clauses.append("ABS(strength - ?) < 1e-6")
+            params.append(strength)
+        if search:
+            clauses.append("prompt LIKE ?")
+            params.append(f"%{search}%")
+        query = "SELECT * FROM images"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY created DESC LIMIT ?"
+        params.append(-1 if limit is None else limit)
+        cursor = self.conn.execute(query, params)
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def watch(self, interval: float = 2.0, on_batch=None):
+        """Ingest new images until interrupted"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        watcher = _Inotify.create(self.output_dir)
+        # Catch up on anything written while nobody was watching
+        stats = self.ingest(self.scan())
+        if on_batch:
+            on_batch(stats)
+        while True:
+            if watcher is not None:
+                paths = [path for path in watcher.read(timeout=interval)
+                         if path.suffix.lower() in IMAGE_EXTENSIONS]
+            else:
+                time.sleep(interval)
+                paths = list(self.scan())
+            if paths:
+                stats = self.ingest(paths)
+                if on_batch:
+                    on_batch(stats)
+
+
+class _Inotify:
+    """Minimal inotify binding through ctypes (Linux only)"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, libc, fd: int):
+        self.libc = libc
+        self.fd = fd
+        self.dirs: Dict[int, Path] = {}
+
+    @classmethod
+    def create(cls, root: Path) -> Optional["_Inotify"]:
+        """A recursive watcher on root, or None where inotify is unavailable"""
+        if not sys.platform.startswith("linux"):
+            return None
+        import ctypes
+        import ctypes.util
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(cls.IN_NONBLOCK | cls.IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        watcher = cls(libc, fd)
+        for directory, subdirs, _files in os.walk(root):
+            subdirs[:] = [name for name in subdirs if not name.startswith(".")]
+            watcher._add(Path(directory))
+        return watcher
+
+    def _add(self, directory: Path):
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+        if wd >= 0:
+            self.dirs[wd] = directory
+
+    def read(self, timeout: float) -> List[Path]:
+        """Files completed (closed after writing or moved in) within timeout seconds"""
+        import select
+
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        paths, offset = [], 0
+        while offset < len(data):
+            wd, mask, _cookie, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\x00"))
+            offset += length
+            directory = self.dirs.get(wd)
+            if directory is None or not name:
+                continue
+            if mask & self.IN_ISDIR:
+                # New subfolder from a "prefix/with/slashes" filename_prefix
+                if mask & self.IN_CREATE and not name.startswith("."):
+                    self._add(directory / name)
+            elif mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                paths.append(directory / name)
+        return paths
+
+
+@click.group()
+def cli():
+    """Index generated images by persona, LoRA, strength and seed"""
+    pass
+
+
+def _catalog(output_dir, workers) -> OutputCatalog:
+    return OutputCatalog(Path(__file__).parent.parent, Path(output_dir) if output_dir else None, workers=workers)
+
+
+@cli.command()
+@click.option('--output-dir', type=click.Path(file_okay=False), help='Directory to index (default: ComfyUI/output)')
+@click.option('--workers', default=4, help='Thumbnail processes')
+def scan(output_dir, workers):
+    """Index new and changed images once"""
+    catalog = _catalog(output_dir, workers)
+    stats = catalog.ingest(catalog.scan())
+    removed = catalog.prune()
+    catalog.close()
+    print(f"✓ {stats['indexed']} indexed, {stats['thumbnails']} thumbnails, {stats['skipped']} unreadable, "
+          f"{removed} removed")
+
+
+@cli.command()
+@click.option('--output-dir', type=click.Path(file_okay=False), help='Directory to watch (default: ComfyUI/output)')
+@click.option('--workers', default=4, help='Thumbnail processes')
+@click.option('--interval', default=2.0, help='Seconds between checks')
+def watch(output_dir, workers, interval):
+    """Index images as ComfyUI writes them (Ctrl+C to stop)"""
+    catalog = _catalog(output_dir, workers)
+    mode = "inotify" if sys.platform.startswith("linux") else f"polling every {interval}s"
+    print(f"Watching {catalog.output_dir} ({mode})")
+
+    def report(stats):
+        if stats["indexed"] or stats["skipped"]:
+            print(f"✓ {stats['indexed']} indexed" + (f", {stats['skipped']} unreadable" if stats["skipped"] else ""))
+
+    try:
+        catalog.watch(interval, report)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        catalog.close()
+
+
+@cli.command()
+@click.option('--persona-id', help='Persona the image was generated for')
+@click.option('--lora', help='LoRA file name')
+@click.option('--strength', type=float, help='LoRA strength')
+@click.option('--seed', type=int, help='Sampler seed')
+@click.option('--search', help='Text in the prompt')
+@click.option('--limit', default=50, help='Maximum results')
+@click.option('--json', 'as_json', is_flag=True, help='Print JSON lines instead of paths')
+def query(persona_id, lora, strength, seed, search, limit, as_json):
+    """Find indexed images"""
+    catalog = _catalog(None, 1)
+    for row in catalog.query(persona_id, lora, strength, seed, search, limit):
+        if as_json:
+            print(json.dumps(row))
+        else:
+            print(f"{row['path']}\t{row['persona_id'] or '-'}\tstrength={row['strength']}\tseed={row['seed']}")
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Compact sidecar index for fast persona lookups from shell scripts.
+
+Only json/os/sys are imported here (not even pathlib or typing) so that
+`persona_manager.py query` answers in a few milliseconds. Paths may be
+str or Path.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+
+INDEX_VERSION = "v1"
+DEFAULT_FIELDS = "name,trigger_word,training_data_path"
+
+
+def index_path(personas_file: str) -> str:
+    return os.path.join(os.path.dirname(os.fspath(personas_file)), ".personas.index")
+
+
+def _signature(personas_file: str) -> str:
+    """Identity of the registry file the index was built from"""
+    st = os.stat(personas_file)
+    return f"{st.st_ino} {st.st_mtime_ns} {st.st_size}"
+
+
+def _header(signature: str) -> bytes:
+    return f"# persona index {INDEX_VERSION} {signature}\n".encode()
+
+
+def write_index(personas_file: str, personas: dict, signature: str | None = None):
+    """Write one `<id>\\t<compact json>` line per persona, atomically
+
+    The header records which personas.json it was built from, so an index
+    that lost a race with a concurrent save is never trusted.
+    """
+    target = index_path(personas_file)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(_header(signature or _signature(personas_file)))
+        for pid, pdata in personas.items():
+            f.write(f"{pid}\t{json.dumps(pdata, separators=(',', ':'))}\n".encode())
+    os.replace(tmp, target)
+
+
+def _lookup_index(personas_file: str, persona_id: str) -> dict | None:
+    try:
+        signature = _signature(personas_file)
+    except FileNotFoundError:
+        return None
+    try:
+        with open(index_path(personas_file), 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        data = b""
+
+    # Rebuild when the registry was written without us (hand edits, old code)
+    header = _header(signature)
+    if not data.startswith(header):
+        with open(personas_file, 'r') as f:
+            personas = json.load(f)["personas"]
+        write_index(personas_file, personas, signature)
+        return personas.get(persona_id)
+
+    key = b"\n" + persona_id.encode() + b"\t"
+    start = data.find(key)
+    if start < 0:
+        return None
+    start += len(key)
+    return json.loads(data[start:data.index(b"\n", start)])
+
+
+def _lookup_sqlite(db_file: str, persona_id: str) -> dict | None:
+    import sqlite3
+
+    conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+    try:
+        row = conn.execute(
+            "SELECT data FROM personas WHERE id = ?", (persona_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    return None if row is None else json.loads(row[0])
+
+
+def lookup(project_root: str, persona_id: str) -> dict | None:
+    """Find one persona without loading the whole registry"""
+    db_file = os.path.join(project_root, "personas.db")
+    if os.path.exists(db_file):
+        return _lookup_sqlite(db_file, persona_id)
+    return _lookup_index(os.path.join(project_root, "personas.json"), persona_id)
+
+
+def _format(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(',', ':'))
+    return str(value)
+
+
+def query(project_root: str, persona_id: str, fields: list, sep: str = "|") -> str | None:
+    """Return the requested fields joined by `sep`, or None if not found"""
+    persona = lookup(project_root, persona_id)
+    if persona is None:
+        return None
+    persona = {"id": persona_id, **persona}
+    return sep.join(_format(persona.get(field)) for field in fields)
+
+
+def main(project_root: str, argv: list) -> int:
+    """`query <persona-id> [--fields a,b,c] [--sep |]`, prints NOT_FOUND and exits 1 if missing"""
+    args = list(argv)
+    fields, sep = DEFAULT_FIELDS, "|"
+    persona_id = None
+    while args:
+        arg = args.pop(0)
+        if arg == "--fields" and args:
+            fields = args.pop(0)
+        elif arg.startswith("--fields="):
+            fields = arg.split("=", 1)[1]
+        elif arg == "--sep" and args:
+            sep = args.pop(0)
+        elif arg.startswith("--sep="):
+            sep = arg.split("=", 1)[1]
+        elif persona_id is None and not arg.startswith("--"):
+            persona_id = arg
+        else:
+            print(f"Usage: persona_manager.py query <persona-id> [--fields {DEFAULT_FIELDS}] [--sep '|']",
+                  file=sys.stderr)
+            return 2
+    if persona_id is None:
+        print("Error: missing persona id", file=sys.stderr)
+        return 2
+
+    result = query(project_root, persona_id, [f.strip() for f in fields.split(",") if f.strip()], sep)
+    if result is None:
+        print("NOT_FOUND")
+        return 1
+    print(result)
+    return 0
@@ -1,44 +1,121 @@
 #!/usr/bin/env python3
-import json
 import os
+import sys
+
+if __name__ == "__main__" and sys.argv[1:2] == ["query"]:
+    # Fast path for shell scripts: answer from the sidecar index before
+    # pathlib, click, rich or the full registry are loaded
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from persona_index import main as query_main
+    sys.exit(query_main(os.path.dirname(sys.path[0]), sys.argv[2:]))
+
+import fcntl
+import json
 from pathlib import Path
-from typing import Dict, List, Optional
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
 import click
-from rich.console import Console
-from rich.table import Table
 from datetime import datetime
 
-console = Console()
+SCRIPT_DIR = Path(__file__).parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from lazy_console import LazyConsole
+from persona_index import DEFAULT_FIELDS, query as query_persona, write_index
+
+console = LazyConsole()
 
 class PersonaManager:
-    def __init__(self, project_root: Path):
+    def __init__(self, project_root: Path, backend: Optional[str] = None):
         self.project_root = project_root
         self.personas_file = project_root / "personas.json"
+        self.db_file = project_root / "personas.db"
         self.models_dir = project_root / "models" / "loras"
         self.training_data_dir = project_root / "training_data"
-        self.personas = self._load_personas()
+
+        # The SQLite registry is used automatically once it has been migrated to
+        self.backend = backend or ("sqlite" if self.db_file.exists() else "json")
+        if self.backend == "sqlite":
+            from persona_store import SQLitePersonaStore
+            self.store = SQLitePersonaStore(self.db_file)
+            self.personas = None
+        elif self.backend == "json":
+            self.store = None
+            self.personas = self._load_personas()
+        else:
+            raise ValueError(f"Unknown registry backend: {backend}")
     
     def _load_personas(self) -> Dict:
         """Load personas from JSON file"""
         if self.personas_file.exists():
             with open(self.personas_file, 'r') as f:
+                self._loaded_stat = self._file_stat(f.fileno())
                 return json.load(f)
+        self._loaded_stat = None
         return {"personas": {}}
     
-    def _save_personas(self):
-        """Save personas to JSON file"""
-        with open(self.personas_file, 'w') as f:
-            json.dump(self.personas, f, indent=2)
+    @staticmethod
+    def _file_stat(fd_or_path) -> Tuple[int, int, int]:
+        st = os.stat(fd_or_path)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
     
-    def add_persona(self, name: str, description: str = "", trigger_word: str = None) -> str:
-        """Add a new persona"""
+    @contextmanager
+    def _registry_lock(self):
+        """Hold the advisory lock on personas.json for a read-modify-write
+        
+        Takes an exclusive flock and yields the registry as it currently is
+        on disk, re-reading the whole file if another writer replaced it.
+        Every save replaces the file by rename, so an unchanged (inode,
+        mtime, size) means our in-memory copy is current and the re-read
+        can be skipped.
+        """
+        lock_file = self.personas_file.with_name(self.personas_file.name + ".lock")
+        with open(lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                current = self._file_stat(self.personas_file) if self.personas_file.exists() else None
+                if current is None or current != self._loaded_stat:
+                    on_disk = self._load_personas()
+                else:
+                    on_disk = self.personas
+                yield on_disk
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    
+    def _save_personas(self, personas: Optional[Dict] = None):
+        """Atomically save personas to JSON file (temp file + rename)
+        
+        Callers must hold _registry_lock.
+        """
+        import tempfile
+        
+        personas = self.personas if personas is None else personas
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=f".{self.personas_file.name}.", dir=str(self.personas_file.parent)
+        )
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(personas, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.personas_file)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._loaded_stat = self._file_stat(self.personas_file)
+        
+        # Keep the sidecar used by `persona_manager.py query` current
+        ino, mtime_ns, size = self._loaded_stat
+        write_index(self.personas_file, personas["personas"], f"{ino} {mtime_ns} {size}")
+    
+    def _new_persona(self, name: str, description: str = "", trigger_word: str = None,
+                     config: Optional[Dict] = None) -> Tuple[str, Dict]:
+        """Build the id and registry record for a new persona"""
         persona_id = f"persona-{name.lower().replace(' ', '_')}"
         trigger = trigger_word or persona_id
         
-        if persona_id in self.personas["personas"]:
-            raise ValueError(f"Persona {persona_id} already exists")
-        
-        self.personas["personas"][persona_id] = {
+        persona = {
             "name": name,
             "description": description,
             "trigger_word": trigger,
@@ -50,41 +127,181 @@ class PersonaManager:
                 "base_model": "sd_xl_base_1.0.safetensors",
                 "learning_rate": 1e-4,
                 "train_steps": 4000,
-                "network_dim": 64
+                "network_dim": 64,
+                "repeats": 10
             }
         }
-        
-        # Create directories
+        if config:
+            persona["config"].update(config)
+        return persona_id, persona
+    
+    def _create_persona_dirs(self, persona_id: str):
+        """Create the raw/processed training data tree for a persona"""
         (self.training_data_dir / persona_id / "raw").mkdir(parents=True, exist_ok=True)
         (self.training_data_dir / persona_id / "processed").mkdir(parents=True, exist_ok=True)
+    
+    def _commit_new_personas(self, personas: List[Tuple[str, Dict]]) -> List[str]:
+        """Write new personas to the registry in one save/transaction
         
-        self._save_personas()
+        Returns the ids that another writer registered in the meantime;
+        those are left untouched.
+        """
+        if self.store:
+            return self.store.insert_many(personas)
+        
+        with self._registry_lock() as on_disk:
+            existing = on_disk["personas"]
+            skipped = [pid for pid, _ in personas if pid in existing]
+            existing.update((pid, pdata) for pid, pdata in personas if pid not in existing)
+            self._save_personas(on_disk)
+            self.personas = on_disk
+        return skipped
+    
+    def _trigger_words(self) -> Dict[str, str]:
+        """Map of trigger word -> persona id for existing personas"""
+        if self.store:
+            return self.store.trigger_words()
+        return {
+            pdata["trigger_word"]: pid
+            for pid, pdata in self.personas["personas"].items()
+        }
+    
+    def add_persona(self, name: str, description: str = "", trigger_word: str = None) -> str:
+        """Add a new persona"""
+        persona_id, persona = self._new_persona(name, description, trigger_word)
+        
+        if self._exists(persona_id):
+            raise ValueError(f"Persona {persona_id} already exists")
+        
+        self._create_persona_dirs(persona_id)
+        if self._commit_new_personas([(persona_id, persona)]):
+            raise ValueError(f"Persona {persona_id} already exists")
         return persona_id
     
+    def add_personas(self, rows: List[Dict], workers: int = 8) -> Tuple[List[str], List[Tuple[int, str]]]:
+        """Add many personas with a single registry write
+        
+        Rows are validated in memory against the registry and each other,
+        directories are created in a thread pool and every row that made it
+        through is committed at once. Returns (created ids, [(row number, error)]).
+        """
+        errors = []
+        pending = []
+        seen_ids = set()
+        triggers = self._trigger_words()
+        
+        for row_num, row in enumerate(rows, start=1):
+            if not isinstance(row, dict):
+                errors.append((row_num, f"invalid row: {row!r:.80}"))
+                continue
+            wrong_type = [
+                f"{field} must be {expected}"
+                for field, kind, expected in (("name", str, "a string"), ("description", str, "a string"),
+                                              ("trigger_word", str, "a string"), ("config", dict, "an object"))
+                if row.get(field) is not None and not isinstance(row[field], kind)
+            ]
+            if wrong_type:
+                errors.append((row_num, ", ".join(wrong_type)))
+                continue
+            name = (row.get("name") or "").strip()
+            if not name:
+                errors.append((row_num, "missing name"))
+                continue
+            
+            persona_id, persona = self._new_persona(
+                name,
+                row.get("description") or "",
+                (row.get("trigger_word") or "").strip() or None,
+                row.get("config"),
+            )
+            if persona_id in seen_ids or self._exists(persona_id):
+                errors.append((row_num, f"Persona {persona_id} already exists"))
+                continue
+            trigger = persona["trigger_word"]
+            if trigger in triggers:
+                errors.append((row_num, f"Trigger word '{trigger}' already used by {triggers[trigger]}"))
+                continue
+            
+            seen_ids.add(persona_id)
+            triggers[trigger] = persona_id
+            pending.append((row_num, persona_id, persona))
+        
+        from concurrent.futures import ThreadPoolExecutor
+        
+        created = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                (row_num, persona_id, persona, pool.submit(self._create_persona_dirs, persona_id))
+                for row_num, persona_id, persona in pending
+            ]
+            for row_num, persona_id, persona, future in futures:
+                try:
+                    future.result()
+                except OSError as e:
+                    errors.append((row_num, f"Could not create training data directories: {e}"))
+                    continue
+                created.append((persona_id, persona))
+        
+        if created:
+            skipped = set(self._commit_new_personas(created))
+            if skipped:
+                rows_by_id = {persona_id: row_num for row_num, persona_id, _ in pending}
+                errors.extend((rows_by_id[pid], f"Persona {pid} already exists") for pid in skipped)
+                created = [(pid, pdata) for pid, pdata in created if pid not in skipped]
+        errors.sort()
+        return [persona_id for persona_id, _ in created], errors
+    
+    def _exists(self, persona_id: str) -> bool:
+        if self.store:
+            return self.store.exists(persona_id)
+        return persona_id in self.personas["personas"]
+    
     def update_persona(self, persona_id: str, **kwargs):
         """Update persona information"""
-        if persona_id not in self.personas["personas"]:
-            raise ValueError(f"Persona {persona_id} not found")
-        
-        persona = self.personas["personas"][persona_id]
-        for key, value in kwargs.items():
-            if key == "config":
-                persona["config"].update(value)
-            else:
-                persona[key] = value
+        if self.store:
+            self.store.update(persona_id, **kwargs)
+            return
         
-        self._save_personas()
+        # Apply the changed fields to a fresh read of the whole file, taken
+        # under the exclusive lock, so concurrent writers (e.g. parallel
+        # train_lora.sh jobs) don't overwrite each other's updates
+        with self._registry_lock() as on_disk:
+            persona = on_disk["personas"].get(persona_id)
+            if persona is None:
+                raise ValueError(f"Persona {persona_id} not found")
+            
+            for key, value in kwargs.items():
+                if key == "config":
+                    persona["config"].update(value)
+                else:
+                    persona[key] = value
+            
+            self._save_personas(on_disk)
+            self.personas = on_disk
     
     def get_persona(self, persona_id: str) -> Optional[Dict]:
         """Get persona information"""
+        if self.store:
+            return self.store.get(persona_id)
         return self.personas["personas"].get(persona_id)
     
-    def list_personas(self) -> List[Dict]:
-        """List all personas"""
-        return [
+    def list_personas(self, trained: Optional[bool] = None, created_after: Optional[str] = None,
+                      created_before: Optional[str] = None, limit: Optional[int] = None,
+                      offset: int = 0) -> List[Dict]:
+        """List personas, optionally filtered by training state and creation range"""
+        if self.store:
+            return self.store.list(trained, created_after, created_before, limit, offset)
+        
+        personas = [
             {"id": pid, **pdata} 
             for pid, pdata in self.personas["personas"].items()
+            if (trained is None or pdata["trained"] == trained)
+            and (not created_after or pdata["created"] >= created_after)
+            and (not created_before or pdata["created"] < created_before)
         ]
+        personas.sort(key=lambda p: (p["created"], p["id"]))
+        end = None if limit is None else offset + limit
+        return personas[offset:end]
     
     def mark_trained(self, persona_id: str, lora_file: str):
         """Mark persona as trained"""
@@ -225,6 +442,52 @@ def add(name, description, trigger_word):
     except ValueError as e:
         console.print(f"[red]Error: {e}[/red]")
 
+def _read_import_rows(path: Path) -> List[Dict]:
+    """Read persona rows from a CSV (with header) or JSONL file"""
+    import csv
+    
+    if path.suffix.lower() in (".jsonl", ".ndjson"):
+        rows = []
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                # Blank and malformed lines stay in place so row numbers match the file
+                try:
+                    rows.append(json.loads(line) if line else {})
+                except json.JSONDecodeError:
+                    rows.append(line)
+        return rows
+    
+    with open(path, 'r', newline='') as f:
+        return [
+            {key.strip(): value for key, value in row.items() if key}
+            for row in csv.DictReader(f)
+        ]
+
+@cli.command(name='import')
+@click.argument('file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--workers', default=8, help='Threads used to create training data directories')
+def import_personas(file, workers):
+    """Bulk-add personas from a CSV or JSONL file (name, description, trigger_word)"""
+    import csv
+    
+    project_root = Path(__file__).parent.parent
+    manager = PersonaManager(project_root)
+    
+    try:
+        rows = _read_import_rows(Path(file))
+    except (csv.Error, UnicodeDecodeError, OSError) as e:
+        console.print(f"[red]Error reading {file}: {e}[/red]")
+        return
+    
+    created, errors = manager.add_personas(rows, workers=workers)
+    
+    for row_num, error in errors:
+        console.print(f"[red]Row {row_num}: {error}[/red]")
+    console.print(f"[green]✓ Imported {len(created)}/{len(rows)} personas[/green]")
+    if created:
+        console.print(f"[blue]Training data directories: training_data/<persona-id>/raw/[/blue]")
+
 @cli.command()
 @click.argument('persona-id')
 @click.option('--lora-file', required=True, help='Path to the trained LoRA file')
@@ -240,17 +503,24 @@ def mark_trained(persona_id, lora_file):
     except ValueError as e:
         console.print(f"[red]Error: {e}[/red]")
 
-@cli.command()
-def list():
+@cli.command(name='list')
+@click.option('--trained/--untrained', default=None, help='Only show trained or untrained personas')
+@click.option('--since', help='Only personas created on or after this ISO date')
+@click.option('--until', help='Only personas created before this ISO date')
+@click.option('--limit', type=int, help='Maximum number of personas to show')
+@click.option('--offset', default=0, help='Number of personas to skip')
+def list_command(trained, since, until, limit, offset):
     """List all personas"""
     project_root = Path(__file__).parent.parent
     manager = PersonaManager(project_root)
     
-    personas = manager.list_personas()
+    personas = manager.list_personas(trained, since, until, limit, offset)
     if not personas:
         console.print("[yellow]No personas found[/yellow]")
         return
     
+    from rich.table import Table
+    
     table = Table(title="Personas")
     table.add_column("ID", style="cyan")
     table.add_column("Name", style="green")
@@ -269,6 +539,23 @@ def list():
     
     console.print(table)
 
+@cli.command()
+@click.argument('persona_id')
+@click.option('--fields', default=DEFAULT_FIELDS, help='Comma-separated fields to print')
+@click.option('--sep', default='|', help='Field separator')
+def query(persona_id, fields, sep):
+    """Print persona fields for shell scripts (fast path, prints NOT_FOUND if missing)
+    
+    When run directly as `persona_manager.py query ...` this is answered
+    before click and rich are imported; this command only documents it.
+    """
+    project_root = Path(__file__).parent.parent
+    result = query_persona(project_root, persona_id, [f.strip() for f in fields.split(",") if f.strip()], sep)
+    if result is None:
+        click.echo("NOT_FOUND")
+        sys.exit(1)
+    click.echo(result)
+
 @cli.command()
 @click.argument('persona_id')
 def info(persona_id):
@@ -292,27 +579,74 @@ def info(persona_id):
     for key, value in persona['config'].items():
         console.print(f"  {key}: {value}")
 
+@cli.command()
+@click.option('--force', is_flag=True, help='Replace an existing personas.db')
+def migrate(force):
+    """Migrate personas.json into the indexed SQLite registry"""
+    from persona_store import migrate_json
+    
+    project_root = Path(__file__).parent.parent
+    personas_file = project_root / "personas.json"
+    db_file = project_root / "personas.db"
+    
+    if not personas_file.exists():
+        console.print(f"[red]Error: {personas_file} not found[/red]")
+        return
+    if force:
+        for path in (db_file, db_file.with_name(db_file.name + "-wal"), db_file.with_name(db_file.name + "-shm")):
+            if path.exists():
+                path.unlink()
+    
+    try:
+        count = migrate_json(personas_file, db_file)
+    except ValueError as e:
+        console.print(f"[red]Error: {e} (use --force to replace it)[/red]")
+        return
+    
+    console.print(f"[green]✓ Migrated {count} personas to {db_file}[/green]")
+    console.print(f"[blue]personas.json is no longer read while personas.db exists[/blue]")
+
 @cli.command()
 @click.argument('persona_ids', nargs=-1, required=True)
 @click.option('--prompt', '-p', default='masterpiece, best quality', help='Base prompt')
 @click.option('--output', '-o', help='Output workflow file')
-def generate_workflow(persona_ids, prompt, output):
+@click.option('--num-images', default=1, help='Images to produce (split into batches)')
+@click.option('--batch-size', default='1', help="Images per sampling pass, or 'auto' to fit the memory budget")
+@click.option('--memory-budget', type=float, help='GB available for auto batch size (default: $PERSONA_MEMORY_BUDGET_GB or 60% of RAM)')
+def generate_workflow(persona_ids, prompt, output, num_images, batch_size, memory_budget):
     """Generate workflow for multiple personas"""
     project_root = Path(__file__).parent.parent
     manager = PersonaManager(project_root)
     
     workflow = manager.generate_multi_lora_workflow(list(persona_ids), prompt)
     
+    from compat_check import IncompatibleModelsError, validate_workflow
+    from memory_model import plan_batches, resolve_batch_size
+    from workflow_batch import batched_graphs
+    try:
+        for warning in validate_workflow(workflow, project_root):
+            console.print(f"[yellow]Warning: {warning}[/yellow]")
+        size, note = resolve_batch_size(batch_size, num_images, project_root, workflow, memory_budget)
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
+        return
+    if note:
+        console.print(f"[blue]{note}[/blue]")
+    
     if output:
         output_path = Path(output)
     else:
         output_path = project_root / "workflows" / f"multi_{'_'.join(persona_ids)}.json"
     
+    batches = plan_batches(num_images, size)
     output_path.parent.mkdir(exist_ok=True)
-    with open(output_path, 'w') as f:
-        json.dump(workflow, f, indent=2)
-    
-    console.print(f"[green]Workflow saved to: {output_path}[/green]")
+    for index, graph in enumerate(batched_graphs(workflow, batches), start=1):
+        path = output_path if len(batches) == 1 else output_path.with_name(f"{output_path.stem}_batch{index}.json")
+        with open(path, 'w') as f:
+            json.dump(graph, f, indent=2)
+        console.print(f"[green]Workflow saved to: {path}[/green]")
+    if len(batches) > 1:
+        console.print(f"[blue]{num_images} images in {len(batches)} batches of up to {size}[/blue]")
 
 if __name__ == "__main__":
     cli()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+import json
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlite_util import Transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS personas (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    trigger_word TEXT NOT NULL,
+    trained INTEGER NOT NULL DEFAULT 0,
+    created TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_personas_trained ON personas (trained, created);
+CREATE INDEX IF NOT EXISTS idx_personas_created ON personas (created);
+CREATE INDEX IF NOT EXISTS idx_personas_trigger ON personas (trigger_word);
+"""
+
+
+class SQLitePersonaStore:
+    """Indexed SQLite registry with the same record layout as personas.json"""
+
+    def __init__(self, db_file: Path, timeout: float = 30.0):
+        self.db_file = db_file
+        self.conn = sqlite3.connect(str(db_file), timeout=timeout, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _row_values(persona_id: str, data: Dict, version: int) -> Tuple:
+        # The version column counts row updates; it never leaks into the
+        # record, which must look the same as with the JSON backend
+        data = {key: value for key, value in data.items() if key != "version"}
+        return (
+            persona_id,
+            data["name"],
+            data["trigger_word"],
+            int(bool(data.get("trained", False))),
+            data["created"],
+            version,
+            json.dumps(data, separators=(",", ":")),
+        )
+
+    def get(self, persona_id: str) -> Optional[Dict]:
+        """Get a single persona by id"""
+        row = self.conn.execute(
+            "SELECT data FROM personas WHERE id = ?", (persona_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def exists(self, persona_id: str) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM personas WHERE id = ?", (persona_id,)
+        ).fetchone() is not None
+
+    def trigger_words(self) -> Dict[str, str]:
+        """Map of trigger word -> persona id"""
+        return {
+            trigger: pid
+            for pid, trigger in self.conn.execute("SELECT id, trigger_word FROM personas")
+        }
+
+    def list(self, trained: Optional[bool] = None, created_after: Optional[str] = None,
+             created_before: Optional[str] = None, limit: Optional[int] = None,
+             offset: int = 0) -> List[Dict]:
+        """List personas ordered by creation time, filtered and paginated in SQL"""
+        clauses, params = [], []
+        if trained is not None:
+            clauses.append("trained = ?")
+            params.append(int(trained))
+        if created_after:
+            clauses.append("created >= ?")
+            params.append(created_after)
+        if created_before:
+            clauses.append("created < ?")
+            params.append(created_before)
+
+        query = "SELECT id, data FROM personas"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY created, id LIMIT ? OFFSET ?"
+        params.extend([-1 if limit is None else limit, offset])
+
+        return [{"id": pid, **json.loads(data)} for pid, data in self.conn.execute(query, params)]
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM personas").fetchone()[0]
+
+    def insert_many(self, personas: Iterable[Tuple[str, Dict]]) -> List[str]:
+        """Insert new personas in a single transaction
+
+        Returns the ids that already existed; those rows are left untouched.
+        """
+        skipped = []
+        with Transaction(self.conn):
+            for pid, data in personas:
+                cursor = self.conn.execute(
+                    "INSERT INTO personas (id, name, trigger_word, trained, created, version, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO NOTHING",
+                    self._row_values(pid, data, data.get("version", 1)),
+                )
+                if cursor.rowcount == 0:
+                    skipped.append(pid)
+        return skipped
+
+    def update(self, persona_id: str, **kwargs) -> Dict:
+        """Apply field updates to one row and bump its version atomically"""
+        with Transaction(self.conn):
+            row = self.conn.execute(
+                "SELECT data, version FROM personas WHERE id = ?", (persona_id,)
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Persona {persona_id} not found")
+
+            persona = json.loads(row[0])
+            for key, value in kwargs.items():
+                if key == "config":
+                    persona["config"].update(value)
+                else:
+                    persona[key] = value
+
+            version = row[1] + 1
+            values = self._row_values(persona_id, persona, version)
+            self.conn.execute(
+                "UPDATE personas SET name = ?, trigger_word = ?, trained = ?, created = ?, "
+                "version = ?, data = ? WHERE id = ?",
+                values[1:] + (persona_id,),
+            )
+        return persona
+
+
+def migrate_json(personas_file: Path, db_file: Path) -> int:
+    """One-shot import of personas.json into a new SQLite registry"""
+    if db_file.exists():
+        raise ValueError(f"{db_file} already exists")
+
+    with open(personas_file, 'r') as f:
+        personas = json.load(f).get("personas", {})
+
+    store = SQLitePersonaStore(db_file)
+    try:
+        store.insert_many(personas.items())
+    except Exception:
+        store.close()
+        db_file.unlink()
+        raise
+    store.close()
+    return len(personas)
@@ -3,11 +3,9 @@ import os
 import subprocess
 from pathlib import Path
 import click
-from rich.console import Console
-import cv2
-import numpy as np
+from lazy_console import LazyConsole
 
-console = Console()
+console = LazyConsole()
 
 class VideoProcessor:
     def __init__(self):
@@ -1,57 +1,136 @@
 #!/usr/bin/env python3
+import json
 import os
-import shutil
 from pathlib import Path
-from PIL import Image
+from typing import Any, Dict, List, Optional, Tuple
 import click
-from rich.console import Console
-from rich.progress import track
+from lazy_console import LazyConsole
 
-console = Console()
+console = LazyConsole()
 
-def process_image(input_path: Path, output_path: Path, target_size: int = 1024):
-    """Process and resize image for training"""
+# Maps raw image (name, size, mtime, sha256) and target size to its output
+MANIFEST_FILE = ".manifest.json"
+DEFAULT_REPEATS = 10
+
+def _render_image(input_path: Path, output_path: Path, target_size: int):
+    """Letterbox input_path onto a white target_size square PNG, raising on failure"""
+    from PIL import Image
+    
+    img = Image.open(input_path)
+    
+    # Convert to RGB if necessary
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    
+    # Calculate aspect ratio preserving resize
+    width, height = img.size
+    aspect_ratio = width / height
+    
+    if width > height:
+        new_width = target_size
+        new_height = int(target_size / aspect_ratio)
+    else:
+        new_height = target_size
+        new_width = int(target_size * aspect_ratio)
+    
+    # Resize with high quality
+    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    
+    # Create square canvas
+    canvas = Image.new('RGB', (target_size, target_size), (255, 255, 255))
+    
+    # Paste image centered
+    x_offset = (target_size - new_width) // 2
+    y_offset = (target_size - new_height) // 2
+    canvas.paste(img, (x_offset, y_offset))
+    
+    # Save processed image
+    canvas.save(output_path, 'PNG', quality=95)
+
+def _process_job(job: Tuple[Path, Path, int]) -> Optional[str]:
+    """Worker entry point: None on success, the error otherwise (printed by the parent)"""
+    input_path, output_path, target_size = job
     try:
-        img = Image.open(input_path)
-        
-        # Convert to RGB if necessary
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        # Calculate aspect ratio preserving resize
-        width, height = img.size
-        aspect_ratio = width / height
-        
-        if width > height:
-            new_width = target_size
-            new_height = int(target_size / aspect_ratio)
-        else:
-            new_height = target_size
-            new_width = int(target_size * aspect_ratio)
-        
-        # Resize with high quality
-        img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        
-        # Create square canvas
-        canvas = Image.new('RGB', (target_size, target_size), (255, 255, 255))
-        
-        # Paste image centered
-        x_offset = (target_size - new_width) // 2
-        y_offset = (target_size - new_height) // 2
-        canvas.paste(img, (x_offset, y_offset))
-        
-        # Save processed image
-        canvas.save(output_path, 'PNG', quality=95)
-        return True
+        _render_image(input_path, output_path, target_size)
+        return None
     except Exception as e:
-        console.print(f"[red]Error processing {input_path}: {e}[/red]")
-        return False
+        return str(e)
+
+def _load_manifest(manifest_file: Path) -> Dict[str, Any]:
+    if manifest_file.exists():
+        with open(manifest_file, 'r') as f:
+            return json.load(f)
+    return {}
+
+def _save_manifest(manifest_file: Path, manifest: Dict[str, Any]):
+    tmp = manifest_file.with_name(f"{MANIFEST_FILE}.{os.getpid()}.tmp")
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, manifest_file)
+
+def _link_into(src: Path, dest: Path) -> bool:
+    """Hardlink src at dest (copy across filesystems), returns False if already current"""
+    import shutil
+    
+    try:
+        dest_stat = dest.stat()
+    except FileNotFoundError:
+        dest_stat = None
+    src_stat = src.stat()
+    if dest_stat is not None:
+        if os.path.samestat(src_stat, dest_stat):
+            return False
+        # A matching copy is only kept where a hardlink isn't possible, so
+        # copies left by earlier versions get replaced by links once
+        unchanged = (dest_stat.st_size, dest_stat.st_mtime_ns) == (src_stat.st_size, src_stat.st_mtime_ns)
+        if unchanged and dest_stat.st_dev != src_stat.st_dev:
+            return False
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dest)
+    return True
+
+def _with_caption(output: str) -> Tuple[str, str]:
+    return output, Path(output).with_suffix('.txt').name
+
+def plan_images(image_files: List[Path], previous: Dict[str, Dict[str, Any]], output_path: Path,
+                persona_id: str, target_size: int) -> Tuple[Dict[str, Dict[str, Any]], List[Tuple[Path, Path, int]]]:
+    """Return (manifest entries by raw name, jobs to run) for the current raw images
+    
+    A raw file whose (size, mtime) matches the manifest keeps its recorded
+    hash without being read. An output is regenerated only if it is missing
+    or was made at another target size; identical photos share one output.
+    """
+    from model_sync import file_hash
+    
+    done = {entry["output"]: entry for entry in previous.values()}
+    entries, jobs, queued = {}, [], set()
+    for img_file in image_files:
+        st = img_file.stat()
+        old = previous.get(img_file.name)
+        if old and (old["size"], old["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+            digest = old["sha256"]
+        else:
+            digest = file_hash(img_file)
+        output = f"{persona_id}_{digest[:16]}.png"
+        entries[img_file.name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest,
+                                  "output": output, "target_size": target_size}
+        if output in queued:
+            continue
+        if output not in done or done[output]["target_size"] != target_size or not (output_path / output).exists():
+            jobs.append((img_file, output_path / output, target_size))
+            queued.add(output)
+    return entries, jobs
 
 @click.command()
 @click.option('--persona-id', required=True, help='Persona ID (e.g., persona-larry)')
 @click.option('--target-size', default=1024, help='Target size for training images')
 @click.option('--caption-template', help='Custom caption template (defaults to "a photo of {trigger_word}")')
-def prepare_data(persona_id, target_size, caption_template):
+@click.option('--workers', type=int, help='Processes resizing images in parallel (default: all cores)')
+def prepare_data(persona_id, target_size, caption_template, workers):
     """Prepare training data for LoRA training"""
     # Get persona info
     from pathlib import Path as PathLib
@@ -73,6 +152,15 @@ def prepare_data(persona_id, target_size, caption_template):
         console.print(f"[red]Error importing persona manager: {e}[/red]")
         return
     
+    # kohya_ss reads the repeat count from a folder name, so it has to be a positive whole number
+    repeats = persona.get('config', {}).get('repeats', DEFAULT_REPEATS)
+    if isinstance(repeats, str) and repeats.strip().isdigit():
+        repeats = int(repeats)
+    if isinstance(repeats, bool) or not isinstance(repeats, int) or repeats < 1:
+        console.print(f"[red]Invalid repeats {repeats!r} in the config of {persona_id}, "
+                      f"expected a whole number of at least 1[/red]")
+        return
+    
     # Set paths from persona config
     input_path = PathLib(persona['training_data_path']) / 'raw'
     output_path = PathLib(persona['training_data_path']) / 'processed'
@@ -90,8 +178,9 @@ def prepare_data(persona_id, target_size, caption_template):
     
     # Get all image files
     image_extensions = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
-    image_files = [f for f in input_path.iterdir() 
-                   if f.suffix.lower() in image_extensions]
+    # Sorted so progress and the manifest don't depend on directory order
+    image_files = sorted(f for f in input_path.iterdir()
+                         if f.suffix.lower() in image_extensions)
     
     if not image_files:
         console.print(f"[red]No images found in {input_path}![/red]")
@@ -105,43 +194,109 @@ def prepare_data(persona_id, target_size, caption_template):
     # Create output directory
     output_path.mkdir(parents=True, exist_ok=True)
     
-    # Process images
-    processed = 0
-    for idx, img_file in enumerate(track(image_files, description="Processing images...")):
-        output_file = output_path / f"{persona_id}_{idx:04d}.png"
-        
-        if process_image(img_file, output_file, target_size):
+    # Decide what needs (re)processing: outputs are named by content hash,
+    # so adding or removing a photo never renames the others
+    manifest_file = output_path / MANIFEST_FILE
+    manifest = _load_manifest(manifest_file)
+    entries, jobs = plan_images(image_files, manifest.get("images", {}), output_path, persona_id, target_size)
+    outputs = {entry["output"] for entry in entries.values()}
+    
+    # Process images; workers return in input order, whichever finishes first
+    from rich.progress import track
+    
+    workers = min(workers or os.cpu_count() or 1, len(jobs)) if jobs else 0
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=workers)
+        errors = pool.map(_process_job, jobs)
+    else:
+        pool = None
+        errors = map(_process_job, jobs)
+    
+    processed, failed = 0, set()
+    try:
+        for (img_file, output_file, _), error in track(zip(jobs, errors), total=len(jobs),
+                                                      description="Processing images..."):
+            if error is not None:
+                console.print(f"[red]Error processing {img_file}: {error}[/red]")
+                failed.add(output_file.name)
+                continue
             # Create caption file
-            caption_file = output_file.with_suffix('.txt')
-            caption_file.write_text(caption_template)
+            output_file.with_suffix('.txt').write_text(caption_template)
             processed += 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    
+    # Failed images are retried next run
+    entries = {name: entry for name, entry in entries.items() if entry["output"] not in failed}
+    outputs -= failed
+    
+    # Remove outputs whose raw image is gone (or, on the first run with a
+    # manifest, the index-numbered files earlier versions wrote)
+    legacy = set()
+    if not manifest_file.exists():
+        legacy = {path.name for path in output_path.glob(f"{persona_id}_[0-9][0-9][0-9][0-9].png")}
+    stale = ({entry["output"] for entry in manifest.get("images", {}).values()} - outputs) | legacy
+    for name in stale:
+        for path in (output_path / name, (output_path / name).with_suffix('.txt')):
+            path.unlink(missing_ok=True)
     
-    console.print(f"[green]Successfully processed {processed}/{len(image_files)} images[/green]")
+    # A new caption template rewrites every caption, otherwise only missing ones
+    for name in outputs:
+        caption_file = (output_path / name).with_suffix('.txt')
+        if manifest.get("caption") != caption_template or not caption_file.exists():
+            caption_file.write_text(caption_template)
+    
+    _save_manifest(manifest_file, {"version": 1, "caption": caption_template, "images": entries})
+    
+    unchanged = len(outputs) - processed
+    console.print(f"[green]Processed {processed} new or changed image(s), {unchanged} unchanged"
+                  + (f", {len(stale)} stale removed" if stale else "") + "[/green]")
     console.print(f"[blue]Output saved to: {output_path}[/blue]")
     
     # Create metadata file
+    metadata = (f"Persona ID: {persona_id}\n"
+                f"Persona Name: {persona['name']}\n"
+                f"Trigger Word: {trigger_word}\n"
+                f"Total images: {len(outputs)}\n"
+                f"Image size: {target_size}x{target_size}\n"
+                f"Caption: {caption_template}\n")
     metadata_file = output_path / 'metadata.txt'
-    with open(metadata_file, 'w') as f:
-        f.write(f"Persona ID: {persona_id}\n")
-        f.write(f"Persona Name: {persona['name']}\n")
-        f.write(f"Trigger Word: {trigger_word}\n")
-        f.write(f"Total images: {processed}\n")
-        f.write(f"Image size: {target_size}x{target_size}\n")
-        f.write(f"Caption: {caption_template}\n")
-    
-    # Create kohya_ss directory structure
-    kohya_dir = input_path.parent / f"10_{trigger_word.replace('persona-', '')}"
+    if not metadata_file.exists() or metadata_file.read_text() != metadata:
+        metadata_file.write_text(metadata)
+    
+    # kohya_ss reads <repeats>_<name> folders; a changed repeat count renames
+    # the existing folder instead of starting a new one next to it. Only
+    # files this tool wrote (per the previous manifest, or the legacy names
+    # on the first run with one) are ever removed, anything added by hand stays
+    ours = {name for output in {entry["output"] for entry in manifest.get("images", {}).values()} | legacy
+            for name in _with_caption(output)}
+    concept = trigger_word.replace('persona-', '')
+    kohya_dir = input_path.parent / f"{repeats}_{concept}"
+    for old_dir in input_path.parent.glob(f"[0-9]*_{concept}"):
+        prefix, _, name = old_dir.name.partition('_')
+        if old_dir == kohya_dir or not old_dir.is_dir() or not prefix.isdigit() or name != concept:
+            continue
+        if not kohya_dir.exists():
+            old_dir.rename(kohya_dir)
+            continue
+        for name in ours:
+            (old_dir / name).unlink(missing_ok=True)
+        try:
+            old_dir.rmdir()
+        except OSError:
+            console.print(f"[yellow]Warning: left {old_dir} in place, it holds files this tool "
+                          f"didn't write; remove it or kohya_ss trains on both folders[/yellow]")
     kohya_dir.mkdir(exist_ok=True)
     
-    # Copy all processed files to kohya directory
-    import shutil
-    for img_file in output_path.glob("*.png"):
-        shutil.copy2(img_file, kohya_dir / img_file.name)
-        caption_file = img_file.with_suffix('.txt')
-        if caption_file.exists():
-            shutil.copy2(caption_file, kohya_dir / caption_file.name)
+    wanted = {name for output in outputs for name in _with_caption(output)}
+    linked = sum(_link_into(output_path / name, kohya_dir / name) for name in wanted)
+    for name in ours - wanted:
+        (kohya_dir / name).unlink(missing_ok=True)
     
-    console.print(f"[green]Also created kohya_ss training directory: {kohya_dir}[/green]")
+    console.print(f"[green]Also created kohya_ss training directory: {kohya_dir} "
+                  f"({repeats} repeats, {linked} file(s) updated)[/green]")
 
 if __name__ == '__main__':
     prepare_data()
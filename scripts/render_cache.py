@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Cache of rendered outputs keyed by what determines the pixels.
+
+The key is a sha256 over the canonical API graph (editor-only _meta
+dropped) plus the identity of every file it reads: models by size and
+mtime, or by content hash when asked, and LoadImage inputs the same way.
+Graphs with stateful nodes, which give different results per run, are
+never cached.
+
+Outputs are stored under outputs/.render_cache/<key>/ as reflink clones
+of the downloaded files (copies where the filesystem can't clone), and
+restored into the output folder the same way. The cache never shares an
+inode with a file the user can edit, so an in-place save can't rewrite a
+cached render and evicting an entry frees what it counted. An SQLite
+index tracks sizes, last use and hit/miss counters. Entries are evicted
+least recently used first once the cache exceeds its size or entry limit.
+"""
+import filecmp
+import json
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import click
+
+from file_clone import clone_file
+from sqlite_util import Transaction
+from workflow_store import canonical_bytes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    files TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+"""
+
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+DEFAULT_MAX_ENTRIES = 10000
+
+# Class -> (input naming a file, directories it is looked up in, relative to the project)
+FILE_INPUTS = {
+    "LoadImage": ("image", ("ComfyUI/input",)),
+    "LoadImageMask": ("image", ("ComfyUI/input",)),
+}
+
+
+def _restore_path(source: Path, dest_dir: Path) -> Path:
+    """Where to restore source in dest_dir without replacing a different file
+
+    An identical file already there is reused; otherwise a free name with
+    a numeric suffix is picked.
+    """
+    dest = dest_dir / source.name
+    index = 1
+    while dest.exists() and not filecmp.cmp(source, dest, shallow=False):
+        dest = dest_dir / f"{source.stem}_{index}{source.suffix}"
+        index += 1
+    return dest
+
+
+class RenderCache:
+    def __init__(self, project_root: Path, cache_dir: Optional[Path] = None,
+                 max_bytes: int = DEFAULT_MAX_BYTES, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 content_hash: bool = False, timeout: float = 30.0):
+        self.project_root = project_root
+        self.cache_dir = cache_dir or project_root / "outputs" / ".render_cache"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.content_hash = content_hash
+        self.conn = sqlite3.connect(str(self.cache_dir / "index.db"), timeout=timeout, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _identity(self, path: Path) -> Optional[List]:
+        """[size, mtime_ns] or [sha256] for a file the graph reads, None if missing"""
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        if not self.content_hash:
+            return [st.st_size, st.st_mtime_ns]
+        row = self.conn.execute("SELECT size, mtime_ns, sha256 FROM file_hashes WHERE path = ?",
+                                (str(path),)).fetchone()
+        if row and (row[0], row[1]) == (st.st_size, st.st_mtime_ns):
+            return [row[2]]
+        from model_sync import file_hash
+        digest = file_hash(path)
+        self.conn.execute("INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?)",
+                          (str(path), st.st_size, st.st_mtime_ns, digest))
+        return [digest]
+
+    def key(self, graph: Dict[str, Any]) -> Optional[str]:
+        """Cache key for an API graph, None if it can't be cached"""
+        import hashlib
+        from graph_optimizer import STATEFUL_NODES
+        from memory_model import WEIGHT_LOADERS
+
+        clean, files = {}, {}
+        for node_id, node in graph.items():
+            class_type, inputs = node["class_type"], node.get("inputs", {})
+            if class_type in STATEFUL_NODES:
+                return None
+            clean[node_id] = {"class_type": class_type, "inputs": inputs}
+            if class_type in WEIGHT_LOADERS:
+                name_input, dirs = WEIGHT_LOADERS[class_type]
+                dirs = tuple(f"models/{directory}" for directory in dirs)
+            elif class_type in FILE_INPUTS:
+                name_input, dirs = FILE_INPUTS[class_type]
+            else:
+                continue
+            name = inputs.get(name_input)
+            if not isinstance(name, str):
+                continue
+            candidates = [self.project_root / directory / name for directory in dirs]
+            existing = next((path for path in candidates if path.exists()), None)
+            if existing is None:
+                return None  # ComfyUI may know a file we can't see, don't guess
+            files[f"{class_type}:{name}"] = self._identity(existing)
+        return hashlib.sha256(canonical_bytes({"graph": clean, "files": files})).hexdigest()
+
+    def _bump(self, name: str):
+        self.conn.execute("INSERT INTO counters VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+                          (name,))
+
+    def get(self, key: str, dest_dir: Path) -> Optional[List[Path]]:
+        """Restore a cached render into dest_dir, None on a miss"""
+        row = self.conn.execute("SELECT files FROM entries WHERE key = ?", (key,)).fetchone()
+        entry_dir = self.cache_dir / key
+        if row is not None and all((entry_dir / name).exists() for name in json.loads(row[0])):
+            dest_dir.mkdir(parents=True, exist_ok=True)
+            restored = []
+            for name in json.loads(row[0]):
+                dest = _restore_path(entry_dir / name, dest_dir)
+                if not dest.exists():
+                    clone_file(entry_dir / name, dest)
+                restored.append(dest)
+            with Transaction(self.conn):
+                self.conn.execute("UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                                  (time.time(), key))
+                self._bump("hits")
+            return restored
+        if row is not None:
+            # Files were removed behind our back
+            self._drop(key)
+        self._bump("misses")
+        return None
+
+    def put(self, key: str, files: List[Path]):
+        """Store a finished render's output files"""
+        entry_dir = self.cache_dir / key
+        entry_dir.mkdir(exist_ok=True)
+        names, total = [], 0
+        for path in files:
+            clone_file(path, entry_dir / path.name)
+            names.append(path.name)
+            total += path.stat().st_size
+        now = time.time()
+        with Transaction(self.conn):
+            self.conn.execute(
+                "INSERT INTO entries (key, files, bytes, created, last_used) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET files = excluded.files, bytes = excluded.bytes, "
+                "last_used = excluded.last_used",
+                (key, json.dumps(names), total, now, now),
+            )
+        self.evict()
+
+    def _drop(self, key: str):
+        shutil.rmtree(self.cache_dir / key, ignore_errors=True)
+        self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def evict(self, max_bytes: Optional[int] = None, max_entries: Optional[int] = None) -> int:
+        """Remove least recently used entries until within limits, returns how many"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        max_entries = self.max_entries if max_entries is None else max_entries
+        total, count = self.conn.execute("SELECT COALESCE(SUM(bytes), 0), COUNT(*) FROM entries").fetchone()
+        evicted = 0
+        if total <= max_bytes and count <= max_entries:
+            return 0
+        with Transaction(self.conn):
+            for key, size in self.conn.execute("SELECT key, bytes FROM entries ORDER BY last_used").fetchall():
+                if total <= max_bytes and count <= max_entries:
+                    break
+                self._drop(key)
+                total -= size
+                count -= 1
+                evicted += 1
+            self.conn.execute("INSERT INTO counters VALUES ('evictions', ?) "
+                              "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (evicted,))
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        counters = dict(self.conn.execute("SELECT name, value FROM counters"))
+        total, count = self.conn.execute("SELECT COALESCE(SUM(bytes), 0), COUNT(*) FROM entries").fetchone()
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "entries": count,
+            "bytes": total,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+    def clear(self):
+        with Transaction(self.conn):
+            for (key,) in self.conn.execute("SELECT key FROM entries").fetchall():
+                self._drop(key)
+            self.conn.execute("DELETE FROM counters")
+
+
+def format_stats(stats: Dict[str, Any]) -> str:
+    return (f"{stats['entries']} entries, {stats['bytes'] / (1024 * 1024):.1f} MB, "
+            f"{stats['hits']} hits / {stats['misses']} misses ({stats['hit_rate']:.0%}), "
+            f"{stats['evictions']} evicted")
+
+
+@click.group()
+def cli():
+    """Inspect and trim the render cache"""
+    pass
+
+
+def _cache() -> RenderCache:
+    return RenderCache(Path(__file__).parent.parent)
+
+
+@cli.command()
+def stats():
+    """Show size and hit/miss statistics"""
+    cache = _cache()
+    print(format_stats(cache.stats()))
+    cache.close()
+
+
+@cli.command()
+@click.option('--max-size', type=float, required=True, help='Keep at most this many GB')
+def evict(max_size):
+    """Evict least recently used renders down to a size"""
+    cache = _cache()
+    evicted = cache.evict(max_bytes=int(max_size * 1024 ** 3))
+    print(f"✓ Evicted {evicted} entries, {format_stats(cache.stats())}")
+    cache.close()
+
+
+@cli.command()
+def clear():
+    """Remove every cached render and reset the statistics"""
+    cache = _cache()
+    cache.clear()
+    print("✓ Render cache cleared")
+    cache.close()
+
+
+if __name__ == '__main__':
+    cli()
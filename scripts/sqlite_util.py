@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Helpers shared by the SQLite-backed stores (persona registry, output
+catalog, render cache).
+"""
+import sqlite3
+
+
+class Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back on error
+
+    IMMEDIATE takes the write lock up front so concurrent writers queue on
+    busy_timeout instead of failing with a deadlock on upgrade.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
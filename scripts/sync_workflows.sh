@@ -21,31 +21,15 @@ mkdir -p "$COMFYUI_WORKFLOWS"
 # Sync workflows
 if [ -d "${PROJECT_ROOT}/workflows" ]; then
     echo "Syncing workflows to ComfyUI..."
-    cp -v "${PROJECT_ROOT}/workflows"/*.json "$COMFYUI_WORKFLOWS/" 2>/dev/null || echo "No workflows found to sync"
-    echo "✓ Workflows synced to ComfyUI"
+    # Links through the content-addressed store; only changed files are read
+    python3 "${SCRIPT_DIR}/workflow_store.py" sync
 else
     echo "No workflows directory found"
 fi
 
-# Sync models to ComfyUI
+# Sync models to ComfyUI (hardlink/reflink where possible, only changed files)
 echo "Syncing models to ComfyUI..."
-if [ -d "${PROJECT_ROOT}/models/checkpoints" ]; then
-    cp -v "${PROJECT_ROOT}/models/checkpoints"/*.safetensors "${PROJECT_ROOT}/ComfyUI/models/checkpoints/" 2>/dev/null || echo "No checkpoints found"
-    echo "✓ Checkpoints synced"
-fi
-
-if [ -d "${PROJECT_ROOT}/models/loras" ]; then
-    cp -v "${PROJECT_ROOT}/models/loras"/*.safetensors "${PROJECT_ROOT}/ComfyUI/models/loras/" 2>/dev/null || echo "No LoRAs found"
-    echo "✓ LoRAs synced"
-fi
-
-if [ -d "${PROJECT_ROOT}/models/vaes" ]; then
-    cp -v "${PROJECT_ROOT}/models/vaes"/*.safetensors "${PROJECT_ROOT}/ComfyUI/models/vae/" 2>/dev/null || echo "No VAEs found"
-fi
-
-if [ -d "${PROJECT_ROOT}/models/controlnet" ]; then
-    cp -v "${PROJECT_ROOT}/models/controlnet"/*.safetensors "${PROJECT_ROOT}/ComfyUI/models/controlnet/" 2>/dev/null || echo "No ControlNet models found"
-fi
+python3 "${SCRIPT_DIR}/model_sync.py"
 
 echo ""
 echo "✓ All models and workflows synced to ComfyUI!"
@@ -1,16 +1,17 @@
 #!/usr/bin/env python3
 import click
-import json
 from pathlib import Path
-from rich.console import Console
+from lazy_console import LazyConsole
+from workflow_templates import get_template, lora_name
 
-console = Console()
+console = LazyConsole()
 
 @click.command()
 @click.option('--persona-id', required=True, help='Persona ID to test')
 @click.option('--strengths', default='0.6,0.7,0.8,0.9,1.0', help='Comma-separated LoRA strengths to test')
 @click.option('--prompt', help='Custom prompt (optional)')
-def test_lora_strengths(persona_id, strengths, prompt):
+@click.option('--single-graph', is_flag=True, help='One API graph with a branch per strength, sharing checkpoint, latent and seed')
+def test_lora_strengths(persona_id, strengths, prompt, single_graph):
     """Create workflows to test different LoRA strengths"""
     
     project_root = Path(__file__).parent.parent
@@ -19,6 +20,8 @@ def test_lora_strengths(persona_id, strengths, prompt):
     import sys
     sys.path.insert(0, str(project_root / "scripts"))
     from persona_manager import PersonaManager
+    from compat_check import IncompatibleModelsError, validate_workflow
+    from workflow_store import WorkflowStore
     
     manager = PersonaManager(project_root)
     persona = manager.get_persona(persona_id)
@@ -44,6 +47,34 @@ def test_lora_strengths(persona_id, strengths, prompt):
     console.print(f"[blue]Creating strength test workflows for {persona_id}[/blue]")
     console.print(f"[blue]Testing strengths: {strength_values}[/blue]")
     
+    # All strengths share the same checkpoint and LoRA, so one check covers them
+    try:
+        for warning in validate_workflow(
+            create_strength_test_workflow(persona_id, trigger_word, lora_file, strength_values[0], prompt),
+            project_root,
+        ):
+            console.print(f"[yellow]Warning: {warning}[/yellow]")
+    except IncompatibleModelsError as e:
+        console.print(f"[red]Error: {e}[/red]")
+        return
+    
+    store = WorkflowStore(project_root)
+    
+    if single_graph:
+        from workflow_batch import strength_sweep_graph
+        workflow_name = f"{persona_id}_strength_sweep"
+        workflow = strength_sweep_graph(
+            create_strength_test_workflow(persona_id, trigger_word, lora_file, strength_values[0], prompt,
+                                          template="persona_image_api"),
+            strength_values, persona_id,
+        )
+        path, _changed = store.save(workflow, workflow_name)
+        console.print(f"[green]✓ Created {workflow_name} with {len(strength_values)} strength branches[/green]")
+        console.print(f"\n[blue]🎯 Usage:[/blue]")
+        console.print(f"python persona_gen.py run {path.relative_to(project_root)}")
+        console.print(f"Every strength renders from the same seed and latent in one queue entry")
+        return
+    
     workflows_created = []
     
     for strength in strength_values:
@@ -52,17 +83,8 @@ def test_lora_strengths(persona_id, strengths, prompt):
             persona_id, trigger_word, lora_file, strength, prompt
         )
         
-        # Save workflow
-        workflow_file = project_root / "workflows" / f"{workflow_name}.json"
-        with open(workflow_file, 'w') as f:
-            json.dump(workflow, f, indent=2)
-        
-        # Also save to ComfyUI
-        comfyui_workflow_dir = project_root / "ComfyUI" / "user" / "default" / "workflows"
-        if comfyui_workflow_dir.exists():
-            comfyui_workflow_file = comfyui_workflow_dir / f"{workflow_name}.json"
-            with open(comfyui_workflow_file, 'w') as f:
-                json.dump(workflow, f, indent=2)
+        # Stored once, linked into ComfyUI's workflow browser
+        store.save(workflow, workflow_name)
         
         workflows_created.append(workflow_name)
         console.print(f"[green]✓ Created workflow for strength {strength}[/green]")
@@ -77,155 +99,22 @@ def test_lora_strengths(persona_id, strengths, prompt):
     console.print(f"3. Compare results to find optimal strength")
     console.print(f"4. Update your main workflow with best strength")
 
-def create_strength_test_workflow(persona_id, trigger_word, lora_file, strength, prompt):
+def create_strength_test_workflow(persona_id, trigger_word, lora_file, strength, prompt, template="persona_image"):
     """Create a workflow with specific LoRA strength"""
-    
-    # Extract just the filename from lora_file path
-    lora_filename = Path(lora_file).name if "/" in lora_file else lora_file
-    
-    workflow = {
-        "last_node_id": 8,
-        "last_link_id": 11,
-        "nodes": [
-            {
-                "id": 1,
-                "type": "CheckpointLoaderSimple",
-                "pos": [50, 50],
-                "size": [315, 98],
-                "flags": {},
-                "order": 0,
-                "mode": 0,
-                "outputs": [
-                    {"name": "MODEL", "type": "MODEL", "links": [1], "slot_index": 0},
-                    {"name": "CLIP", "type": "CLIP", "links": [2], "slot_index": 1},
-                    {"name": "VAE", "type": "VAE", "links": [8], "slot_index": 2}
-                ],
-                "properties": {"Node name for S&R": "CheckpointLoaderSimple"},
-                "widgets_values": ["sd_xl_base_1.0.safetensors"]
-            },
-            {
-                "id": 2,
-                "type": "LoraLoader",
-                "pos": [400, 50],
-                "size": [315, 126],
-                "flags": {},
-                "order": 1,
-                "mode": 0,
-                "inputs": [
-                    {"name": "model", "type": "MODEL", "link": 1},
-                    {"name": "clip", "type": "CLIP", "link": 2}
-                ],
-                "outputs": [
-                    {"name": "MODEL", "type": "MODEL", "links": [3], "slot_index": 0},
-                    {"name": "CLIP", "type": "CLIP", "links": [4, 5], "slot_index": 1}
-                ],
-                "properties": {"Node name for S&R": "LoraLoader"},
-                "widgets_values": [lora_filename, strength, strength]
-            },
-            {
-                "id": 3,
-                "type": "CLIPTextEncode",
-                "pos": [750, 50],
-                "size": [400, 200],
-                "flags": {},
-                "order": 2,
-                "mode": 0,
-                "inputs": [{"name": "clip", "type": "CLIP", "link": 4}],
-                "outputs": [{"name": "CONDITIONING", "type": "CONDITIONING", "links": [6], "slot_index": 0}],
-                "properties": {"Node name for S&R": "CLIPTextEncode"},
-                "widgets_values": [prompt]
-            },
-            {
-                "id": 4,
-                "type": "CLIPTextEncode",
-                "pos": [750, 300],
-                "size": [400, 200],
-                "flags": {},
-                "order": 3,
-                "mode": 0,
-                "inputs": [{"name": "clip", "type": "CLIP", "link": 5}],
-                "outputs": [{"name": "CONDITIONING", "type": "CONDITIONING", "links": [7], "slot_index": 0}],
-                "properties": {"Node name for S&R": "CLIPTextEncode"},
-                "widgets_values": ["low quality, bad anatomy, blurry, distorted, deformed"]
-            },
-            {
-                "id": 5,
-                "type": "EmptyLatentImage",
-                "pos": [400, 300],
-                "size": [315, 106],
-                "flags": {},
-                "order": 4,
-                "mode": 0,
-                "outputs": [{"name": "LATENT", "type": "LATENT", "links": [9], "slot_index": 0}],
-                "properties": {"Node name for S&R": "EmptyLatentImage"},
-                "widgets_values": [1024, 1024, 1]
-            },
-            {
-                "id": 6,
-                "type": "KSampler",
-                "pos": [1200, 50],
-                "size": [315, 262],
-                "flags": {},
-                "order": 5,
-                "mode": 0,
-                "inputs": [
-                    {"name": "model", "type": "MODEL", "link": 3},
-                    {"name": "positive", "type": "CONDITIONING", "link": 6},
-                    {"name": "negative", "type": "CONDITIONING", "link": 7},
-                    {"name": "latent_image", "type": "LATENT", "link": 9}
-                ],
-                "outputs": [{"name": "LATENT", "type": "LATENT", "links": [10], "slot_index": 0}],
-                "properties": {"Node name for S&R": "KSampler"},
-                "widgets_values": [42, "fixed", 35, 7.0, "euler", "normal", 1.0]  # Fixed seed for comparison
-            },
-            {
-                "id": 7,
-                "type": "VAEDecode",
-                "pos": [1550, 50],
-                "size": [210, 46],
-                "flags": {},
-                "order": 6,
-                "mode": 0,
-                "inputs": [
-                    {"name": "samples", "type": "LATENT", "link": 10},
-                    {"name": "vae", "type": "VAE", "link": 8}
-                ],
-                "outputs": [{"name": "IMAGE", "type": "IMAGE", "links": [11], "slot_index": 0}],
-                "properties": {"Node name for S&R": "VAEDecode"}
-            },
-            {
-                "id": 8,
-                "type": "SaveImage",
-                "pos": [1800, 50],
-                "size": [315, 270],
-                "flags": {},
-                "order": 7,
-                "mode": 0,
-                "inputs": [{"name": "images", "type": "IMAGE", "link": 11}],
-                "properties": {"Node name for S&R": "SaveImage"},
-                "widgets_values": [f"{persona_id}_strength_{strength}"]
-            }
-        ],
-        "links": [
-            [1, 1, 0, 2, 0, "MODEL"],
-            [2, 1, 1, 2, 1, "CLIP"],
-            [3, 2, 0, 6, 0, "MODEL"],
-            [4, 2, 1, 3, 0, "CLIP"],
-            [5, 2, 1, 4, 0, "CLIP"],
-            [6, 3, 0, 6, 1, "CONDITIONING"],
-            [7, 4, 0, 6, 2, "CONDITIONING"],
-            [8, 1, 2, 7, 1, "VAE"],
-            [9, 5, 0, 6, 3, "LATENT"],
-            [10, 6, 0, 7, 0, "LATENT"],
-            [11, 7, 0, 8, 0, "IMAGE"]
-        ],
-        "groups": [],
-        "config": {},
-        "extra": {},
-        "version": 0.4
-    }
-    
-    return workflow
+    # Fixed seed for comparison (the API format has no seed control widget)
+    seed_control = {"seed_control": "fixed"} if template == "persona_image" else {}
+    return get_template(template).render(
+        lora_name=lora_name(lora_file),
+        strength_model=strength,
+        strength_clip=strength,
+        prompt=prompt,
+        negative_prompt="low quality, bad anatomy, blurry, distorted, deformed",
+        seed=42,
+        steps=35,
+        cfg=7.0,
+        filename_prefix=f"{persona_id}_strength_{strength}",
+        **seed_control,
+    )
 
 if __name__ == "__main__":
     test_lora_strengths()
@@ -20,18 +20,8 @@ if [ -z "$PERSONA_ID" ]; then
 fi
 
 # Get persona info
-PERSONA_INFO=$(python -c "
-from pathlib import Path
-import sys
-sys.path.insert(0, '${SCRIPT_DIR}')
-from persona_manager import PersonaManager
-manager = PersonaManager(Path('${PROJECT_ROOT}'))
-persona = manager.get_persona('${PERSONA_ID}')
-if persona:
-    print(f\"{persona['name']}|{persona['trigger_word']}|{persona['training_data_path']}\")
-else:
-    print('NOT_FOUND')
-")
+PERSONA_INFO=$(python "${SCRIPT_DIR}/persona_manager.py" query "${PERSONA_ID}" \
+    --fields name,trigger_word,training_data_path || true)
 
 if [ "$PERSONA_INFO" = "NOT_FOUND" ]; then
     echo "Error: Persona ${PERSONA_ID} not found"
@@ -52,7 +42,7 @@ if [ ! -f "$BASE_MODEL" ]; then
     exit 1
 fi
 
-if [ ! -d "$TRAIN_DATA_PATH" ] || [ -z "$(ls -A "$TRAIN_DATA_PATH"/10_* 2>/dev/null)" ]; then
+if [ ! -d "$TRAIN_DATA_PATH" ] || [ -z "$(ls -A "$TRAIN_DATA_PATH"/[0-9]*_* 2>/dev/null)" ]; then
     echo "Error: No training data found in ${TRAIN_DATA_PATH}"
     echo "Please prepare your training data first"
     exit 1
@@ -127,7 +117,7 @@ LORA_FILE="${PERSONA_ID}.safetensors"
 if [ -f "${OUTPUT_DIR}/${LORA_FILE}" ]; then
     cp "${OUTPUT_DIR}/${LORA_FILE}" "${MODELS_DIR}/loras/"
     
-    # Update persona manager
+    # Update persona manager (re-read and written under an exclusive lock - safe with parallel trainings)
     python -c "
 from pathlib import Path
 import sys
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+import itertools
+import json
+import marshal
+import sys
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from workflow_templates import get_template, lora_name
+
+# Slots a sweep spec may pin under "params" (everything the sweep axes don't own)
+FIXED_SLOTS = {
+    "ckpt_name", "negative_prompt", "width", "height", "batch_size",
+    "steps", "cfg", "sampler_name", "scheduler", "denoise",
+}
+
+
+# Latent sources whose batch_size sets images per sampling pass, and sampler seeds
+BATCH_NODES = {"EmptyLatentImage"}
+SEED_INPUTS = {"KSampler": ("seed",), "KSamplerAdvanced": ("noise_seed",)}
+
+
+def parse_shard(shard: Optional[str]) -> Tuple[int, int]:
+    """'K/N' -> (K, N), zero-based; None means the whole sweep"""
+    if not shard:
+        return 0, 1
+    try:
+        index, count = (int(part) for part in shard.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{shard}', expected K/N (e.g. 0/4)")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{shard}', K must be in 0..N-1")
+    return index, count
+
+
+def _seeds(spec) -> List[int]:
+    if isinstance(spec, dict):
+        start = spec.get("start", 0)
+        return range(start, start + spec["count"])
+    return [int(seed) for seed in spec]
+
+
+def sweep_size(spec: Dict[str, Any]) -> int:
+    return (len(spec["personas"]) * len(spec["prompts"])
+            * len(_seeds(spec.get("seeds", [42]))) * len(spec.get("strengths", [0.8])))
+
+
+def iter_sweep(spec: Dict[str, Any], personas: Dict[str, Dict],
+               shard: Tuple[int, int] = (0, 1)) -> Iterator[Dict[str, Any]]:
+    """Lazily expand personas x prompts x seeds x strengths into API graphs
+
+    Only the current combination is held in memory. With shard (K, N) every
+    N-th combination starting at K is produced, so N workers each taking
+    one K cover the sweep exactly once.
+
+    Spec keys: personas (ids), prompts (may use {trigger_word}), seeds (list
+    or {"start", "count"}), strengths, params (fixed template slots).
+    """
+    params = spec.get("params", {})
+    unknown = set(params) - FIXED_SLOTS
+    if unknown:
+        raise ValueError(f"Unsupported sweep params: {', '.join(sorted(unknown))}")
+
+    template = get_template("persona_image_api")
+    shard_index, shard_count = shard
+    combinations = itertools.product(
+        spec["personas"],
+        enumerate(spec["prompts"]),
+        _seeds(spec.get("seeds", [42])),
+        spec.get("strengths", [0.8]),
+    )
+
+    for persona_id, (prompt_index, prompt), seed, strength in itertools.islice(
+            combinations, shard_index, None, shard_count):
+        persona = personas[persona_id]
+        name = f"{persona_id}_p{prompt_index}_seed{seed}_strength_{strength}"
+        yield {
+            "id": name,
+            "persona_id": persona_id,
+            "prompt_index": prompt_index,
+            "seed": seed,
+            "strength": strength,
+            "graph": template.render(
+                lora_name=lora_name(persona["lora_file"]),
+                strength_model=strength,
+                strength_clip=strength,
+                prompt=prompt.format(trigger_word=persona["trigger_word"]),
+                seed=seed,
+                filename_prefix=name,
+                **params,
+            ),
+        }
+
+
+def strength_sweep_graph(graph: Dict[str, Any], strengths: List[float], filename_prefix: str) -> Dict[str, Any]:
+    """Fan a rendered persona_image_api graph out into one branch per LoRA strength
+
+    The checkpoint and latent (with its seed) are shared, so ComfyUI loads
+    and allocates them once; each strength gets its own LoraLoader ->
+    prompts -> KSampler -> VAEDecode -> SaveImage branch, wired exactly like
+    the single-strength graph. graph itself is left untouched.
+    """
+    frozen = marshal.dumps(graph)
+    shared = marshal.loads(frozen)
+    sweep = {node_id: shared[node_id] for node_id in ("1", "5")}
+    next_id = itertools.count(len(graph) + 1)
+    for strength in strengths:
+        nodes = marshal.loads(frozen)
+        lora, positive, negative, sampler, decode, save = (str(next(next_id)) for _ in range(6))
+        sweep[lora] = {"class_type": "LoraLoader", "inputs": {
+            **nodes["2"]["inputs"], "strength_model": strength, "strength_clip": strength}}
+        sweep[positive] = {"class_type": "CLIPTextEncode", "inputs": {**nodes["3"]["inputs"], "clip": [lora, 1]}}
+        sweep[negative] = {"class_type": "CLIPTextEncode", "inputs": {**nodes["4"]["inputs"], "clip": [lora, 1]}}
+        sweep[sampler] = {"class_type": "KSampler", "inputs": {
+            **nodes["6"]["inputs"], "model": [lora, 0], "positive": [positive, 0], "negative": [negative, 0]}}
+        sweep[decode] = {"class_type": "VAEDecode", "inputs": {"samples": [sampler, 0], "vae": ["1", 2]}}
+        sweep[save] = {"class_type": "SaveImage", "inputs": {
+            "filename_prefix": f"{filename_prefix}_strength_{strength}", "images": [decode, 0]}}
+    return sweep
+
+
+def batched_graphs(graph: Dict[str, Any], batches: List[Tuple[int, int]]) -> Iterator[Dict[str, Any]]:
+    """Copies of a UI or API graph with latent batch size and sampler seed set per batch
+
+    batches comes from memory_model.plan_batches; each batch's first image
+    index is added to the seed so follow-up batches get fresh noise.
+    """
+    from graph_compiler import WIDGET_NAMES
+
+    frozen = marshal.dumps(graph)
+    for offset, size in batches:
+        copy = marshal.loads(frozen)
+        if "nodes" in copy:
+            # UI widgets are positional, map input names to widgets_values indices
+            nodes = [(node["type"], node["widgets_values"],
+                      {name: index for index, name in enumerate(WIDGET_NAMES.get(node["type"], []))
+                       if name and index < len(node["widgets_values"])})
+                     for node in copy["nodes"] if isinstance(node.get("widgets_values"), list)]
+        else:
+            nodes = [(node["class_type"], node["inputs"], {name: name for name in node["inputs"]})
+                     for node in copy.values() if isinstance(node, dict) and "inputs" in node]
+        for node_type, values, slots in nodes:
+            if node_type in BATCH_NODES and "batch_size" in slots:
+                values[slots["batch_size"]] = size
+            for name in SEED_INPUTS.get(node_type, ()):
+                if name in slots and isinstance(values[slots[name]], int):
+                    values[slots[name]] += offset
+        yield copy
+
+
+def write_jsonl(items: Iterator[Dict[str, Any]], out: TextIO) -> int:
+    """Stream items as compact JSON lines, returns the number written"""
+    count = 0
+    for item in items:
+        out.write(json.dumps(item, separators=(",", ":")))
+        out.write("\n")
+        count += 1
+    return count
+
+
+def iter_workflow_items(paths: List[str]) -> Iterator[Tuple[str, Dict[str, Any], Dict[str, Any]]]:
+    """(label, graph, metadata) from .json workflow files and batch-workflows JSONL
+
+    JSONL is read one line at a time; "-" reads JSONL from stdin. Metadata
+    is everything on a JSONL line besides the graph (id, seed, priority...).
+    """
+    for path in paths:
+        if path == "-" or path.endswith(".jsonl"):
+            stream = sys.stdin if path == "-" else open(path, 'r')
+            try:
+                for line_no, line in enumerate(stream, start=1):
+                    if not line.strip():
+                        continue
+                    item = json.loads(line)
+                    if "graph" in item:
+                        meta = {key: value for key, value in item.items() if key != "graph"}
+                        yield item.get("id", f"{path}:{line_no}"), item["graph"], meta
+                    else:
+                        yield f"{path}:{line_no}", item, {}
+            finally:
+                if stream is not sys.stdin:
+                    stream.close()
+        else:
+            with open(path, 'r') as f:
+                yield path, json.load(f), {}
+
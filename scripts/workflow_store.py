@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store for workflow JSON.
+
+Every workflow is written once to workflows/.store/<sha256>.json, hashed
+over its canonical form (sorted keys, compact separators).
+workflows/<name>.json is a reflink clone of that blob (a plain copy where
+the filesystem can't clone) and ComfyUI's workflow browser gets a symlink
+to workflows/<name>.json, so no extra bytes are written per name.
+Saving an unchanged graph touches nothing, and sync() only reads files
+whose (inode, mtime, size) moved since the manifest last saw them.
+
+A clone shares no inode with the blob or another name, so an editor
+saving over workflows/<name>.json in place changes only that file.
+ComfyUI saves through the symlink into the same file, and the next sync
+stores the edited graph like any other change.
+"""
+import fcntl
+import filecmp
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import click
+
+from file_clone import clone_file
+
+MANIFEST_VERSION = 1
+
+
+def canonical_bytes(workflow: Dict[str, Any]) -> bytes:
+    return json.dumps(workflow, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def workflow_hash(workflow: Dict[str, Any]) -> str:
+    return hashlib.sha256(canonical_bytes(workflow)).hexdigest()
+
+
+def _file_stat(path: Path) -> List[int]:
+    st = os.stat(path)
+    return [st.st_ino, st.st_mtime_ns, st.st_size]
+
+
+class WorkflowStore:
+    def __init__(self, project_root: Path):
+        self.project_root = project_root
+        self.workflows_dir = project_root / "workflows"
+        self.store_dir = self.workflows_dir / ".store"
+        self.manifest_file = self.store_dir / "manifest.json"
+        self.comfyui_dir = project_root / "ComfyUI" / "user" / "default" / "workflows"
+
+    def _blob(self, digest: str) -> Path:
+        return self.store_dir / f"{digest}.json"
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        if self.manifest_file.exists():
+            with open(self.manifest_file, 'r') as f:
+                return json.load(f)
+        return {"version": MANIFEST_VERSION, "workflows": {}}
+
+    def _save_manifest(self, manifest: Dict[str, Any]):
+        tmp = self.manifest_file.with_name(f".manifest.{os.getpid()}.tmp")
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.manifest_file)
+
+    @contextmanager
+    def _manifest_lock(self):
+        """Advisory lock around a manifest read-modify-write, yields the manifest"""
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.store_dir / "manifest.lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                manifest = self._load_manifest()
+                yield manifest
+                self._save_manifest(manifest)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _put_blob(self, digest: str, workflow: Dict[str, Any]) -> Path:
+        """Write the blob for digest unless the store already has it"""
+        blob = self._blob(digest)
+        if not blob.exists():
+            tmp = blob.with_name(f".{blob.name}.{os.getpid()}.tmp")
+            with open(tmp, 'w') as f:
+                json.dump(workflow, f, indent=2)
+            os.replace(tmp, blob)
+        return blob
+
+    def _link(self, name: str) -> Tuple[Path, str]:
+        """The ComfyUI browser entry for name and the relative target it links to"""
+        return (self.comfyui_dir / f"{name}.json",
+                os.path.relpath(self.workflows_dir / f"{name}.json", self.comfyui_dir))
+
+    def _mirror(self, name: str) -> str:
+        """Symlink one workflow into ComfyUI's browser
+
+        Returns "linked" when the link was (re)made, "conflict" when a
+        different file of that name is already there (it is left alone) and
+        "" when there is nothing to do.
+        """
+        if not self.comfyui_dir.exists():
+            return ""
+        link, target = self._link(name)
+        if link.is_symlink():
+            if os.readlink(link) == target:
+                return ""
+        elif link.exists() and not filecmp.cmp(link, self.comfyui_dir / target, shallow=False):
+            # The user's own ComfyUI workflow, or an edited copy from the old sync
+            return "conflict"
+        tmp = link.with_name(f".{link.name}.{os.getpid()}.tmp")
+        os.symlink(target, tmp)
+        try:
+            os.replace(tmp, link)
+        except BaseException:
+            tmp.unlink()
+            raise
+        return "linked"
+
+    def save(self, workflow: Dict[str, Any], name: str) -> Tuple[Path, bool]:
+        """Store a workflow under workflows/<name>.json
+
+        Returns (path, changed); changed is False when an identical graph
+        was already saved under this name and nothing was written.
+        """
+        digest = workflow_hash(workflow)
+        workflow_file = self.workflows_dir / f"{name}.json"
+
+        with self._manifest_lock() as manifest:
+            entries = manifest["workflows"]
+            entry = entries.get(name)
+            unchanged = (
+                entry is not None
+                and entry["hash"] == digest
+                and workflow_file.exists()
+                and _file_stat(workflow_file) == entry["stat"]
+            )
+            if not unchanged:
+                clone_file(self._put_blob(digest, workflow), workflow_file)
+                entries[name] = {"hash": digest, "stat": _file_stat(workflow_file)}
+            linked = self._mirror(name) == "linked"
+
+        return workflow_file, not unchanged or linked
+
+    def _ingest(self, path: Path) -> Dict[str, Any]:
+        """Adopt a workflow file that was placed or edited outside the store"""
+        with open(path, 'r') as f:
+            workflow = json.load(f)
+        digest = workflow_hash(workflow)
+        blob = self._blob(digest)
+        if not blob.exists():
+            clone_file(path, blob)
+        return {"hash": digest, "stat": _file_stat(path)}
+
+    def sync(self) -> Dict[str, int]:
+        """Bring the store and the ComfyUI links up to date with workflows/
+
+        Only files whose stat changed since the last sync are read.
+        """
+        stats = {"ingested": 0, "mirrored": 0, "removed": 0, "pruned": 0, "invalid": 0, "conflicts": 0}
+        if not self.workflows_dir.exists():
+            return stats
+
+        with self._manifest_lock() as manifest:
+            entries = manifest["workflows"]
+            present = set()
+            for path in sorted(self.workflows_dir.glob("*.json")):
+                name = path.stem
+                present.add(name)
+                entry = entries.get(name)
+                if entry is None or _file_stat(path) != entry["stat"]:
+                    try:
+                        entries[name] = self._ingest(path)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        stats["invalid"] += 1
+                        continue
+                    stats["ingested"] += 1
+                status = self._mirror(name)
+                if status == "linked":
+                    stats["mirrored"] += 1
+                elif status == "conflict":
+                    stats["conflicts"] += 1
+
+            # Workflows deleted from workflows/ also leave the ComfyUI browser,
+            # but only links this store put there
+            for name in set(entries) - present:
+                del entries[name]
+                link, target = self._link(name)
+                if link.is_symlink() and os.readlink(link) == target:
+                    link.unlink()
+                    stats["removed"] += 1
+
+            referenced = {entry["hash"] for entry in entries.values()}
+            for blob in self.store_dir.glob("*.json"):
+                if blob.stem not in referenced and blob != self.manifest_file:
+                    blob.unlink()
+                    stats["pruned"] += 1
+
+        return stats
+
+
+@click.group()
+def cli():
+    """Content-addressed workflow store"""
+    pass
+
+
+@cli.command()
+def sync():
+    """Sync workflows/ into the store and ComfyUI's workflow browser"""
+    project_root = Path(__file__).parent.parent
+    stats = WorkflowStore(project_root).sync()
+    print(f"✓ Workflows synced: {stats['ingested']} new or changed, {stats['mirrored']} linked into ComfyUI, "
+          f"{stats['removed']} removed, {stats['pruned']} unused blobs pruned")
+    if stats["invalid"]:
+        print(f"⚠ Skipped {stats['invalid']} file(s) that are not valid JSON")
+    if stats["conflicts"]:
+        print(f"⚠ Left {stats['conflicts']} ComfyUI workflow(s) alone: a different file of the same name is already there")
+
+
+if __name__ == '__main__':
+    cli()
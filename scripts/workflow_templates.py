@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+import json
+import marshal
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Tuple, Union
+
+TEMPLATES_DIR = Path(__file__).parent.parent / "workflows" / "templates"
+
+# Parameter slots per template. UI-format graphs address a node's
+# widgets_values by (node id, widget index); API-format graphs address
+# (node id, input name). A slot may patch several places at once.
+TEMPLATE_SLOTS = {
+    "persona_image": {
+        "ckpt_name": [(1, 0)],
+        "lora_name": [(2, 0)],
+        "strength_model": [(2, 1)],
+        "strength_clip": [(2, 2)],
+        "prompt": [(3, 0)],
+        "negative_prompt": [(4, 0)],
+        "width": [(5, 0)],
+        "height": [(5, 1)],
+        "batch_size": [(5, 2)],
+        "seed": [(6, 0)],
+        "seed_control": [(6, 1)],
+        "steps": [(6, 2)],
+        "cfg": [(6, 3)],
+        "sampler_name": [(6, 4)],
+        "scheduler": [(6, 5)],
+        "denoise": [(6, 6)],
+        "filename_prefix": [(8, 0)],
+    },
+    "persona_image_api": {
+        "ckpt_name": [("1", "ckpt_name")],
+        "lora_name": [("2", "lora_name")],
+        "strength_model": [("2", "strength_model")],
+        "strength_clip": [("2", "strength_clip")],
+        "prompt": [("3", "text")],
+        "negative_prompt": [("4", "text")],
+        "width": [("5", "width")],
+        "height": [("5", "height")],
+        "batch_size": [("5", "batch_size")],
+        "seed": [("6", "seed")],
+        "steps": [("6", "steps")],
+        "cfg": [("6", "cfg")],
+        "sampler_name": [("6", "sampler_name")],
+        "scheduler": [("6", "scheduler")],
+        "denoise": [("6", "denoise")],
+        "filename_prefix": [("8", "filename_prefix")],
+    },
+    "persona_video": {
+        "ckpt_name": [("1", "ckpt_name")],
+        "lora_name": [("2", "lora_name")],
+        "strength_model": [("2", "strength_model")],
+        "strength_clip": [("2", "strength_clip")],
+        "motion_model": [("10", "model_name")],
+        "prompt": [("3", "text")],
+        "negative_prompt": [("4", "text")],
+        "width": [("12", "width")],
+        "height": [("12", "height")],
+        "frames": [("12", "batch_size")],
+        "seed": [("13", "seed")],
+        "steps": [("13", "steps")],
+        "cfg": [("13", "cfg")],
+        "sampler_name": [("13", "sampler_name")],
+        "scheduler": [("13", "scheduler")],
+        "frame_rate": [("15", "frame_rate")],
+        "filename_prefix": [("15", "filename_prefix")],
+    },
+}
+
+SlotPath = Tuple[Union[str, int], ...]
+
+
+class WorkflowTemplate:
+    """A workflow graph loaded once, with its parameter slots precompiled
+
+    Each slot is resolved to a concrete path into the graph when the
+    template is created, so render() is a copy of the pristine graph plus
+    a handful of item assignments. The pristine graph is kept marshalled
+    (it only holds JSON types), which copies about 3x faster than
+    json.loads or deepcopy.
+    """
+
+    def __init__(self, name: str, graph: Dict[str, Any], slots: Dict[str, List[Tuple]]):
+        self.name = name
+        self.is_ui_format = "nodes" in graph
+        self._frozen = marshal.dumps(graph)
+        self._paths = {slot: [self._compile(graph, ref) for ref in refs] for slot, refs in slots.items()}
+        self.defaults = {slot: self._get(graph, paths[0]) for slot, paths in self._paths.items()}
+
+    def _compile(self, graph: Dict[str, Any], ref: Tuple) -> SlotPath:
+        node_id, key = ref
+        if self.is_ui_format:
+            for index, node in enumerate(graph["nodes"]):
+                if node["id"] == node_id:
+                    if key >= len(node.get("widgets_values", [])):
+                        raise ValueError(f"Template {self.name}: node {node_id} has no widget {key}")
+                    return ("nodes", index, "widgets_values", key)
+            raise ValueError(f"Template {self.name}: node {node_id} not found")
+
+        if key not in graph.get(node_id, {}).get("inputs", {}):
+            raise ValueError(f"Template {self.name}: node {node_id} has no input {key}")
+        return (node_id, "inputs", key)
+
+    @staticmethod
+    def _get(graph, path: SlotPath):
+        for key in path:
+            graph = graph[key]
+        return graph
+
+    @property
+    def slots(self) -> List[str]:
+        return sorted(self._paths)
+
+    def render(self, **params) -> Dict[str, Any]:
+        """Return a fresh copy of the graph with the given slots patched"""
+        unknown = set(params) - set(self._paths)
+        if unknown:
+            raise ValueError(f"Template {self.name} has no slot(s): {', '.join(sorted(unknown))}")
+
+        graph = marshal.loads(self._frozen)
+        for slot, value in params.items():
+            for path in self._paths[slot]:
+                self._get(graph, path[:-1])[path[-1]] = value
+        return graph
+
+
+@lru_cache(maxsize=None)
+def get_template(name: str) -> WorkflowTemplate:
+    """Load and compile a template from workflows/templates (once per process)"""
+    if name not in TEMPLATE_SLOTS:
+        raise ValueError(f"Unknown workflow template: {name}")
+    with open(TEMPLATES_DIR / f"{name}.json", 'r') as f:
+        graph = json.load(f)
+    return WorkflowTemplate(name, graph, TEMPLATE_SLOTS[name])
+
+
+def lora_name(lora_file: str) -> str:
+    """ComfyUI expects the file name inside models/loras, not a path"""
+    return Path(lora_file).name if lora_file else lora_file
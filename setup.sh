@@ -98,7 +98,7 @@ fi
 
 # Install additional useful tools
 echo "Installing additional tools..."
-pip install opencv-python pillow numpy matplotlib tqdm rich click
+pip install opencv-python pillow numpy matplotlib tqdm rich click aiohttp
 
 # Create symlinks for models (idempotent)
 echo "Setting up model directories..."
@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The scripts are run directly rather than installed, and import each other by module name
+SCRIPTS_DIR = Path(__file__).parent.parent / "scripts"
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+
+class StandIns:
+    """ComfyUI stand-ins on ephemeral ports, started and stopped inside the test's event loop"""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.runners = {}
+
+    async def start(self, step_delay: float = 0.0):
+        """Returns (server, url)"""
+        from aiohttp import web
+        from comfyui_standin import StandInServer
+
+        server = StandInServer(self.root / f"standin{len(self.runners)}", step_delay)
+        runner = web.AppRunner(server.app(), shutdown_timeout=0.1)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        url = f"http://{host}:{port}"
+        self.runners[url] = runner
+        return server, url
+
+    async def stop(self, url: str):
+        """Kill one stand-in: its socket closes and in-flight requests fail"""
+        await self.runners.pop(url).cleanup()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        for url in list(self.runners):
+            await self.stop(url)
+
+
+@pytest.fixture
+def standins(tmp_path):
+    return StandIns(tmp_path)
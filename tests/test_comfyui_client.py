@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from comfyui_client import ComfyUIClient, ComfyUIError
+from comfyui_standin import FAIL_NODE
+
+
+def graph(steps=3, fail=False):
+    nodes = {
+        "1": {"class_type": "KSampler", "inputs": {"steps": steps}},
+        "2": {"class_type": "SaveImage", "inputs": {"images": ["1", 0], "filename_prefix": "client/test"}},
+    }
+    if fail:
+        nodes["2"] = {"class_type": FAIL_NODE, "inputs": {"images": ["1", 0]}}
+    return nodes
+
+
+def test_queue_progress_download(standins, tmp_path):
+    events = []
+
+    async def scenario():
+        async with standins:
+            _, url = await standins.start()
+            async with ComfyUIClient(url) as client:
+                return await client.run(graph(), tmp_path / "out", lambda kind, data: events.append((kind, data)))
+
+    result = asyncio.run(scenario())
+    assert [data["value"] for kind, data in events if kind == "progress"] == [1, 2, 3]
+    assert events[0][0] == "queued" and events[-1][0] == "finished"
+    assert [path.name for path in result["files"]] == ["test_00001_.png"]
+    assert result["files"][0].read_bytes().startswith(b"\x89PNG")
+    assert result["outputs"]["2"]["images"][0]["subfolder"] == "client"
+
+
+def test_execution_error_raises(standins):
+    async def scenario():
+        async with standins:
+            _, url = await standins.start()
+            async with ComfyUIClient(url) as client:
+                await client.run(graph(fail=True))
+
+    with pytest.raises(ComfyUIError) as error:
+        asyncio.run(scenario())
+    assert error.value.details["node_type"] == FAIL_NODE
+    assert "Stand-in failure requested" in str(error.value)
+
+
+def test_websocket_drop_falls_back_to_history(standins, tmp_path):
+    async def scenario():
+        async with standins:
+            server, url = await standins.start(step_delay=0.02)
+            async with ComfyUIClient(url, poll_interval=0.05) as client:
+                run = asyncio.create_task(client.run(graph(steps=10), tmp_path / "out"))
+                while not server.pending:
+                    await asyncio.sleep(0.01)
+                await server.sockets[client.client_id].close()
+                result = await run
+                return result, client._ws
+
+    result, ws = asyncio.run(scenario())
+    assert ws is None
+    assert len(result["files"]) == 1 and result["files"][0].exists()
+
+
+def test_wait_times_out_and_forgets_finished_prompts(standins, tmp_path):
+    async def scenario():
+        async with standins:
+            _, url = await standins.start(step_delay=0.05)
+            async with ComfyUIClient(url, poll_interval=0.01) as client:
+                prompt_id = await client.queue_prompt(graph(steps=20))
+                with pytest.raises(TimeoutError):
+                    await client.wait(prompt_id, timeout=0.1)
+                await client.wait(prompt_id)
+                for _ in range(3):
+                    await client.run(graph())
+                # The final "executing" message of each prompt ends its bookkeeping
+                for _ in range(100):
+                    if not client._finished:
+                        break
+                    await asyncio.sleep(0.01)
+                return client._finished, dict(client._events)
+
+    finished, events = asyncio.run(scenario())
+    assert finished == set() and events == {}
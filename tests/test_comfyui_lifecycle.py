@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+import pytest
+
+from comfyui_lifecycle import ComfyUILifecycle
+
+
+@pytest.fixture
+def standin_url(standins):
+    """A stand-in served from a background loop, since the lifecycle calls asyncio.run itself"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    _, url = asyncio.run_coroutine_threadsafe(standins.start(), loop).result(10)
+    yield url
+    asyncio.run_coroutine_threadsafe(standins.__aexit__(None, None, None), loop).result(10)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(10)
+
+
+def test_free_keeps_checkpoint_warm_unless_unloading(tmp_path, standin_url):
+    lifecycle = ComfyUILifecycle(tmp_path, standin_url)
+    lora = tmp_path / "ComfyUI" / "models" / "loras" / "persona.safetensors"
+    lora.parent.mkdir(parents=True)
+    lora.write_bytes(b"lora")
+
+    lifecycle.warm("base.safetensors", "persona.safetensors")
+    assert lifecycle.status()["models"] == {"base.safetensors": "warm", "persona.safetensors": "warm"}
+
+    lifecycle.free(unload_models=False)
+    assert lifecycle.status()["models"] == {"base.safetensors": "warm", "persona.safetensors": "stale"}
+
+    lifecycle.free(unload_models=True)
+    assert lifecycle.status()["models"] == {}
@@ -0,0 +1,77 @@
+import asyncio
+
+from comfyui_client import ComfyUIClient
+from comfyui_pool import ComfyUIPool
+
+
+def graph(ckpt_name="base.safetensors", steps=4, prefix="pool"):
+    return {
+        "1": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": ckpt_name}},
+        "2": {"class_type": "KSampler", "inputs": {"model": ["1", 0], "steps": steps}},
+        "3": {"class_type": "SaveImage", "inputs": {"images": ["2", 0], "filename_prefix": prefix}},
+    }
+
+
+def test_killed_instance_requeues_onto_the_other(standins, tmp_path):
+    async def scenario():
+        async with standins:
+            _, doomed = await standins.start(step_delay=0.05)
+            survivor_server, survivor = await standins.start(step_delay=0.01)
+            events = []
+            async with ComfyUIPool([doomed, survivor], max_concurrency=2, health_interval=0.2,
+                                   revive_timeout=2, on_event=events.append) as pool:
+                async def kill_when_busy():
+                    while pool.instances[0].in_flight == 0:
+                        await asyncio.sleep(0.01)
+                    await asyncio.sleep(0.1)
+                    await standins.stop(doomed)
+
+                killer = asyncio.create_task(kill_when_busy())
+                results = [result async for result in pool.run_iter([graph(steps=20)] * 4, tmp_path / "out")]
+                await killer
+                return results, pool.status(), survivor_server, events
+
+    results, status, survivor_server, events = asyncio.run(scenario())
+    assert len(results) == 4
+    assert all(isinstance(result, dict) for _, result in results), results
+    assert {result["server"] for _, result in results} == {status[1]["url"]}
+    assert status[0]["lost"] >= 1 and not status[0]["healthy"]
+    assert survivor_server.prompts_run == 4
+    assert any("re-queueing" in event for event in events)
+
+
+def test_routes_to_least_loaded_instance(standins, tmp_path):
+    async def scenario():
+        async with standins:
+            _, busy = await standins.start(step_delay=0.05)
+            _, idle = await standins.start()
+            # Another client's prompts are queued on the first server
+            async with ComfyUIClient(busy) as other:
+                for _ in range(2):
+                    await other.queue_prompt(graph(steps=20))
+            async with ComfyUIPool([busy, idle], max_concurrency=2, health_interval=3600) as pool:
+                result = await pool.run(graph(), tmp_path / "out")
+                return result, idle
+
+    result, idle = asyncio.run(scenario())
+    assert result["server"] == idle
+    assert len(result["files"]) == 1
+
+
+def test_routes_by_model_affinity(standins, tmp_path):
+    async def scenario():
+        async with standins:
+            _, first = await standins.start()
+            _, second = await standins.start()
+            async with ComfyUIPool([first, second], max_concurrency=2, health_interval=3600) as pool:
+                # Run together, the two checkpoints spread over both servers
+                a, b = await asyncio.gather(pool.run(graph("a.safetensors")), pool.run(graph("b.safetensors")))
+                # Then each checkpoint goes back to the server that has it loaded
+                servers = {"a": a["server"], "b": b["server"]}
+                again = [(name, (await pool.run(graph(f"{name}.safetensors")))["server"])
+                         for name in ("b", "a", "b")]
+                return servers, again
+
+    servers, again = asyncio.run(scenario())
+    assert servers["a"] != servers["b"]
+    assert all(server == servers[name] for name, server in again)
@@ -0,0 +1,37 @@
+import json
+from pathlib import Path
+
+from graph_compiler import WIDGET_NAMES, compile_workflow
+
+WORKFLOWS = Path(__file__).parent.parent / "workflows"
+WIDGET_KINDS = {bool: "BOOLEAN", int: "INT", float: "FLOAT", str: "STRING"}
+
+
+def custom_node_info(workflow):
+    """Minimal /object_info for the custom nodes a workflow uses, typed from its own widget values"""
+    info = {}
+    for node in workflow["nodes"]:
+        values = node.get("widgets_values")
+        if node["type"] in WIDGET_NAMES or node["type"] in info or not isinstance(values, list):
+            continue
+        info[node["type"]] = {"input": {"required": {
+            f"widget_{index}": [WIDGET_KINDS.get(type(value), "STRING")] for index, value in enumerate(values)
+        }}}
+    return info
+
+
+def test_duplicate_link_ids_resolve_by_target():
+    workflow = json.loads((WORKFLOWS / "ADAPTIVE_BATCH_COMMUNITY_GENERATOR.json").read_text())
+    api, _warnings = compile_workflow(workflow, custom_node_info(workflow))
+
+    # Link ids 51, 56 and 61 each name a CLIP/MODEL link and a CONDITIONING link
+    assert api["14"]["inputs"]["clip"] == ["13", 1]
+    assert api["15"]["inputs"]["model"] == ["14", 0]
+    assert api["15"]["inputs"]["clip"] == ["14", 1]
+    assert api["40"]["inputs"]["positive"] == ["20", 0]
+    assert api["201"]["inputs"]["positive"] == ["25", 0]
+    assert api["41"]["inputs"]["negative"] == ["27", 0]
+    # 510-515 each feed both an analyzer and a SaveImage
+    for analyze, save, source in ((520, 530, 510), (524, 534, 515)):
+        assert api[str(analyze)]["inputs"]["image"] == [str(source), 0]
+        assert api[str(save)]["inputs"]["images"] == [str(source), 0]
@@ -0,0 +1,9 @@
+from job_scheduler import Job, JobScheduler
+
+
+def test_deadline_does_not_preempt_higher_priority():
+    hi = Job(0, "hi", {}, {"priority": 10, "estimate": 30})
+    lo = Job(1, "lo", {}, {"priority": 0, "deadline": 50, "estimate": 30})
+    order = JobScheduler().schedule([hi, lo])
+    assert [job.label for job in order] == ["hi", "lo"]
+
@@ -0,0 +1,25 @@
+import pytest
+
+from memory_model import WorkflowEstimator, auto_batch_size, resolve_batch_size
+from workflow_batch import batched_graphs
+from workflow_templates import get_template
+
+
+def test_auto_batch_size_is_the_largest_the_estimator_fits(tmp_path):
+    graph = get_template("persona_image_api").render(lora_name="persona.safetensors")
+    estimator = WorkflowEstimator(tmp_path)
+
+    def peak(size):
+        return estimator.estimate(next(batched_graphs(graph, [(0, size)])))["peak_gb"]
+
+    budget = (peak(5) + peak(6)) / 2
+    assert auto_batch_size(estimator, graph, budget) == 5
+    assert auto_batch_size(estimator, graph, budget, limit=3) == 3
+    with pytest.raises(ValueError, match="single image"):
+        auto_batch_size(estimator, graph, peak(1) - 0.1)
+
+
+def test_auto_batch_size_accepts_ui_graphs(tmp_path):
+    ui = get_template("persona_image").render(lora_name="persona.safetensors")
+    api = get_template("persona_image_api").render(lora_name="persona.safetensors")
+    assert resolve_batch_size("auto", 64, tmp_path, ui, 20.0) == resolve_batch_size("auto", 64, tmp_path, api, 20.0)
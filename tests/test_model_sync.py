@@ -0,0 +1,50 @@
+import os
+import shutil
+
+from model_sync import ModelSync
+
+
+def model(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def test_removes_only_files_it_synced(tmp_path):
+    synced = model(tmp_path / "models" / "loras" / "synced.safetensors", b"lora")
+    adopted = model(tmp_path / "models" / "loras" / "adopted.safetensors", b"other lora")
+    comfyui = tmp_path / "ComfyUI" / "models"
+    # Put there by hand (or by the old copy2 sync) before this engine ran
+    shutil.copy2(adopted, model(comfyui / "loras" / "adopted.safetensors", b""))
+
+    engine = ModelSync(tmp_path)
+    report = engine.sync()
+    assert report["hardlink"] == 1 and report["unchanged"] == 1
+    assert os.path.samefile(synced, comfyui / "loras" / "synced.safetensors")
+    assert engine.sync() == {"unchanged": 2, "removed": 0, "bytes_copied": 0, "errors": 0}
+
+    synced.unlink()
+    adopted.unlink()
+    assert engine.sync()["removed"] == 1
+    assert not (comfyui / "loras" / "synced.safetensors").exists()
+    assert (comfyui / "loras" / "adopted.safetensors").read_bytes() == b"other lora"
+    assert engine._load_state() == ({}, {})
+
+
+def test_changed_source_replaces_adopted_file(tmp_path):
+    source = model(tmp_path / "models" / "checkpoints" / "base.safetensors", b"v1")
+    dest = tmp_path / "ComfyUI" / "models" / "checkpoints" / "base.safetensors"
+    shutil.copy2(source, model(dest, b""))
+    engine = ModelSync(tmp_path)
+    engine.sync()
+
+    source.unlink()
+    model(source, b"v2 weights")
+    assert engine.sync()["hardlink"] == 1
+    assert dest.read_bytes() == b"v2 weights"
+    files, adopted = engine._load_state()
+    assert list(files) == ["checkpoints/base.safetensors"] and adopted == {}
+
+    # Once synced by the engine it is removed with its source
+    source.unlink()
+    assert engine.sync()["removed"] == 1 and not dest.exists()
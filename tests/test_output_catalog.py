@@ -0,0 +1,122 @@
+import json
+import os
+import sys
+
+import pytest
+
+from output_catalog import OutputCatalog, _Inotify, read_png_text
+
+
+def sweep_graph():
+    """One graph with a LoRA branch per strength, as batch-workflows writes them"""
+    nodes = {
+        "1": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "base.safetensors"}},
+        "4": {"class_type": "EmptyLatentImage", "inputs": {"width": 512, "height": 384, "batch_size": 1}},
+    }
+    for branch, strength in enumerate((0.6, 0.9)):
+        lora, text, sampler, decode, save = (f"{branch}{index}" for index in range(2, 7))
+        nodes.update({
+            lora: {"class_type": "LoraLoader", "inputs": {"model": ["1", 0], "clip": ["1", 1],
+                                                          "lora_name": "larry.safetensors",
+                                                          "strength_model": strength, "strength_clip": strength}},
+            text: {"class_type": "CLIPTextEncode", "inputs": {"clip": [lora, 1], "text": f"photo of larry {branch}"}},
+            sampler: {"class_type": "KSampler", "inputs": {"model": [lora, 0], "positive": [text, 0],
+                                                           "negative": [text, 0], "latent_image": ["4", 0],
+                                                           "seed": 7 + branch, "steps": 20, "cfg": 6.5,
+                                                           "sampler_name": "euler", "scheduler": "normal"}},
+            decode: {"class_type": "VAEDecode", "inputs": {"samples": [sampler, 0], "vae": ["1", 2]}},
+            save: {"class_type": "SaveImage", "inputs": {"images": [decode, 0],
+                                                         "filename_prefix": f"sweep/larry_{strength}"}},
+        })
+    return nodes
+
+
+def save_png(path, size=(600, 300), **chunks):
+    from PIL import Image
+    from PIL.PngImagePlugin import PngInfo
+
+    info = PngInfo()
+    for key, value in chunks.items():
+        info.add_text(key, value)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", size, "green").save(path, pnginfo=info)
+    return path
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = OutputCatalog(tmp_path, tmp_path / "output", tmp_path / "catalog", workers=1)
+    catalog._lora_personas = {"larry.safetensors": "persona-larry"}
+    yield catalog
+    catalog.close()
+
+
+def test_reads_every_text_chunk_kind(tmp_path):
+    from PIL import Image
+    from PIL.PngImagePlugin import PngInfo
+
+    info = PngInfo()
+    info.add_text("plain", "tEXt value")
+    info.add_text("zipped", "zTXt value " * 20, zip=True)
+    info.add_itxt("intl", "iTXt välue")
+    info.add_itxt("intl_zipped", "compressed iTXt välue " * 20, zip=True)
+    path = tmp_path / "chunks.png"
+    Image.new("RGB", (4, 4)).save(path, pnginfo=info)
+
+    assert read_png_text(path) == {
+        "plain": "tEXt value",
+        "zipped": "zTXt value " * 20,
+        "intl": "iTXt välue",
+        "intl_zipped": "compressed iTXt välue " * 20,
+    }
+    (tmp_path / "not.png").write_bytes(b"GIF89a")
+    with pytest.raises(ValueError):
+        read_png_text(tmp_path / "not.png")
+
+
+def test_ingest_indexes_branch_metadata_and_thumbnails(catalog, tmp_path):
+    prompt = json.dumps(sweep_graph())
+    for strength in (0.6, 0.9):
+        save_png(tmp_path / "output" / "sweep" / f"larry_{strength}_00001_.png", prompt=prompt)
+    (tmp_path / "output" / "broken.png").write_bytes(b"\x89PNG\r\n\x1a\n")
+
+    stats = catalog.ingest(catalog.scan())
+    assert stats == {"indexed": 2, "skipped": 1, "thumbnails": 2}
+    assert list(catalog.scan()) == [tmp_path / "output" / "broken.png"]
+
+    row, = catalog.query(persona_id="persona-larry", strength=0.9)
+    assert row["path"].endswith("larry_0.9_00001_.png")
+    assert (row["seed"], row["sampler"], row["steps"], row["cfg"]) == (8, "euler", 20, 6.5)
+    assert (row["width"], row["height"], row["checkpoint"]) == (512, 384, "base.safetensors")
+    assert row["prompt"] == "photo of larry 1"
+    assert len(catalog.query(search="photo of larry")) == 2
+
+    from PIL import Image
+    with Image.open(row["thumbnail"]) as thumbnail:
+        assert thumbnail.format == "JPEG"
+        assert thumbnail.size == (256, 128)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")
+def test_inotify_reports_finished_files_in_new_folders(tmp_path):
+    root = tmp_path / "output"
+    root.mkdir()
+    watcher = _Inotify.create(root)
+    assert watcher is not None
+
+    (root / "first.png").write_bytes(b"a")
+    assert watcher.read(timeout=1) == [root / "first.png"]
+
+    # The folder event has to be read before files inside it are watched
+    (root / "persona").mkdir()
+    assert watcher.read(timeout=1) == []
+    partial = open(root / "persona" / "second.png", "wb")
+    partial.write(b"half")
+    assert watcher.read(timeout=0.1) == []
+    partial.close()
+    assert watcher.read(timeout=1) == [root / "persona" / "second.png"]
+
+    (tmp_path / "elsewhere.png").write_bytes(b"b")
+    (tmp_path / "elsewhere.png").rename(root / "moved.png")
+    assert watcher.read(timeout=1) == [root / "moved.png"]
+    os.close(watcher.fd)
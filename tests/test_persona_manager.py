@@ -0,0 +1,32 @@
+import json
+
+from persona_manager import PersonaManager
+
+
+def test_update_persona_keeps_other_writers_changes(tmp_path):
+    first = PersonaManager(tmp_path, backend="json")
+    first.add_persona("X")
+    first.add_persona("Y")
+    second = PersonaManager(tmp_path, backend="json")
+
+    second.update_persona("persona-x", trained=True)
+    first.update_persona("persona-y", description="updated")
+    # A later save from the first manager must not resurrect its stale copy of persona-x
+    first.add_persona("Z")
+
+    on_disk = json.loads((tmp_path / "personas.json").read_text())["personas"]
+    assert on_disk["persona-x"]["trained"] is True
+    assert on_disk["persona-y"]["description"] == "updated"
+    assert first.get_persona("persona-x")["trained"] is True
+
+
+def test_add_personas_reports_mistyped_rows(tmp_path):
+    manager = PersonaManager(tmp_path, backend="json")
+    created, errors = manager.add_personas([
+        {"name": "Good"},
+        {"name": 42},
+        {"name": "Bad Config", "config": ["repeats", 10]},
+        {"name": "Also Good", "config": {"repeats": 5}},
+    ])
+    assert created == ["persona-good", "persona-also_good"]
+    assert errors == [(2, "name must be a string"), (3, "config must be an object")]
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from persona_index import lookup
+from persona_manager import PersonaManager
+from persona_store import migrate_json
+
+
+@pytest.fixture
+def registries(tmp_path):
+    """The same registry behind the JSON and the migrated SQLite backend"""
+    json_manager = PersonaManager(tmp_path, backend="json")
+    json_manager.add_personas([{"name": name} for name in "ABCDE"])
+    registry = json.loads((tmp_path / "personas.json").read_text())
+    for index, persona in enumerate(registry["personas"].values()):
+        persona["created"] = f"2024-01-0{index + 1}T12:00:00"
+        persona["trained"] = index % 2 == 0
+    (tmp_path / "personas.json").write_text(json.dumps(registry))
+
+    assert migrate_json(tmp_path / "personas.json", tmp_path / "personas.db") == 5
+    return PersonaManager(tmp_path, backend="json"), PersonaManager(tmp_path)
+
+
+def test_migrate_keeps_records(registries, tmp_path):
+    json_manager, sqlite_manager = registries
+    assert sqlite_manager.backend == "sqlite"
+    for persona in json_manager.list_personas():
+        assert sqlite_manager.get_persona(persona["id"]) == json_manager.get_persona(persona["id"])
+
+    with pytest.raises(ValueError):
+        migrate_json(tmp_path / "personas.json", tmp_path / "personas.db")
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"trained": True},
+    {"trained": False},
+    {"created_after": "2024-01-02", "created_before": "2024-01-05"},
+    {"trained": True, "created_after": "2024-01-02"},
+    {"limit": 2},
+    {"limit": 2, "offset": 2},
+    {"offset": 4},
+    {"trained": False, "limit": 1, "offset": 1},
+])
+def test_list_matches_json_backend(registries, filters):
+    json_manager, sqlite_manager = registries
+    expected = json_manager.list_personas(**filters)
+    assert expected
+    assert sqlite_manager.list_personas(**filters) == expected
+
+
+def test_updates_do_not_leak_version(registries, tmp_path):
+    _, sqlite_manager = registries
+    sqlite_manager.update_persona("persona-b", trained=True, config={"repeats": 3})
+    sqlite_manager.update_persona("persona-b", description="twice")
+
+    persona = sqlite_manager.get_persona("persona-b")
+    assert "version" not in persona
+    assert persona["trained"] is True and persona["config"]["repeats"] == 3
+    assert persona["description"] == "twice"
+    assert all("version" not in p for p in sqlite_manager.list_personas())
+    assert lookup(str(tmp_path), "persona-b") == persona
+    assert sqlite_manager.store.conn.execute(
+        "SELECT version FROM personas WHERE id = 'persona-b'").fetchone()[0] == 3
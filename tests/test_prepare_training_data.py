@@ -0,0 +1,80 @@
+import pytest
+from click.testing import CliRunner
+
+import persona_manager
+from prepare_training_data import prepare_data
+
+
+@pytest.fixture
+def persona(tmp_path, monkeypatch):
+    from PIL import Image
+
+    persona = {"name": "Larry", "trigger_word": "persona-larry", "training_data_path": str(tmp_path),
+               "config": {"repeats": 10}}
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    for index, color in enumerate(("red", "blue")):
+        Image.new("RGB", (32, 24), color).save(raw / f"photo{index}.png")
+
+    class Manager:
+        def __init__(self, project_root):
+            pass
+
+        def get_persona(self, persona_id):
+            return persona
+
+    monkeypatch.setattr(persona_manager, "PersonaManager", Manager)
+    return persona
+
+
+def prepare(*args):
+    result = CliRunner().invoke(prepare_data, ["--persona-id", "persona-larry", "--target-size", "16",
+                                               "--workers", "1", *args])
+    assert result.exception is None, result.output
+    return result.output
+
+
+def test_kohya_folder_keeps_files_added_by_hand(persona, tmp_path):
+    prepare()
+    kohya = tmp_path / "10_larry"
+    (kohya / "extra.png").write_bytes(b"mine")
+    (tmp_path / "raw" / "photo1.png").unlink()
+    prepare()
+    assert (kohya / "extra.png").read_bytes() == b"mine"
+    assert len(list(kohya.glob("persona-larry_*.png"))) == 1
+
+    # A new repeat count next to an existing folder must not delete the hand-added file
+    (tmp_path / "20_larry").mkdir()
+    persona["config"]["repeats"] = 20
+    output = prepare()
+    assert (kohya / "extra.png").exists()
+    assert not list(kohya.glob("persona-larry_*"))
+    assert "left" in output and "10_larry" in output
+    assert len(list((tmp_path / "20_larry").glob("persona-larry_*.png"))) == 1
+
+
+@pytest.mark.parametrize("repeats", [0, -3, "many", 2.5, True, None])
+def test_invalid_repeats_is_reported(persona, tmp_path, repeats):
+    persona["config"]["repeats"] = repeats
+    output = prepare()
+    assert "Invalid repeats" in output
+    assert not (tmp_path / "processed").exists()
+
+
+def test_upgrade_removes_index_numbered_files_everywhere(persona, tmp_path):
+    # Written by versions before the manifest: <persona>_0001.png/.txt in
+    # processed/ and the same names in the kohya folder
+    processed, kohya = tmp_path / "processed", tmp_path / "10_larry"
+    for folder in (processed, kohya):
+        folder.mkdir()
+        for index in (1, 2):
+            (folder / f"persona-larry_{index:04d}.png").write_bytes(b"old")
+            (folder / f"persona-larry_{index:04d}.txt").write_text("a photo of persona-larry")
+    (kohya / "extra.png").write_bytes(b"mine")
+
+    output = prepare()
+    assert "2 stale removed" in output
+    for folder in (processed, kohya):
+        assert not list(folder.glob("persona-larry_[0-9][0-9][0-9][0-9].*"))
+        assert len(list(folder.glob("persona-larry_*.png"))) == 2
+    assert (kohya / "extra.png").read_bytes() == b"mine"
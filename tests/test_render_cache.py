@@ -0,0 +1,60 @@
+import os
+
+from render_cache import RenderCache
+
+
+def render(tmp_path, name, data):
+    path = tmp_path / "outputs" / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def test_cached_renders_share_nothing_with_user_files(tmp_path):
+    cache = RenderCache(tmp_path)
+    original = render(tmp_path, "portrait_00001_.png", b"pixels")
+    mode = os.stat(original).st_mode
+    cache.put("key", [original])
+
+    restored = cache.get("key", tmp_path / "elsewhere")
+    cache.close()
+    cached = tmp_path / "outputs" / ".render_cache" / "key" / original.name
+    assert os.stat(original).st_mode == mode
+    assert os.stat(restored[0]).st_mode & 0o200
+    assert not os.path.samefile(cached, original) and not os.path.samefile(cached, restored[0])
+
+    # Editors save over the file they opened
+    with open(original, 'wb') as f:
+        f.write(b"retouched")
+    with open(restored[0], 'wb') as f:
+        f.write(b"retouched too")
+    assert cached.read_bytes() == b"pixels"
+
+
+def test_restore_keeps_different_files_of_the_same_name(tmp_path):
+    cache = RenderCache(tmp_path)
+    cache.put("key", [render(tmp_path, "portrait_00001_.png", b"pixels")])
+    dest_dir = tmp_path / "elsewhere"
+    dest_dir.mkdir()
+    (dest_dir / "portrait_00001_.png").write_bytes(b"another render")
+
+    first = cache.get("key", dest_dir)
+    second = cache.get("key", dest_dir)
+    cache.close()
+    assert (dest_dir / "portrait_00001_.png").read_bytes() == b"another render"
+    assert first == second == [dest_dir / "portrait_00001__1.png"]
+    assert first[0].read_bytes() == b"pixels"
+
+
+def test_eviction_frees_least_recently_used(tmp_path):
+    cache = RenderCache(tmp_path, max_bytes=25)
+    for key in ("old", "used", "new"):
+        cache.put(key, [render(tmp_path, f"{key}.png", b"x" * 10)])
+        if key == "used":
+            assert cache.get("old", tmp_path / "restored") is not None
+    stats = cache.stats()
+    cache.close()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (2, 20, 1)
+    assert not (tmp_path / "outputs" / ".render_cache" / "used").exists()
+    # The render in outputs/ is the user's and stays
+    assert (tmp_path / "outputs" / "used.png").read_bytes() == b"x" * 10
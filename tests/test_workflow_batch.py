@@ -0,0 +1,39 @@
+import json
+
+from workflow_batch import iter_sweep, strength_sweep_graph
+
+PERSONAS = {"persona-larry": {"lora_file": "/models/loras/larry.safetensors", "trigger_word": "persona-larry"}}
+
+
+def expand(graph, node_id):
+    """The node and everything feeding it, with ids replaced by structure"""
+    node = graph[node_id]
+    inputs = {name: [expand(graph, value[0]), value[1]] if isinstance(value, list) else value
+              for name, value in node["inputs"].items() if name != "filename_prefix"}
+    return {"class_type": node["class_type"], "inputs": inputs}
+
+
+def saves(graph):
+    return {node["inputs"]["filename_prefix"]: node_id
+            for node_id, node in graph.items() if node["class_type"] == "SaveImage"}
+
+
+def test_each_branch_matches_the_single_strength_graph():
+    spec = {"personas": ["persona-larry"], "prompts": ["photo of {trigger_word}"], "strengths": [0.5, 0.8, 1.1]}
+    items = list(iter_sweep(spec, PERSONAS))
+    graph = items[0]["graph"]
+    pristine = json.dumps(graph, sort_keys=True)
+
+    sweep = strength_sweep_graph(graph, spec["strengths"], "larry")
+    assert json.dumps(graph, sort_keys=True) == pristine
+    branches = saves(sweep)
+    assert len(branches) == 3
+    for item in items:
+        single, = saves(item["graph"]).values()
+        branch = branches[f"larry_strength_{item['strength']}"]
+        assert expand(sweep, branch) == expand(item["graph"], single)
+
+    # Only the checkpoint and the latent are shared between branches
+    assert sum(node["class_type"] == "CheckpointLoaderSimple" for node in sweep.values()) == 1
+    assert sum(node["class_type"] == "EmptyLatentImage" for node in sweep.values()) == 1
+    assert sum(node["class_type"] == "CLIPTextEncode" for node in sweep.values()) == 6
@@ -0,0 +1,77 @@
+import json
+import os
+
+from workflow_store import WorkflowStore
+
+GRAPH = {"1": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "base.safetensors"}}}
+EDITED = {"1": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "other.safetensors"}}}
+
+
+def store_with_mirror(tmp_path):
+    store = WorkflowStore(tmp_path)
+    store.comfyui_dir.mkdir(parents=True)
+    return store
+
+
+def blobs(store):
+    return {blob.name: json.loads(blob.read_text()) for blob in store.store_dir.glob("*.json")
+            if blob != store.manifest_file}
+
+
+def test_saved_once_and_linked_into_comfyui(tmp_path):
+    store = store_with_mirror(tmp_path)
+    path, changed = store.save(GRAPH, "portrait")
+    assert changed
+    mirror = store.comfyui_dir / "portrait.json"
+    assert mirror.is_symlink() and os.path.samefile(mirror, path)
+    assert list(blobs(store).values()) == [GRAPH]
+
+    stat = os.stat(path)
+    assert store.save(GRAPH, "portrait") == (path, False)
+    assert os.stat(path).st_mtime_ns == stat.st_mtime_ns
+    assert store.sync() == {"ingested": 0, "mirrored": 0, "removed": 0, "pruned": 0, "invalid": 0, "conflicts": 0}
+
+
+def test_in_place_edit_changes_only_that_name(tmp_path):
+    store = store_with_mirror(tmp_path)
+    first, _ = store.save(GRAPH, "first")
+    second, _ = store.save(GRAPH, "second")
+
+    # Editors and ComfyUI write over the file they opened
+    with open(first, 'w') as f:
+        json.dump(EDITED, f)
+    with open(store.comfyui_dir / "second.json", 'w') as f:
+        json.dump({**EDITED, "2": {"class_type": "SaveImage", "inputs": {}}}, f)
+
+    assert "2" not in json.loads(first.read_text())
+    assert json.loads(second.read_text())["2"]["class_type"] == "SaveImage"
+    assert list(blobs(store).values()) == [GRAPH]
+
+    stats = store.sync()
+    assert stats["ingested"] == 2 and stats["pruned"] == 1 and stats["conflicts"] == 0
+    assert sorted(map(json.dumps, blobs(store).values())) == sorted(
+        map(json.dumps, [EDITED, json.loads(second.read_text())]))
+    assert store.sync()["ingested"] == 0
+
+
+def test_foreign_comfyui_files_are_left_alone(tmp_path):
+    store = store_with_mirror(tmp_path)
+    (store.comfyui_dir / "mine.json").write_text(json.dumps(EDITED))
+    (store.comfyui_dir / "legacy.json").write_text(json.dumps(GRAPH, indent=2))
+    store.workflows_dir.mkdir()
+    for name in ("mine", "legacy"):
+        (store.workflows_dir / f"{name}.json").write_text(json.dumps(GRAPH, indent=2))
+
+    stats = store.sync()
+    assert stats["mirrored"] == 1 and stats["conflicts"] == 1
+    assert not (store.comfyui_dir / "mine.json").is_symlink()
+    assert json.loads((store.comfyui_dir / "mine.json").read_text()) == EDITED
+    # A byte-identical copy from the old copying sync becomes a link
+    assert (store.comfyui_dir / "legacy.json").is_symlink()
+
+    # Deleting a workflow removes only the links this store made
+    for name in ("mine", "legacy"):
+        (store.workflows_dir / f"{name}.json").unlink()
+    assert store.sync()["removed"] == 1
+    assert not os.path.lexists(store.comfyui_dir / "legacy.json")
+    assert (store.comfyui_dir / "mine.json").exists()